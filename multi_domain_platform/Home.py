@@ -1,4 +1,6 @@
 import streamlit as st
+from services import SystemStatus
+from services.auth_manager import restore_session
 #page config and titale
 st.set_page_config(
     page_title="Intelligence Platform",
@@ -52,28 +54,67 @@ with col3:
     if st.button("Go to IT Operations", key="it"):
         st.switch_page("pages/4_💻_IT_Operations.py")
 
-# System status 
+# System status
 st.divider()
 st.markdown("## 📈 System Status")
-# Create four columns for system metrics
-status_col1, status_col2, status_col3, status_col4 = st.columns(4)
-# AI Assistant status
-with status_col1:
-    st.metric("AI Assistant", "Online", "Ready")
-# Database connection status
-with status_col2:
-    st.metric("Database", "Connected", "Active")
-# Last updated info
-with status_col3:
-    st.metric("Last Updated", "Today", "-")
-# Total records info
-with status_col4:
-    st.metric("Total Records", "1,250+", "+15 today")
+status = SystemStatus("database/intelligence_platform.db")
+#status numbers (table sizes, users) are only shown to logged in users, like the other pages
+restore_session("database/intelligence_platform.db")
+
+
+def _latency(seconds):
+    return f"{seconds:.1f}s" if seconds is not None else "-"
+
+
+# refreshes on its own; every number comes from counters, no table is counted
+@st.fragment(run_every=30)
+def system_status():
+    if not st.session_state.get("logged_in"):
+        st.info("Log in to see the system status.")
+        st.page_link("pages/1_🔑Login.py", label="🔑 Go to Login")
+        return
+    snap = status.snapshot()
+    ai = snap["assistant"]
+    status_col1, status_col2, status_col3, status_col4 = st.columns(4)
+    with status_col1:
+        st.metric("AI Assistant", ai["status"].capitalize(),
+                  f"{ai['backend']}, p50 {_latency(ai['latency_p50'])}",
+                  delta_color="normal" if ai["status"] == "online" else "inverse")
+    with status_col2:
+        st.metric("Database", f"{snap['db_bytes'] / 1024 ** 2:,.1f} MB",
+                  f"WAL {snap['wal_bytes'] / 1024 ** 2:,.1f} MB", delta_color="off")
+    with status_col3:
+        st.metric("Last Updated", snap["last_insert_at"] or "-")
+    with status_col4:
+        st.metric("Total Records", f"{snap['total_rows']:,}", f"+{snap['added_today']:,} today")
+
+    labels = {"cyber_incidents": "Incidents", "it_tickets": "IT Tickets",
+              "datasets_metadata": "Datasets", "users": "Users"}
+    for column, (table, counts) in zip(st.columns(len(snap["tables"])), snap["tables"].items()):
+        with column:
+            st.metric(labels.get(table, table), f"{counts['rows']:,}", f"+{counts['added_today']:,} today")
+
+    caches = snap["caches"]
+    cache_col1, cache_col2, cache_col3 = st.columns(3)
+    with cache_col1:
+        st.metric("Query Cache Hit Rate", f"{caches['query']['hit_rate']:.0%}",
+                  f"{caches['query']['hits']:,} hits", delta_color="off")
+    with cache_col2:
+        st.metric("AI Response Cache Hit Rate", f"{caches['response']['hit_rate']:.0%}",
+                  f"{caches['response']['hits']:,} hits", delta_color="off")
+    with cache_col3:
+        st.metric("AI Latency p95", _latency(ai["latency_p95"]),
+                  f"{ai['requests']:,} replies, {ai['failed']:,} failed", delta_color="off")
+    st.caption("Row counts are kept up to date by database triggers. Cache and AI numbers "
+               "are for this server process since it started.")
+
+
+system_status()
 
 # Quick links in sidebar
 with st.sidebar:
     st.markdown("## 🔗 Quick Links")
-    st.page_link("home.py", label="🏠 Home")
+    st.page_link("Home.py", label="🏠 Home")
     st.page_link("pages/2_🛡️_Cybersecurity.py", label="🛡️ Cybersecurity")
     st.page_link("pages/3_📊_Data_Science.py", label="📊 Data Science")
     st.page_link("pages/4_💻_IT_Operations.py", label="💻 IT Operations")
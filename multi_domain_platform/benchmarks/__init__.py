@@ -0,0 +1,12 @@
+"""Benchmarks for the data layer, page data preparation and login.
+
+generator builds deterministic databases at a chosen scale, scenarios
+holds the timed operations, and runner times them, writes JSON results and
+compares two result files. loadtest drives the page scripts with many
+concurrent AppTest sessions. See __main__.py for the command line.
+"""
+from .generator import generate, table_counts
+from .loadtest import run_load
+from .runner import compare, run
+
+__all__ = ["generate", "table_counts", "run", "compare", "run_load"]
@@ -0,0 +1,95 @@
+"""Command line for the benchmark suite; run from the multi_domain_platform folder.
+
+    python -m benchmarks generate --scale 1000000
+    python -m benchmarks run --scale 100000 --output results.json
+    python -m benchmarks run --scale 100000 --compare baseline.json
+    python -m benchmarks compare baseline.json results.json
+    python -m benchmarks load --scale 100000 --sessions 8 --duration 60
+"""
+import argparse
+
+from .generator import generate
+from .loadtest import format_load, run_load
+from .runner import compare, format_comparison, load, prepare, run, save
+
+
+def _db_path(args) -> str:
+    return args.db or f"database/benchmark_{args.scale}.db"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    data = argparse.ArgumentParser(add_help=False)
+    data.add_argument("--scale", type=int, default=100_000,
+                      help="incidents and tickets to generate (default 100000)")
+    data.add_argument("--seed", type=int, default=0)
+    data.add_argument("--db", help="database file (default database/benchmark_<scale>.db)")
+
+    limits = argparse.ArgumentParser(add_help=False)
+    limits.add_argument("--threshold", type=float, default=0.15,
+                        help="slowdown that counts as a regression (default 0.15 = 15%%)")
+    limits.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore changes smaller than this many milliseconds")
+    limits.add_argument("--metric", default="min_ms", choices=["min_ms", "median_ms", "p95_ms", "mean_ms"],
+                        help="timing to compare (default min_ms, the best run)")
+
+    gen = commands.add_parser("generate", parents=[data], help="create a benchmark database")
+    gen.add_argument("--overwrite", action="store_true")
+
+    bench = commands.add_parser("run", parents=[data, limits], help="time the scenarios")
+    bench.add_argument("--only", nargs="*", help="scenario names or groups to run "
+                                                 "(data, models, pages, auth)")
+    bench.add_argument("--repeat", type=int, default=5)
+    bench.add_argument("--max-seconds", type=float, default=30.0,
+                       help="stop repeating a scenario after this long")
+    bench.add_argument("--regenerate", action="store_true")
+    bench.add_argument("--output", help="write results as JSON")
+    bench.add_argument("--compare", metavar="BASELINE", help="compare with an earlier results file")
+
+    cmp = commands.add_parser("compare", parents=[limits], help="compare two results files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+
+    stress = commands.add_parser("load", parents=[data],
+                                 help="simulate concurrent sessions on the page scripts")
+    stress.add_argument("--sessions", type=int, default=8)
+    stress.add_argument("--duration", type=float, default=60.0, help="seconds of load after warm-up")
+    stress.add_argument("--think", type=float, default=0.0,
+                        help="mean pause between a session's actions (default 0: back to back)")
+    stress.add_argument("--timeout", type=float, default=30.0, help="limit for a single rerun")
+    stress.add_argument("--keep", action="store_true", help="keep the working directory (database copy and session logs)")
+    stress.add_argument("--output", help="write the report as JSON")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        meta = generate(_db_path(args), scale=args.scale, seed=args.seed, overwrite=args.overwrite)
+        print(f"Generated {_db_path(args)}: {meta['counts']}")
+        return 0
+    if args.command == "load":
+        prepare(_db_path(args), args.scale, args.seed)
+        report = run_load(_db_path(args), args.sessions, args.duration, args.think, args.seed,
+                          args.timeout, keep_workdir=args.keep)
+        if args.output:
+            save(report, args.output)
+        print(format_load(report))
+        return 1 if report["failed_sessions"] else 0
+    if args.command == "run":
+        results = run(_db_path(args), args.scale, args.seed, args.only, args.repeat,
+                      args.max_seconds, args.regenerate)
+        if args.output:
+            save(results, args.output)
+        if not args.compare:
+            return 0
+        baseline, current = load(args.compare), results
+    else:
+        baseline, current = load(args.baseline), load(args.current)
+    report = compare(baseline, current, args.threshold, args.min_delta_ms, args.metric)
+    print(format_comparison(report))
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+"""Deterministic synthetic data for the four platform tables.
+
+The same scale and seed always produce the same rows, so benchmark results
+from different commits are measured on identical databases. Values follow
+what the pages write (incident types, severities, ticket issue types,
+statuses), dates are spread over span_days before a fixed end date, and
+every synthetic user shares one low-cost bcrypt hash of BENCH_PASSWORD.
+"""
+import json
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Sequence
+
+import bcrypt
+import numpy as np
+
+from services.database_manager import DatabaseManager
+
+INCIDENT_TYPES = ["Phishing", "Malware", "DDoS", "Unauthorized Access", "Data Breach", "Other"]
+INCIDENT_WEIGHTS = [0.35, 0.25, 0.12, 0.12, 0.06, 0.10]
+SEVERITIES = ["Low", "Medium", "High", "Critical"]
+SEVERITY_WEIGHTS = [0.40, 0.35, 0.18, 0.07]
+INCIDENT_STATUSES = ["Open", "Investigating", "Resolved", "Closed"]
+INCIDENT_STATUS_WEIGHTS = [0.20, 0.10, 0.30, 0.40]
+ISSUE_TYPES = ["Network Issue", "Hardware Issue", "Software Issue", "Data Recovery", "Os Issue",
+               "Performance Issue", "Other"]
+ISSUE_WEIGHTS = [0.25, 0.20, 0.25, 0.05, 0.10, 0.10, 0.05]
+TICKET_STATUSES = ["Open", "In Progress", "Resolved", "Closed"]
+TICKET_STATUS_WEIGHTS = [0.25, 0.15, 0.25, 0.35]
+SOURCES = ["kaggle", "internal", "government", "partner", "web scrape", ""]
+SOURCE_WEIGHTS = [0.30, 0.35, 0.10, 0.10, 0.10, 0.05]
+ROLES = ["analyst", "researcher", "technician", "admin", "user"]
+ROLE_WEIGHTS = [0.35, 0.20, 0.30, 0.05, 0.10]
+
+BENCH_PASSWORD = "Bench!pass1"
+# fixed salt at the lowest cost, so the users table is identical on every run
+BENCH_PASSWORD_HASH = bcrypt.hashpw(BENCH_PASSWORD.encode(), b"$2b$04$benchmarkbenchmarkbene").decode()
+
+DEFAULT_END_DATE = "2025-06-30"
+CHUNK_ROWS = 100_000
+
+_WORDS = ("host server user account email login endpoint firewall vpn database backup "
+          "printer laptop network switch router alert blocked suspicious failed repeated "
+          "outage slow update patch reset password disk memory cpu timeout error").split()
+
+
+def table_counts(scale: int) -> Dict[str, int]:
+    """Rows per table for a scale: incidents and tickets get scale rows each."""
+    return {
+        "cyber_incidents": scale,
+        "it_tickets": scale,
+        "datasets_metadata": max(100, scale // 100),
+        "users": max(100, scale // 100),
+    }
+
+
+def _texts(rng: np.random.Generator, count: int = 1000, words: int = 8) -> List[str]:
+    """A pool of short descriptions that rows pick from."""
+    picks = rng.integers(0, len(_WORDS), size=(count, words))
+    return [" ".join(_WORDS[i] for i in row).capitalize() for row in picks]
+
+
+def _choice(rng: np.random.Generator, values: Sequence[str], weights: Sequence[float], size: int):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=weights)]
+
+
+def _day_strings(end: date, span_days: int) -> np.ndarray:
+    return np.array([(end - timedelta(days=span_days - 1 - i)).isoformat() for i in range(span_days)],
+                    dtype=object)
+
+
+def _chunks(total: int) -> Iterator[int]:
+    for start in range(0, total, CHUNK_ROWS):
+        yield min(CHUNK_ROWS, total - start)
+
+
+def _incidents(rng, total: int, days: np.ndarray, texts: List[str]) -> Iterator[tuple]:
+    texts = np.asarray(texts, dtype=object)
+    for size in _chunks(total):
+        # incidents become more frequent towards the end date
+        day = (np.sqrt(rng.random(size)) * len(days)).astype(np.int64)
+        yield from zip(
+            days[day].tolist(),
+            _choice(rng, INCIDENT_TYPES, INCIDENT_WEIGHTS, size).tolist(),
+            _choice(rng, SEVERITIES, SEVERITY_WEIGHTS, size).tolist(),
+            _choice(rng, INCIDENT_STATUSES, INCIDENT_STATUS_WEIGHTS, size).tolist(),
+            texts[rng.integers(0, len(texts), size)].tolist(),
+        )
+
+
+def _tickets(rng, total: int, days: np.ndarray, texts: List[str], assignees: np.ndarray):
+    texts = np.asarray(texts, dtype=object)
+    for size in _chunks(total):
+        day = rng.integers(0, len(days), size)
+        seconds = rng.integers(8 * 3600, 18 * 3600, size)
+        times = [f"{d} {s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}"
+                 for d, s in zip(days[day].tolist(), seconds.tolist())]
+        # a few assignees carry most of the load
+        assignee = np.minimum(rng.zipf(1.6, size) - 1, len(assignees) - 1)
+        yield from zip(
+            times,
+            _choice(rng, ISSUE_TYPES, ISSUE_WEIGHTS, size).tolist(),
+            _choice(rng, TICKET_STATUSES, TICKET_STATUS_WEIGHTS, size).tolist(),
+            assignees[assignee].tolist(),
+            texts[rng.integers(0, len(texts), size)].tolist(),
+        )
+
+
+def _datasets(rng, total: int, days: np.ndarray, texts: List[str]) -> Iterator[tuple]:
+    sources = _choice(rng, SOURCES, SOURCE_WEIGHTS, total).tolist()
+    updated = days[rng.integers(0, len(days), total)].tolist()
+    for i in range(total):
+        yield f"dataset_{i:07d}", updated[i], sources[i], texts[i % len(texts)]
+
+
+def _users(rng, total: int) -> Iterator[tuple]:
+    roles = _choice(rng, ROLES, ROLE_WEIGHTS, total).tolist()
+    for i in range(total):
+        yield f"user{i:07d}", BENCH_PASSWORD_HASH, roles[i]
+
+
+def meta_path(db_path: str) -> str:
+    return db_path + ".json"
+
+
+def read_meta(db_path: str) -> Dict | None:
+    """What a database was generated with, or None if it wasn't (or is gone)."""
+    if not os.path.exists(db_path) or not os.path.exists(meta_path(db_path)):
+        return None
+    with open(meta_path(db_path), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def generate(db_path: str, scale: int = 10_000, seed: int = 0, end_date: str = DEFAULT_END_DATE,
+             span_days: int = 730, overwrite: bool = False) -> Dict:
+    """Create a benchmark database with table_counts(scale) rows; returns its metadata.
+
+    The file must not exist unless overwrite is set. Tables are created by
+    the normal migrations, so the schema and indexes match production.
+    """
+    if os.path.exists(db_path):
+        if not overwrite:
+            raise FileExistsError(f"{db_path} already exists")
+        for suffix in ("", "-wal", "-shm", ".json"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    rng = np.random.default_rng(seed)
+    counts = table_counts(scale)
+    days = _day_strings(date.fromisoformat(end_date), span_days)
+    texts = _texts(rng)
+    assignees = np.array([f"tech{i:03d}" for i in range(max(10, scale // 2000))], dtype=object)
+
+    db = DatabaseManager(db_path)
+    db.bulk_insert("cyber_incidents",
+                   ["date_reported", "incident_type", "severity", "status", "description"],
+                   _incidents(rng, counts["cyber_incidents"], days, texts))
+    db.bulk_insert("it_tickets", ["date_created", "priority", "status", "assigned_to", "description"],
+                   _tickets(rng, counts["it_tickets"], days, texts, assignees))
+    db.bulk_insert("datasets_metadata", ["dataset_name", "last_updated", "source", "description"],
+                   _datasets(rng, counts["datasets_metadata"], days, texts))
+    db.bulk_insert("users", ["username", "password_hash", "role"], _users(rng, counts["users"]))
+    db.execute_query("ANALYZE")
+
+    meta = {"scale": scale, "seed": seed, "end_date": end_date, "span_days": span_days,
+            "counts": counts}
+    with open(meta_path(db_path), "w", encoding="utf-8") as file:
+        json.dump(meta, file, indent=2)
+    return meta
@@ -0,0 +1,373 @@
+"""Concurrent-session load test: many simulated analysts driving the page scripts.
+
+Every session is a Streamlit AppTest running Home.py and the domain pages
+against a copy of a benchmark database, with the stub AI backend. After
+logging in it picks weighted random actions (opening pages, period and
+issue-type filters, paging, adding and editing records), optionally pausing
+between them, and times every rerun.
+
+AppTest swaps process-wide Streamlit state (the runtime, config options and
+secrets) on each run, so two of them can't run in one process at the same
+time. Each session therefore runs in its own process. They all share one
+database file, so write contention shows up as SQLite lock waits, but the
+in-process caches are per session. The numbers are a conservative estimate
+for a single server process holding the same number of sessions.
+"""
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import traceback
+from multiprocessing import get_context
+from queue import Empty
+from typing import Any, Callable, Dict, List, Tuple
+
+from services.histogram import LatencyHistogram
+
+from .generator import BENCH_PASSWORD, BENCH_PASSWORD_HASH
+
+APP_DB = "database/intelligence_platform.db"
+PAGES = {
+    "home": "Home.py",
+    "login": "pages/1_🔑Login.py",
+    "cybersecurity": "pages/2_🛡️_Cybersecurity.py",
+    "data_science": "pages/3_📊_Data_Science.py",
+    "it_operations": "pages/4_💻_IT_Operations.py",
+}
+PERIODS = ["All time", "Last 7 days", "Last 30 days", "Last 90 days"]
+# 1 ms to about a minute, 25% apart: finer than the default buckets, since
+# reruns spread over a wider range and the percentiles are the point here
+RERUN_BUCKETS = tuple(round(0.001 * 1.25 ** i, 6) for i in range(50))
+POOL_COUNTERS = ("lock_waits", "lock_wait_seconds", "lock_timeouts", "writer_waits",
+                 "writer_wait_seconds", "reader_waits", "reader_wait_seconds")
+
+
+class LoadSession:
+    """One simulated user: an AppTest plus the timings of every rerun it caused."""
+    def __init__(self, index: int, root: str, timeout: float, seed: int):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.username = f"user{index:07d}"
+        self.rng = random.Random(seed * 1_000_003 + index)
+        self.at = AppTest.from_file(os.path.join(root, PAGES["home"]), default_timeout=timeout)
+        self.page = None
+        self.added = 0
+        self.timings: List[Tuple[str, str, float]] = []
+        self.errors: List[str] = []
+
+    def rerun(self, action: str, interact: Callable[[Any], Any] | None = None) -> bool:
+        """Apply interact to the app, rerun it and record how long the rerun took."""
+        started = time.perf_counter()
+        try:
+            if interact is not None:
+                interact(self.at)
+            self.at.run()
+        except Exception as e:
+            self.errors.append(f"{self.page}.{action}: {type(e).__name__}: {e}")
+            return False
+        finally:
+            self.timings.append((self.page, action, time.perf_counter() - started))
+        if self.at.exception:
+            self.errors.append(f"{self.page}.{action}: {self.at.exception[0].message}")
+            return False
+        return True
+
+    def open(self, page: str) -> bool:
+        if self.page == page:
+            return True
+        self.page = page
+        return self.rerun("open", lambda at: at.switch_page(PAGES[page]))
+
+    def button(self, label: str | None = None, key: str | None = None):
+        """The first button (form submit buttons included) with this key or label."""
+        for widget in self.at.button:
+            if (key is not None and widget.key == key) or (label is not None and widget.label == label):
+                return widget
+        return None
+
+    def first_row(self) -> str | None:
+        """Index of the first listed record; edit buttons are keyed by it (page offset included)."""
+        for widget in self.at.button:
+            if widget.key and widget.key.startswith("edit_btn_"):
+                return widget.key[len("edit_btn_"):]
+        return None
+
+    def click(self, action: str, label: str | None = None, key: str | None = None) -> bool:
+        widget = self.button(label, key)
+        if widget is None:
+            return False
+        return self.rerun(action, lambda at: widget.click())
+
+    def note(self) -> str:
+        self.added += 1
+        return f"load test {self.username} #{self.added}"
+
+    # ---------- actions ----------
+    def login(self) -> bool:
+        self.open("login")
+        self.at.text_input(key="login_user").input(self.username)
+        self.at.text_input(key="login_pass").input(BENCH_PASSWORD)
+        self.click("submit", label="Login")
+        if not self.at.session_state["logged_in"]:
+            self.errors.append(f"login.submit: {self.username} was not logged in")
+            return False
+        return True
+
+    def home(self):
+        self.page = None
+        self.open("home")
+
+    def cyber_period(self):
+        if self.open("cybersecurity"):
+            period = self.rng.choice(PERIODS)
+            self.rerun("period", lambda at: at.selectbox(key="timeline_period").select(period))
+
+    def cyber_next(self):
+        if self.open("cybersecurity"):
+            self.click("next", key="incidents_next")
+
+    def cyber_add(self):
+        if self.open("cybersecurity"):
+            self.at.sidebar.text_area[0].input(self.note())
+            self.click("add", label="Add")
+
+    def cyber_edit(self):
+        row = self.first_row() if self.open("cybersecurity") else None
+        if row is not None and self.click("edit", key=f"edit_btn_{row}"):
+            self.at.text_area(key=f"desc_{row}").input(self.note())
+            self.click("save", label="Save")
+
+    def it_filter(self):
+        if self.open("it_operations"):
+            filters = [b.label for b in self.at.button if b.key is None and b.label
+                       and not b.label.startswith(("🚀", "✅"))]
+            if filters:
+                self.click("filter", label=self.rng.choice(filters))
+
+    def it_next(self):
+        if self.open("it_operations"):
+            self.click("next", key="tickets_next")
+
+    def it_add(self):
+        if self.open("it_operations"):
+            self.at.text_area[0].input(self.note())
+            self.click("add", label="✅ Add Ticket")
+
+    def data_science_view(self):
+        if self.page == "data_science":
+            self.rerun("view")
+        else:
+            self.open("data_science")
+
+    def data_science_add(self):
+        if self.open("data_science"):
+            self.at.sidebar.text_input[0].input(self.note())
+            self.click("add", label="💾 Add Dataset")
+
+    def data_science_edit(self):
+        row = self.first_row() if self.open("data_science") else None
+        if row is not None and self.click("edit", key=f"edit_btn_{row}"):
+            self.at.main.text_area[0].input(self.note())
+            self.click("save", label="💾 Save")
+
+
+# (method, weight): mostly reading, with a write every few actions
+ACTIONS: List[Tuple[Callable[[LoadSession], None], float]] = [
+    (LoadSession.home, 1),
+    (LoadSession.cyber_period, 4),
+    (LoadSession.cyber_next, 2),
+    (LoadSession.cyber_add, 1),
+    (LoadSession.cyber_edit, 1),
+    (LoadSession.it_filter, 4),
+    (LoadSession.it_next, 1),
+    (LoadSession.it_add, 1),
+    (LoadSession.data_science_view, 2),
+    (LoadSession.data_science_add, 1),
+    (LoadSession.data_science_edit, 1),
+]
+
+
+def _warm_up(root: str, timeout: float) -> None:
+    """Import every page's modules and start the hasher, so the first timed reruns aren't cold."""
+    from streamlit.testing.v1 import AppTest
+
+    from services.password_hasher import PasswordHasher
+
+    for path in PAGES.values():
+        AppTest.from_file(os.path.join(root, path), default_timeout=timeout).run()
+    PasswordHasher.shared().verify(BENCH_PASSWORD, BENCH_PASSWORD_HASH)
+
+
+def _session_process(index: int, root: str, workdir: str, options: Dict[str, Any], messages, start) -> None:
+    """Body of one session process; reports ("ready", index) and then ("done", index, results)."""
+    try:
+        os.chdir(workdir)
+        # app errors are collected per session; Streamlit's own logging goes to a file
+        log = os.open(f"session-{index}.log", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.dup2(log, 1)
+        os.dup2(log, 2)
+        _warm_up(root, options["timeout"])
+        session = LoadSession(index, root, options["timeout"], options["seed"])
+        messages.put(("ready", index, None))
+        start.wait()
+        deadline = time.perf_counter() + options["duration"]
+        actions, weights = zip(*ACTIONS)
+        if session.login():
+            while time.perf_counter() < deadline:
+                session.rng.choices(actions, weights)[0](session)
+                if options["think"]:
+                    time.sleep(session.rng.uniform(0, 2 * options["think"]))
+
+        from services.connection_pool import ConnectionPool
+
+        pool = ConnectionPool.for_path(APP_DB).stats()
+        messages.put(("done", index, {"timings": session.timings, "errors": session.errors,
+                                      "pool": {k: pool[k] for k in POOL_COUNTERS}}))
+    except BaseException:
+        messages.put(("failed", index, traceback.format_exc()))
+
+
+def _copy_database(source: str, workdir: str) -> None:
+    os.makedirs(os.path.join(workdir, "database"))
+    with sqlite3.connect(source) as src, sqlite3.connect(os.path.join(workdir, APP_DB)) as dst:
+        src.backup(dst)
+
+
+def _environment(seed: int) -> Dict[str, str]:
+    """Settings the session processes inherit: stub AI, the benchmark hash cost, a fixed secret."""
+    from services.password_hasher import hash_rounds
+
+    return {
+        "LLM_BACKEND": "stub",
+        "BCRYPT_ROUNDS": str(hash_rounds(BENCH_PASSWORD_HASH)),
+        "AUTH_SECRET": f"load-test-{seed}",
+    }
+
+
+def _summary(samples: List[float]) -> Dict[str, Any]:
+    histogram = LatencyHistogram(RERUN_BUCKETS)
+    for seconds in samples:
+        histogram.observe(seconds)
+    snap = histogram.snapshot()
+    return {"reruns": snap["count"],
+            **{k: round(snap[k] * 1000, 1) for k in ("mean", "p50", "p95", "p99", "max")}}
+
+
+def run_load(db_path: str, sessions: int = 8, duration: float = 60.0, think: float = 0.0,
+             seed: int = 0, timeout: float = 30.0, root: str | None = None,
+             keep_workdir: bool = False, progress=print) -> Dict[str, Any]:
+    """Run sessions concurrent sessions for duration seconds against a copy of db_path.
+
+    Returns per-page and per-action rerun latency percentiles (ms), reruns
+    per second, summed pool wait counters and the errors sessions hit.
+    """
+    root = os.path.abspath(root or os.getcwd())
+    workdir = tempfile.mkdtemp(prefix="mdp-load-")
+    ctx = get_context("spawn")
+    messages, start = ctx.Queue(), ctx.Event()
+    options = {"duration": duration, "think": think, "seed": seed, "timeout": timeout}
+    saved_env = {k: os.environ.get(k) for k in _environment(seed)}
+    processes = []
+    try:
+        _copy_database(db_path, workdir)
+        # children copy the environment when they start
+        os.environ.update(_environment(seed))
+        for index in range(sessions):
+            process = ctx.Process(target=_session_process, name=f"load-session-{index}",
+                                  args=(index, root, workdir, options, messages, start))
+            process.start()
+            processes.append(process)
+
+        results, failures = {}, []
+        ready = 0
+        while ready + len(failures) < sessions:
+            try:
+                kind, index, payload = messages.get(timeout=max(120.0, 10 * timeout))
+            except Empty:
+                raise RuntimeError(f"only {ready} of {sessions} sessions started") from None
+            if kind == "ready":
+                ready += 1
+            else:
+                failures.append(payload)
+        if progress:
+            progress(f"{ready} sessions ready, running for {duration:.0f}s")
+        started = time.perf_counter()
+        start.set()
+        wait = duration + 10 * timeout + 60
+        while len(results) + len(failures) < sessions:
+            try:
+                kind, index, payload = messages.get(timeout=wait)
+            except Empty:
+                failures.append("timed out waiting for a session to finish")
+                break
+            if kind == "done":
+                results[index] = payload
+            else:
+                failures.append(payload)
+        elapsed = time.perf_counter() - started
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if not keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    by_page: Dict[str, List[float]] = {}
+    by_action: Dict[str, List[float]] = {}
+    errors: List[str] = []
+    pool = dict.fromkeys(POOL_COUNTERS, 0)
+    for result in results.values():
+        for page, action, seconds in result["timings"]:
+            by_page.setdefault(page, []).append(seconds)
+            by_action.setdefault(f"{page}.{action}", []).append(seconds)
+        errors.extend(result["errors"])
+        for key in POOL_COUNTERS:
+            pool[key] += result["pool"][key]
+    reruns = sum(len(samples) for samples in by_page.values())
+    return {
+        "sessions": sessions,
+        "completed_sessions": len(results),
+        "duration_seconds": round(elapsed, 2),
+        "think_seconds": think,
+        "reruns": reruns,
+        "reruns_per_second": round(reruns / elapsed, 2) if elapsed else None,
+        "pages": {page: _summary(samples) for page, samples in sorted(by_page.items())},
+        "actions": {name: _summary(samples) for name, samples in sorted(by_action.items())},
+        "sqlite": {k: round(v, 4) if isinstance(v, float) else v for k, v in pool.items()},
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:20],
+        "failed_sessions": failures,
+        "workdir": workdir if keep_workdir else None,
+    }
+
+
+def format_load(report: Dict[str, Any]) -> str:
+    lines = [f"{report['completed_sessions']}/{report['sessions']} sessions, "
+             f"{report['duration_seconds']}s, {report['reruns']} reruns "
+             f"({report['reruns_per_second']}/s), think time {report['think_seconds']}s", ""]
+    for title, rows in (("page", report["pages"]), ("action", report["actions"])):
+        lines.append(f"{title:<28} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for name, row in rows.items():
+            lines.append(f"{name:<28} {row['reruns']:>7} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+                         f"{row['p99']:>8.1f} {row['max']:>8.1f}")
+        lines.append("")
+    sql = report["sqlite"]
+    lines.append(f"sqlite: {sql['lock_waits']} lock waits ({sql['lock_wait_seconds']}s), "
+                 f"{sql['lock_timeouts']} lock timeouts, {sql['writer_waits']} writer waits, "
+                 f"{sql['reader_waits']} reader waits")
+    lines.append(f"errors: {report['errors']}")
+    lines.extend(f"  {error}" for error in report["error_samples"])
+    if report["workdir"]:
+        lines.append(f"database copy and session logs kept in {report['workdir']}")
+    for failure in report["failed_sessions"]:
+        lines.append(f"session failed:\n{failure}")
+    return "\n".join(lines)
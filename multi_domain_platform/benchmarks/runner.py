@@ -0,0 +1,134 @@
+"""Run scenarios, write JSON results and compare two result files."""
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from .generator import generate, read_meta
+from .scenarios import BenchContext, Scenario, select
+
+
+def time_scenario(fn: Scenario, ctx: BenchContext, repeat: int = 5, max_seconds: float = 30.0) -> Dict[str, Any]:
+    """Run once to warm up, then up to repeat timed runs (fewer if they pass max_seconds)."""
+    result = fn(ctx)
+    timings: List[float] = []
+    budget = time.perf_counter() + max_seconds
+    while len(timings) < repeat and (not timings or time.perf_counter() < budget):
+        started = time.perf_counter()
+        fn(ctx)
+        timings.append((time.perf_counter() - started) * 1000)
+    ordered = sorted(timings)
+    return {
+        "median_ms": round(statistics.median(ordered), 3),
+        "min_ms": round(ordered[0], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "runs": len(ordered),
+        "items": result if isinstance(result, int) else None,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def prepare(db_path: str, scale: int, seed: int = 0, regenerate: bool = False) -> Dict[str, Any]:
+    """Metadata of a database matching scale and seed, generating it if needed."""
+    meta = read_meta(db_path)
+    if regenerate or meta is None or meta["scale"] != scale or meta["seed"] != seed:
+        meta = generate(db_path, scale=scale, seed=seed, overwrite=True)
+    return meta
+
+
+def run(db_path: str, scale: int, seed: int = 0, patterns: List[str] | None = None,
+        repeat: int = 5, max_seconds: float = 30.0, regenerate: bool = False,
+        progress=print) -> Dict[str, Any]:
+    """Run the selected scenarios and return the results document."""
+    meta = prepare(db_path, scale, seed, regenerate)
+    ctx = BenchContext(db_path, meta)
+    results = {}
+    for name, (group, fn) in select(patterns).items():
+        results[name] = {"group": group, **time_scenario(fn, ctx, repeat, max_seconds)}
+        if progress:
+            progress(f"{name:<36} {results[name]['median_ms']:>10.2f} ms")
+    return {
+        "meta": {
+            **meta,
+            "db_path": db_path,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def save(document: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file, indent=2)
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.15,
+            min_delta_ms: float = 1.0, metric: str = "min_ms") -> Dict[str, Any]:
+    """Compare two result documents scenario by scenario.
+
+    The best run (min_ms) is compared by default, as it is the least
+    disturbed by other load on the machine. A scenario regresses when it is
+    more than threshold (a fraction) slower and by more than min_delta_ms,
+    so sub-millisecond noise isn't flagged.
+    """
+    rows, regressions, improvements = [], [], []
+    old, new = baseline["results"], current["results"]
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name][metric], new[name][metric]
+        change = (after - before) / before if before else 0.0
+        status = "ok"
+        if change > threshold and after - before > min_delta_ms:
+            status = "regression"
+            regressions.append(name)
+        elif change < -threshold and before - after > min_delta_ms:
+            status = "improvement"
+            improvements.append(name)
+        rows.append({"name": name, "baseline_ms": before, "current_ms": after,
+                     "change": round(change, 4), "status": status})
+    same_data = all(baseline["meta"].get(k) == current["meta"].get(k) for k in ("scale", "seed"))
+    return {
+        "rows": rows,
+        "regressions": regressions,
+        "improvements": improvements,
+        "only_in_baseline": sorted(old.keys() - new.keys()),
+        "only_in_current": sorted(new.keys() - old.keys()),
+        "same_data": same_data,
+        "metric": metric,
+    }
+
+
+def format_comparison(report: Dict[str, Any]) -> str:
+    lines = [f"{'scenario':<36} {'baseline':>10} {'current':>10} {'change':>8}   ({report['metric']})"]
+    for row in report["rows"]:
+        flag = {"regression": "  << slower", "improvement": "  faster"}.get(row["status"], "")
+        lines.append(f"{row['name']:<36} {row['baseline_ms']:>10.2f} {row['current_ms']:>10.2f} "
+                     f"{row['change']:>+8.1%}{flag}")
+    for key, label in (("only_in_baseline", "missing now"), ("only_in_current", "new")):
+        if report[key]:
+            lines.append(f"{label}: {', '.join(report[key])}")
+    if not report["same_data"]:
+        lines.append("warning: results were measured at a different scale or seed")
+    lines.append(f"{len(report['regressions'])} regression(s), {len(report['improvements'])} improvement(s)")
+    return "\n".join(lines)
@@ -0,0 +1,223 @@
+"""Timed scenarios: data layer, model construction, page data preparation, auth.
+
+Each scenario is a function taking a BenchContext and returning the number
+of rows or items it produced (or None). Page scenarios repeat what a page
+script does on a rerun up to the point of handing data to Streamlit,
+including building the plotly figures.
+"""
+from datetime import date, timedelta
+from fnmatch import fnmatch
+from typing import Any, Callable, Dict, List, Tuple
+
+import pandas as pd
+import plotly.express as px
+
+from models.batches import IncidentBatch, TicketBatch
+from models.dataset import Dataset
+from models.it_ticket import ITTicket
+from models.security_incident import SecurityIncident
+from services.analytics_manager import AnalyticsManager
+from services.auth_manager import AuthManager, SessionTokens
+from services.database_manager import DatabaseManager
+from services.digest import DigestBuilder
+from services.llm_backends import StubBackend
+from services.password_hasher import PasswordHasher, hash_rounds
+from services.system_status import SystemStatus
+
+from .generator import BENCH_PASSWORD, BENCH_PASSWORD_HASH
+
+INCIDENT_COLUMNS = ["date_reported", "incident_type", "severity", "status", "description"]
+TICKET_COLUMNS = ["ticket_id", "date_created", "priority", "status", "assigned_to"]
+DATASET_COLUMNS = ["dataset_name", "last_updated", "source", "description"]
+
+
+class BenchContext:
+    """Shared state for one benchmark run over a generated database."""
+    def __init__(self, db_path: str, meta: Dict[str, Any]):
+        self.db_path = db_path
+        self.meta = meta
+        self.db = DatabaseManager(db_path)
+        self.cached_db = DatabaseManager(db_path, use_cache=True)
+        self.analytics = AnalyticsManager(self.db)
+        self.end_date = date.fromisoformat(meta["end_date"])
+        # same cost as the generated hashes (so logins don't re-hash them) and
+        # no admission limits: login numbers measure the lookup and one check
+        hasher = PasswordHasher(rounds=hash_rounds(BENCH_PASSWORD_HASH), processes=False,
+                                rate=1e9, user_rate=1e9, user_burst=1e9)
+        self.auth = AuthManager(self.db, hasher=hasher,
+                                tokens=SessionTokens(self.db, b"benchmark", recheck_interval=30.0))
+        self.token = self.auth.create_session({"username": "user0000000", "role": "analyst"})
+        self.users = meta["counts"]["users"]
+        self.calls = 0
+
+    def since(self, days: int) -> str:
+        """Start of the last `days` days up to end_date, like database.dates.period_start_iso."""
+        return (self.end_date - timedelta(days=days - 1)).isoformat()
+
+
+Scenario = Callable[[BenchContext], Any]
+SCENARIOS: Dict[str, Tuple[str, Scenario]] = {}
+
+
+def scenario(name: str, group: str):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = (group, fn)
+        return fn
+    return register
+
+
+# ---------- data layer ----------
+@scenario("fetch_page.incidents_first", "data")
+def _incidents_first_page(ctx: BenchContext):
+    return len(ctx.db.fetch_page("cyber_incidents", INCIDENT_COLUMNS, descending=True,
+                                 page_size=25)["rows"])
+
+
+@scenario("fetch_page.incidents_20_pages", "data")
+def _incidents_20_pages(ctx: BenchContext):
+    cursor, rows = None, 0
+    for _ in range(20):
+        page = ctx.db.fetch_page("cyber_incidents", INCIDENT_COLUMNS, descending=True,
+                                 page_size=25, cursor=cursor)
+        rows += len(page["rows"])
+        cursor = page["next_cursor"]
+    return rows
+
+
+@scenario("fetch_page.tickets_filtered", "data")
+def _tickets_filtered_page(ctx: BenchContext):
+    return len(ctx.db.fetch_page("it_tickets", TICKET_COLUMNS, descending=True,
+                                 filters={"priority": "Network Issue"}, page_size=25)["rows"])
+
+
+@scenario("fetch_date_range.incidents_30d", "data")
+def _incidents_last_30_days(ctx: BenchContext):
+    return len(ctx.db.fetch_date_range("cyber_incidents", "date_reported", INCIDENT_COLUMNS,
+                                       start=ctx.since(30), end=ctx.end_date))
+
+
+@scenario("fetch_iter.incidents_scan", "data")
+def _incidents_scan(ctx: BenchContext):
+    return sum(1 for _ in ctx.db.fetch_iter("SELECT * FROM cyber_incidents"))
+
+
+@scenario("read_dataframe.tickets", "data")
+def _tickets_dataframe(ctx: BenchContext):
+    return len(ctx.db.read_dataframe("SELECT * FROM it_tickets"))
+
+
+# ---------- models ----------
+@scenario("models.security_incidents_10k", "models")
+def _incident_objects(ctx: BenchContext):
+    rows = ctx.db.fetch_iter(f"SELECT {', '.join(INCIDENT_COLUMNS)} FROM cyber_incidents LIMIT 10000")
+    return len([SecurityIncident(*row) for row in rows])
+
+
+@scenario("models.incident_batch", "models")
+def _incident_batch(ctx: BenchContext):
+    return len(IncidentBatch.from_rows(ctx.db.fetch_iter(
+        "SELECT date_reported, incident_type, severity, status, description FROM cyber_incidents")))
+
+
+@scenario("models.ticket_batch", "models")
+def _ticket_batch(ctx: BenchContext):
+    return len(TicketBatch.from_rows(ctx.db.fetch_iter(
+        "SELECT ticket_id, date_created, priority, status, assigned_to FROM it_tickets")))
+
+
+# ---------- page data preparation ----------
+def _cybersecurity(db: DatabaseManager, since: str | None):
+    analytics = AnalyticsManager(db)
+    metrics = analytics.incident_metrics()
+    type_counts = pd.DataFrame(analytics.incidents_by_type(), columns=["Type", "count"])
+    px.bar(type_counts, x="Type", y="count", title="Incidents by Type", color="count")
+    timeline = pd.DataFrame(analytics.incidents_over_time(since=since),
+                            columns=["Date", "Type", "Severity", "Count"])
+    if not timeline.empty:
+        px.scatter(timeline, x="Date", y="Type", color="Severity", size="Count",
+                   title="Incidents Over Time", hover_data=["Count"])
+    page = db.fetch_page("cyber_incidents", ["id", *INCIDENT_COLUMNS], descending=True, page_size=25)
+    [(row[0], SecurityIncident(*row[1:])) for row in page["rows"]]
+    return metrics["total"]
+
+
+@scenario("page.cybersecurity", "pages")
+def _cybersecurity_page(ctx: BenchContext):
+    return _cybersecurity(ctx.db, None)
+
+
+@scenario("page.cybersecurity_30d", "pages")
+def _cybersecurity_page_30_days(ctx: BenchContext):
+    return _cybersecurity(ctx.db, ctx.since(30))
+
+
+@scenario("page.cybersecurity_cached", "pages")
+def _cybersecurity_page_cached(ctx: BenchContext):
+    # a warm rerun: everything after the first call is answered by the query cache
+    return _cybersecurity(ctx.cached_db, None)
+
+
+@scenario("page.it_operations", "pages")
+def _it_operations_page(ctx: BenchContext):
+    analytics = ctx.analytics
+    priority_rows = analytics.tickets_by_priority()
+    analytics.ticket_metrics()
+    priority_counts = pd.DataFrame(priority_rows, columns=["Priority", "Count"])
+    px.bar(priority_counts, x="Priority", y="Count", color="Priority", title="Tickets by Priority")
+    analytics.ticket_metrics("Network Issue")
+    page = ctx.db.fetch_page("it_tickets", TICKET_COLUMNS, descending=True,
+                             filters={"priority": "Network Issue"}, page_size=25)
+    return len([ITTicket(*row) for row in page["rows"]])
+
+
+@scenario("page.data_science", "pages")
+def _data_science_page(ctx: BenchContext):
+    analytics = ctx.analytics
+    total = analytics.dataset_count()
+    page = ctx.db.fetch_page("datasets_metadata", DATASET_COLUMNS, page_size=50)
+    [Dataset(*row) for row in page["rows"]]
+    source_counts = pd.DataFrame(analytics.datasets_by_source(), columns=["Source", "Count"])
+    px.pie(source_counts, values="Count", names="Source", title="Dataset Sources Distribution",
+           color="Source", color_discrete_sequence=px.colors.qualitative.Set3)
+    return total
+
+
+@scenario("page.home_status", "pages")
+def _home_status(ctx: BenchContext):
+    # stub backend passed in: the scenario must not depend on LLM_BACKEND or an API key
+    snap = SystemStatus(ctx.db_path, backend=StubBackend()).snapshot()
+    return snap["total_rows"]
+
+
+@scenario("digest.incidents", "pages")
+def _incident_digest(ctx: BenchContext):
+    return DigestBuilder(ctx.db).incident_digest()["digest_tokens"]
+
+
+@scenario("digest.tickets", "pages")
+def _ticket_digest(ctx: BenchContext):
+    return DigestBuilder(ctx.db).ticket_digest()["digest_tokens"]
+
+
+# ---------- auth ----------
+@scenario("auth.login_password", "auth")
+def _login_password(ctx: BenchContext):
+    ctx.calls += 1
+    user = ctx.auth.login_user_with_role(f"user{ctx.calls % ctx.users:07d}", BENCH_PASSWORD)
+    assert user is not None
+    return 1
+
+
+@scenario("auth.login_token", "auth")
+def _login_token(ctx: BenchContext):
+    for _ in range(1000):
+        ctx.auth.login_with_token(ctx.token)
+    return 1000
+
+
+def select(patterns: List[str] | None) -> Dict[str, Tuple[str, Scenario]]:
+    """Scenarios in any of the given groups or matching a name glob or prefix (all when None)."""
+    if not patterns:
+        return dict(SCENARIOS)
+    return {name: (group, fn) for name, (group, fn) in SCENARIOS.items()
+            if any(p == group or name.startswith(p) or fnmatch(name, p) for p in patterns)}
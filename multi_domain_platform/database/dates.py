@@ -0,0 +1,80 @@
+"""Helpers for the sortable date format stored in the database.
+
+Dates are kept as ISO-8601 text (YYYY-MM-DD, or YYYY-MM-DD HH:MM:SS when a
+time is known) so they sort correctly and can be range-scanned on an index.
+All of them are local time: "today" is date.today() in Python and the
+SQL_TODAY/SQL_NOW expressions below in column defaults and triggers, so
+both domains agree on which day a row belongs to.
+"""
+from datetime import date, datetime, timedelta
+
+ISO_DATE = "%Y-%m-%d"
+ISO_DATETIME = "%Y-%m-%d %H:%M:%S"
+
+# upper bound for open-ended ranges; also keeps unparseable legacy text
+# (which sorts after digits) out of range scans
+MAX_ISO = "9999-12-31 23:59:59"
+
+# SQLite expressions for the current local date and time (CURRENT_TIMESTAMP would be UTC)
+SQL_TODAY = "date('now', 'localtime')"
+SQL_NOW = "datetime('now', 'localtime')"
+
+# formats found in older rows and CSV imports, tried in order
+LEGACY_FORMATS = (
+    "%m/%d/%Y",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%Y/%m/%d",
+    "%Y-%m-%dT%H:%M:%S",
+    "%d-%m-%Y",
+)
+
+
+def parse_date(value) -> datetime | None:
+    """Parse an ISO or legacy date string; returns None when it can't be read."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if not value:
+        return None
+    text = str(value).strip()
+    for fmt in (ISO_DATE, ISO_DATETIME, *LEGACY_FORMATS):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def to_iso(value, with_time: bool = False) -> str | None:
+    """Convert a date, datetime or date string to the stored ISO text."""
+    parsed = parse_date(value)
+    if parsed is None:
+        return None
+    return parsed.strftime(ISO_DATETIME if with_time else ISO_DATE)
+
+
+def today_iso() -> str:
+    return date.today().strftime(ISO_DATE)
+
+
+def days_ago_iso(days: int) -> str:
+    return (date.today() - timedelta(days=days)).strftime(ISO_DATE)
+
+
+def period_start_iso(days: int) -> str:
+    """First day of the last `days` calendar days, today included.
+
+    "Last 7 days" is today and the six days before it; days_ago_iso(7) as
+    an inclusive start would cover eight.
+    """
+    return days_ago_iso(days - 1)
+
+
+def next_day_iso(value) -> str | None:
+    """ISO date of the day after value, used as an exclusive range end."""
+    parsed = parse_date(value)
+    if parsed is None:
+        return None
+    return (parsed.date() + timedelta(days=1)).strftime(ISO_DATE)
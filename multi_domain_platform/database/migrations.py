@@ -0,0 +1,488 @@
+"""Versioned schema migrations for the intelligence platform database.
+
+The applied version is stored in SQLite's PRAGMA user_version. Each migration
+runs once, in order, inside the caller's transaction. Run this module directly
+(python -m database.migrations) to migrate the default database and print
+the plans of the queries the pages run.
+"""
+import sqlite3
+from typing import Callable, Dict, List, Tuple
+
+from database.dates import SQL_NOW, SQL_TODAY, period_start_iso, to_iso
+
+
+class MigrationError(RuntimeError):
+    """Raised when existing data prevents a migration from being applied."""
+
+
+# column definitions every table must end up with, in creation order
+TABLES: Dict[str, List[Tuple[str, str]]] = {
+    "users": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("username", "TEXT NOT NULL"),
+        ("password_hash", "TEXT"),
+        ("role", "TEXT DEFAULT 'user'"),
+    ],
+    "cyber_incidents": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("date_reported", "TEXT"),
+        ("incident_type", "TEXT"),
+        ("severity", "TEXT"),
+        ("status", "TEXT DEFAULT 'Open'"),
+        ("description", "TEXT"),
+    ],
+    "it_tickets": [
+        ("ticket_id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("date_created", f"TEXT DEFAULT ({SQL_NOW})"),
+        ("priority", "TEXT"),
+        ("status", "TEXT DEFAULT 'Open'"),
+        ("assigned_to", "TEXT"),
+        ("description", "TEXT"),
+    ],
+    "datasets_metadata": [
+        ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        ("dataset_name", "TEXT NOT NULL"),
+        ("last_updated", "TEXT"),
+        ("source", "TEXT"),
+        ("description", "TEXT"),
+    ],
+}
+
+# names older hand-made databases used for a table's key column
+KEY_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "users": ("user_id",),
+    "cyber_incidents": ("incident_id",),
+    "it_tickets": ("id",),
+    "datasets_metadata": ("dataset_id",),
+}
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Column names in lower case: SQLite matches them case-insensitively."""
+    return [row[1].lower() for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _key_column(table: str) -> str:
+    return TABLES[table][0][0]
+
+
+def _has_primary_key(conn: sqlite3.Connection, table: str) -> bool:
+    """True when the table's key column is its INTEGER PRIMARY KEY (a rowid alias)."""
+    return any(row[1].lower() == _key_column(table) and row[5]
+               for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _rename_legacy_key(conn: sqlite3.Connection, table: str) -> None:
+    """Rename a legacy key column such as dataset_id to the table's key column.
+
+    Only a column holding integers is renamed; any other is kept under its
+    own name and the key is taken from the rowid. RENAME COLUMN rewrites
+    the indexes, triggers and views that use the column.
+    """
+    existing = _columns(conn, table)
+    key = _key_column(table)
+    if key in existing:
+        return
+    for alias in KEY_ALIASES.get(table, ()):
+        if alias not in existing:
+            continue
+        other = conn.execute(f"SELECT 1 FROM {table} WHERE typeof({alias}) NOT IN ('integer', 'null') "
+                             f"LIMIT 1").fetchone()
+        if other is None:
+            conn.execute(f"ALTER TABLE {table} RENAME COLUMN {alias} TO {key}")
+            return
+
+
+def _rebuild_table(conn: sqlite3.Connection, table: str) -> None:
+    """Recreate a table with its TABLES definition, keeping rows, columns, indexes and triggers.
+
+    ALTER TABLE can't add a primary key or change a default, so the rows
+    are copied into a new table that is then renamed. A missing key column
+    takes each row's rowid, as does a NULL key; other missing columns are
+    left NULL. Columns TABLES doesn't know are carried over with their
+    type, constraints and values, so nothing stored is lost. Views and
+    triggers are dropped for the swap and created again afterwards.
+    """
+    extras = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL AND "
+        "((type = 'index' AND tbl_name = ?) OR type IN ('view', 'trigger')) "
+        "ORDER BY CASE type WHEN 'index' THEN 0 WHEN 'view' THEN 1 ELSE 2 END",
+        (table,)).fetchall()
+    known = [name for name, _decl in TABLES[table]]
+    key = _key_column(table)
+    definitions = [f"{name} {decl}" for name, decl in TABLES[table]]
+    names, values = list(known), []
+    legacy = list(conn.execute(f"PRAGMA table_info({table})"))
+    existing = [row[1].lower() for row in legacy]
+    for name in known:
+        if name == key:
+            values.append(f"COALESCE({name}, rowid)" if name in existing else "rowid")
+        else:
+            values.append(name if name in existing else "NULL")
+    single_key = sum(1 for row in legacy if row[5]) == 1
+    for _cid, name, decl, notnull, default, pk in legacy:
+        if name.lower() in known:
+            continue
+        definition = f"{_quote(name)} {decl}"
+        if notnull:
+            definition += " NOT NULL"
+        if default is not None:
+            definition += f" DEFAULT ({default})"
+        if pk and single_key:
+            definition += " UNIQUE"
+        definitions.append(definition)
+        names.append(_quote(name))
+        values.append(_quote(name))
+    body = ",\n    ".join(definitions)
+    conn.execute(f"CREATE TABLE {table}__rebuilt (\n    {body}\n)")
+    try:
+        conn.execute(f"INSERT INTO {table}__rebuilt ({', '.join(names)}) "
+                     f"SELECT {', '.join(values)} FROM {table} ORDER BY rowid")
+    except sqlite3.IntegrityError as e:
+        raise MigrationError(f"Cannot rebuild {table} with {key} as its primary key: {e}") from e
+    # the rename checks every view and trigger, so none may point at a missing table
+    for kind, name, _sql in extras:
+        if kind != "index":
+            conn.execute(f"DROP {kind.upper()} {_quote(name)}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}__rebuilt RENAME TO {table}")
+    for _kind, _name, sql in extras:
+        conn.execute(sql)
+
+
+def _create_domain_tables(conn: sqlite3.Connection) -> None:
+    """Create all four tables and bring older databases to the same columns."""
+    for table, columns in TABLES.items():
+        body = ",\n    ".join(f"{name} {decl}" for name, decl in columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    {body}\n)")
+        _rename_legacy_key(conn, table)
+        if not _has_primary_key(conn, table):
+            _rebuild_table(conn, table)
+            continue
+        existing = _columns(conn, table)
+        for name, decl in columns:
+            if name in existing:
+                continue
+            # ALTER TABLE can't add NOT NULL columns without a default, or expression
+            # defaults (migration 3 gives it_tickets.date_created its default)
+            decl = decl.replace("NOT NULL", "")
+            if "DEFAULT (" in decl:
+                decl = "TEXT"
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl.strip()}")
+
+
+def _check_unique(conn: sqlite3.Connection, table: str, column: str) -> None:
+    duplicates = conn.execute(
+        f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column} HAVING COUNT(*) > 1 LIMIT 5"
+    ).fetchall()
+    if duplicates:
+        names = ", ".join(repr(value) for value, _ in duplicates)
+        raise MigrationError(
+            f"Cannot add a unique index on {table}.{column}; duplicate values: {names}"
+        )
+
+
+def _add_indexes(conn: sqlite3.Connection) -> None:
+    """Secondary indexes for the filters the pages use."""
+    _check_unique(conn, "users", "username")
+    _check_unique(conn, "datasets_metadata", "dataset_name")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_incidents_status_severity "
+                 "ON cyber_incidents(status, severity)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_incidents_date_reported "
+                 "ON cyber_incidents(date_reported)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_priority_status "
+                 "ON it_tickets(priority, status)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_datasets_name "
+                 "ON datasets_metadata(dataset_name)")
+
+
+def _normalize_dates(conn: sqlite3.Connection, batch_size: int = 10000) -> None:
+    """Rewrite legacy MM/DD/YYYY style dates as sortable ISO-8601 text.
+
+    Rows are walked in rowid batches so the backfill never holds the whole
+    table in memory. Values that can't be parsed are left as they are.
+    New tickets default to the local time (see database/dates.py); a table
+    with another default, such as UTC CURRENT_TIMESTAMP, or none is rebuilt
+    for it. Timestamps already stored are kept: there is no telling which
+    came from a default.
+    """
+    defaults = {row[1].lower(): row[4] for row in conn.execute("PRAGMA table_info(it_tickets)")}
+    if defaults.get("date_created") != SQL_NOW:
+        _rebuild_table(conn, "it_tickets")
+    for table, column, with_time in (("cyber_incidents", "date_reported", False),
+                                     ("it_tickets", "date_created", True)):
+        last_rowid = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid, {column} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+            updates = []
+            for rowid, value in rows:
+                iso = to_iso(value, with_time) if value else None
+                if iso and iso != value:
+                    updates.append((iso, rowid))
+            conn.executemany(f"UPDATE {table} SET {column} = ? WHERE rowid = ?", updates)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_date_created "
+                 "ON it_tickets(date_created)")
+
+
+def _create_ai_response_cache(conn: sqlite3.Connection) -> None:
+    """Persistent cache of assistant replies, see services/response_cache.py."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_response_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            domain TEXT,
+            chunks TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used "
+                 "ON ai_response_cache(last_used)")
+
+
+def _create_analysis_jobs(conn: sqlite3.Connection) -> None:
+    """Background AI analyses and their results, see services/job_queue.py."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            created_by TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            owner TEXT,
+            heartbeat_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_created "
+                 "ON analysis_jobs(kind, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status "
+                 "ON analysis_jobs(status)")
+
+
+def _create_user_sessions(conn: sqlite3.Connection) -> None:
+    """Login sessions behind signed tokens, see SessionTokens in services/auth_manager.py."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            session_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            revoked INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username "
+                 "ON user_sessions(username)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires "
+                 "ON user_sessions(expires_at)")
+
+
+# tables whose row counts the Home page shows, see services/system_status.py
+COUNTED_TABLES = ("cyber_incidents", "it_tickets", "datasets_metadata", "users")
+
+
+def _add_table_counters(conn: sqlite3.Connection) -> None:
+    """Row counts and rows added per day, kept current by triggers.
+
+    Counting once here lets the Home page read a few rows by primary key
+    instead of running COUNT(*) over every table on each visit. Each
+    inserted or deleted row costs one extra primary-key update.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS table_stats (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            last_insert_at TEXT
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS table_daily_inserts (
+            table_name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, day)
+        ) WITHOUT ROWID
+    """)
+    for table in COUNTED_TABLES:
+        conn.execute(f"INSERT OR REPLACE INTO table_stats (table_name, row_count) "
+                     f"SELECT '{table}', COUNT(*) FROM {table}")
+        # local time, like database.dates.today_iso()
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count + 1,
+                       last_insert_at = {SQL_NOW}
+                 WHERE table_name = '{table}';
+                INSERT INTO table_daily_inserts (table_name, day, inserted)
+                VALUES ('{table}', {SQL_TODAY}, 1)
+                ON CONFLICT (table_name, day) DO UPDATE SET inserted = inserted + 1;
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count - 1 WHERE table_name = '{table}';
+            END
+        """)
+
+
+def _add_ticket_priority_index(conn: sqlite3.Connection) -> None:
+    """The filtered ticket list seeks one priority and reads it newest first.
+
+    idx_tickets_priority_status puts status between priority and the rowid,
+    so that list was sorted in a temp b-tree on every page.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_priority ON it_tickets(priority)")
+
+
+# (version, description, function) - append new migrations, never edit old ones
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "create domain tables", _create_domain_tables),
+    (2, "add secondary indexes", _add_indexes),
+    (3, "store dates as ISO-8601", _normalize_dates),
+    (4, "add AI response cache table", _create_ai_response_cache),
+    (5, "add analysis job table", _create_analysis_jobs),
+    (6, "add user session table", _create_user_sessions),
+    (7, "add trigger-maintained table counters", _add_table_counters),
+    (8, "add ticket priority index", _add_ticket_priority_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> List[int]:
+    """Apply every pending migration and return the versions that ran.
+
+    The caller owns the transaction, so a failing migration leaves the
+    database at the version it started from.
+    """
+    current = get_version(conn)
+    applied = []
+    for version, _description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+        applied.append(version)
+    return applied
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> List[str]:
+    """Return the detail column of EXPLAIN QUERY PLAN for a statement."""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+class _QueryRecorder:
+    """Stands in for DatabaseManager to capture the SQL AnalyticsManager builds."""
+    def __init__(self):
+        self.queries: List[Tuple[str, tuple]] = []
+
+    def fetch_one(self, sql: str, params=()):
+        self.queries.append((sql, tuple(params)))
+        return (0, 0, 0)
+
+    def fetch_all(self, sql: str, params=()):
+        self.queries.append((sql, tuple(params)))
+        return []
+
+
+def hot_queries() -> List[Tuple[str, str, tuple, str | None]]:
+    """(page, sql, params, expectation) for the statements the pages run on every visit.
+
+    The SQL comes from fetch_page, AnalyticsManager and AuthManager themselves,
+    with parameters like the pages pass, so a change there is checked too.
+    Expectations: "seek" - no full scan of a table; "ordered" - rows come in
+    the ORDER BY order, so LIMIT stops early; "covering" - scans read an
+    index only; None - a chart over every row, shown but not checked.
+    """
+    # imported here: services import this module for the migrations
+    from services.analytics_manager import AnalyticsManager
+    from services.database_manager import DatabaseManager
+
+    def analytics(call) -> Tuple[str, tuple]:
+        recorder = _QueryRecorder()
+        call(AnalyticsManager(recorder))
+        return recorder.queries[0]
+
+    incident_columns = ["id", "date_reported", "incident_type", "severity", "status", "description"]
+    ticket_columns = ["ticket_id", "date_created", "priority", "status", "assigned_to"]
+    dataset_columns = ["dataset_name", "last_updated", "source", "description"]
+    deeper = DatabaseManager._encode_cursor((1000, 1000), "rowid", True)
+    checks = [
+        ("Login", ("SELECT password_hash, role FROM users WHERE username = ?", ("admin",)), "seek"),
+        ("Login", ("SELECT revoked FROM user_sessions WHERE session_id = ?", ("0" * 32,)), "seek"),
+        ("Cybersecurity", analytics(lambda a: a.incident_metrics()), "covering"),
+        ("Cybersecurity", analytics(lambda a: a.incidents_by_type()), None),
+        ("Cybersecurity", analytics(lambda a: a.incidents_over_time(since=period_start_iso(30))), "seek"),
+        ("Cybersecurity", DatabaseManager.page_query("cyber_incidents", incident_columns,
+                                                     descending=True, page_size=25), "ordered"),
+        ("Cybersecurity", DatabaseManager.page_query("cyber_incidents", incident_columns, descending=True,
+                                                     page_size=25, cursor=deeper), "seek"),
+        ("IT Operations", analytics(lambda a: a.tickets_by_priority()), "covering"),
+        ("IT Operations", analytics(lambda a: a.ticket_metrics("Network Issue")), "covering"),
+        ("IT Operations", DatabaseManager.page_query("it_tickets", ticket_columns, descending=True,
+                                                     filters={"priority": "Network Issue"},
+                                                     page_size=25), "ordered"),
+        ("Data Science", analytics(lambda a: a.dataset_count()), "covering"),
+        ("Data Science", analytics(lambda a: a.datasets_by_source()), None),
+        ("Data Science", DatabaseManager.page_query("datasets_metadata", dataset_columns,
+                                                    page_size=50), "ordered"),
+    ]
+    return [(page, sql, params, expect) for page, (sql, params), expect in checks]
+
+
+def _meets(plan: List[str], expect: str | None) -> bool:
+    if expect == "seek":
+        return not any(step.startswith("SCAN") for step in plan)
+    if expect == "ordered":
+        return not any("TEMP B-TREE FOR ORDER BY" in step for step in plan)
+    if expect == "covering":
+        return all("COVERING INDEX" in step for step in plan if step.startswith("SCAN"))
+    return True
+
+
+def check_hot_query_plans(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Return "page: sql" -> plan for every hot query whose plan misses its expectation."""
+    problems = {}
+    for page, sql, params, expect in hot_queries():
+        plan = explain(conn, sql, params)
+        if not _meets(plan, expect):
+            problems[f"{page}: {' '.join(sql.split())}"] = plan
+    return problems
+
+
+if __name__ == "__main__":
+    connection = sqlite3.connect("database/intelligence_platform.db")
+    connection.execute("BEGIN IMMEDIATE")
+    ran = apply_migrations(connection)
+    connection.commit()
+    print(f"Schema at version {get_version(connection)} (applied: {ran or 'none'})")
+    for page_name, query, query_params, expected in hot_queries():
+        print(f"{page_name} [{expected or '-'}] {' '.join(query.split())}")
+        print(f"    {' | '.join(explain(connection, query, query_params))}")
+    failing = check_hot_query_plans(connection)
+    connection.close()
+    if failing:
+        raise SystemExit("Hot queries missing their expected plan:\n" + "\n".join(failing))
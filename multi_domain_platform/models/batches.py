@@ -0,0 +1,304 @@
+"""Columnar containers for large numbers of incidents and tickets.
+
+One Python object per row costs a few hundred bytes before counting the
+strings. These batches keep each column in a NumPy array instead, with the
+low-cardinality text columns (type, severity, status, ...) dictionary-encoded
+as small integer codes and dates as datetime64[s], so metrics become
+vectorized array operations.
+"""
+from array import array
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+from models.it_ticket import ITTicket
+from models.security_incident import SEVERITY_LEVELS, SecurityIncident
+
+
+class CategoryColumn:
+    """A text column stored as int32 codes into a list of distinct values."""
+    __slots__ = ("codes", "categories", "_lookup")
+
+    def __init__(self, codes: np.ndarray, categories: List[Any]):
+        self.codes = codes
+        self.categories = categories
+        self._lookup = {value: code for code, value in enumerate(categories)}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int):
+        return self.categories[self.codes[index]]
+
+    def mask(self, value) -> np.ndarray:
+        """Boolean array marking the rows equal to value."""
+        code = self._lookup.get(value)
+        if code is None:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == code
+
+    def counts(self) -> Dict[Any, int]:
+        """Value -> row count, largest first."""
+        totals = np.bincount(self.codes, minlength=len(self.categories))
+        order = np.argsort(-totals, kind="stable")
+        return {self.categories[i]: int(totals[i]) for i in order if totals[i]}
+
+    def map_categories(self, fn, dtype=np.int8) -> np.ndarray:
+        """Apply fn once per distinct value and broadcast the result to every row."""
+        table = np.array([fn(value) for value in self.categories], dtype=dtype)
+        if not len(table):
+            return np.zeros(len(self.codes), dtype=dtype)
+        return table[self.codes]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+class _CategoryBuilder:
+    """Incrementally dictionary-encodes values while rows stream in."""
+    __slots__ = ("codes", "categories", "lookup")
+
+    def __init__(self):
+        self.codes = array("i")
+        self.categories: List[Any] = []
+        self.lookup: Dict[Any, int] = {}
+
+    def append(self, value) -> None:
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.lookup[value] = code
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def build(self) -> CategoryColumn:
+        return CategoryColumn(np.frombuffer(self.codes, dtype=np.int32).copy(), self.categories)
+
+
+_NAT = int(np.datetime64("NaT", "s").astype(np.int64))
+
+
+def _to_seconds(value) -> int:
+    """Seconds since the epoch for an ISO date or timestamp; NaT when it doesn't parse."""
+    if value is None:
+        return _NAT
+    try:
+        return int(np.datetime64(str(value)[:19].replace(" ", "T"), "s").astype(np.int64))
+    except ValueError:
+        return _NAT
+
+
+class _DateBuilder:
+    """Parses ISO dates into a datetime64[s] column while rows stream in.
+
+    Values are parsed by NumPy a chunk at a time, so only one chunk of
+    strings is held; a chunk with a value NumPy can't parse is redone one
+    value at a time.
+    """
+    __slots__ = ("pending", "parsed")
+    CHUNK = 4096
+
+    def __init__(self):
+        self.pending: List[Any] = []
+        self.parsed: List[np.ndarray] = []
+
+    def append(self, value) -> None:
+        self.pending.append(value)
+        if len(self.pending) >= self.CHUNK:
+            self._flush()
+
+    def _flush(self) -> None:
+        try:
+            chunk = np.array(self.pending, dtype="datetime64[s]")
+        except ValueError:
+            chunk = np.array([_to_seconds(value) for value in self.pending], dtype=np.int64).view("datetime64[s]")
+        self.parsed.append(chunk)
+        self.pending = []
+
+    def build(self) -> np.ndarray:
+        if self.pending:
+            self._flush()
+        if not self.parsed:
+            return np.zeros(0, dtype="datetime64[s]")
+        return np.concatenate(self.parsed)
+
+
+def _date_counts(values: np.ndarray, unit: str) -> Dict[Any, int]:
+    """Date -> row count, largest first, with dates decoded like __getitem__ does.
+
+    Rows whose date didn't parse are counted under None.
+    """
+    missing = np.isnat(values)
+    dates, totals = np.unique(values[~missing].astype(f"datetime64[{unit}]"), return_counts=True)
+    order = np.argsort(-totals, kind="stable")
+    counts = {dates[i].item(): int(totals[i]) for i in order}
+    if missing.any():
+        counts[None] = int(missing.sum())
+    return counts
+
+
+class IncidentBatch:
+    """Columnar batch of security incidents.
+
+    Rows use the SecurityIncident argument order:
+    (date_reported, incident_type, severity, status, description).
+    date_reported is a datetime64[s] array; indexing a row gives it back
+    as a datetime.date (None when it didn't parse).
+    """
+    __slots__ = ("date_reported", "incident_type", "severity", "status", "descriptions")
+    COLUMNS = ("date_reported", "incident_type", "severity", "status", "description")
+
+    def __init__(self, date_reported: np.ndarray, incident_type: CategoryColumn,
+                 severity: CategoryColumn, status: CategoryColumn,
+                 descriptions: List[str] | None = None):
+        self.date_reported = date_reported
+        self.incident_type = incident_type
+        self.severity = severity
+        self.status = status
+        self.descriptions = descriptions
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, include_descriptions: bool = True) -> "IncidentBatch":
+        """Build a batch from any row iterable, e.g. a sqlite3 cursor, in one pass."""
+        dates = _DateBuilder()
+        types, severities, statuses = (_CategoryBuilder() for _ in range(3))
+        descriptions: List[str] | None = [] if include_descriptions else None
+        for row in rows:
+            dates.append(row[0])
+            types.append(row[1])
+            severities.append(row[2])
+            statuses.append(row[3])
+            if descriptions is not None:
+                descriptions.append(row[4] if len(row) > 4 else None)
+        return cls(dates.build(), types.build(), severities.build(), statuses.build(), descriptions)
+
+    def __len__(self) -> int:
+        return len(self.severity)
+
+    def __getitem__(self, index: int) -> SecurityIncident:
+        return SecurityIncident(
+            self.date_reported[index].astype("datetime64[D]").item(),
+            self.incident_type[index], self.severity[index],
+            self.status[index], self.descriptions[index] if self.descriptions is not None else None,
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def severity_levels(self) -> np.ndarray:
+        """Vectorized SecurityIncident.get_severity_level for every row."""
+        return self.severity.map_categories(
+            lambda value: SEVERITY_LEVELS.get(str(value or "").lower(), 0)
+        )
+
+    def status_mask(self, status: str) -> np.ndarray:
+        return self.status.mask(status)
+
+    def severity_mask(self, min_level: int) -> np.ndarray:
+        return self.severity_levels() >= min_level
+
+    def count_by(self, column: str) -> Dict[Any, int]:
+        """Counts for one of date_reported, incident_type, severity or status."""
+        if column not in self.COLUMNS[:4]:
+            raise ValueError(f"Cannot count by {column!r}")
+        if column == "date_reported":
+            return _date_counts(self.date_reported, "D")
+        return getattr(self, column).counts()
+
+    def dates(self) -> np.ndarray:
+        """date_reported as datetime64[D]; unparseable dates are NaT."""
+        return self.date_reported.astype("datetime64[D]")
+
+    def metrics(self) -> Dict[str, int]:
+        """Same numbers as AnalyticsManager.incident_metrics, computed in memory."""
+        return {
+            "total": len(self),
+            "open": int(self.status_mask("Open").sum()),
+            "medium_or_above": int(self.severity_mask(2).sum()),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays (descriptions not included)."""
+        return self.date_reported.nbytes + sum(c.nbytes for c in (
+            self.incident_type, self.severity, self.status))
+
+
+class TicketBatch:
+    """Columnar batch of IT tickets.
+
+    Rows use the ITTicket argument order:
+    (ticket_id, date_created, priority, status, assigned_to).
+    date_created is a datetime64[s] array; indexing a row gives it back
+    as a datetime.datetime (None when it didn't parse).
+    """
+    __slots__ = ("ticket_id", "date_created", "priority", "status", "assigned_to")
+    COLUMNS = ("ticket_id", "date_created", "priority", "status", "assigned_to")
+
+    def __init__(self, ticket_id: np.ndarray, date_created: np.ndarray,
+                 priority: CategoryColumn, status: CategoryColumn, assigned_to: CategoryColumn):
+        self.ticket_id = ticket_id
+        self.date_created = date_created
+        self.priority = priority
+        self.status = status
+        self.assigned_to = assigned_to
+
+    @classmethod
+    def from_rows(cls, rows: Iterable) -> "TicketBatch":
+        """Build a batch from any row iterable, e.g. a sqlite3 cursor, in one pass."""
+        ids = array("q")
+        dates = _DateBuilder()
+        priorities, statuses, assignees = (_CategoryBuilder() for _ in range(3))
+        for row in rows:
+            ids.append(row[0] if row[0] is not None else -1)
+            dates.append(row[1])
+            priorities.append(row[2])
+            statuses.append(row[3])
+            assignees.append(row[4])
+        return cls(np.frombuffer(ids, dtype=np.int64).copy(), dates.build(),
+                   priorities.build(), statuses.build(), assignees.build())
+
+    def __len__(self) -> int:
+        return len(self.ticket_id)
+
+    def __getitem__(self, index: int) -> ITTicket:
+        return ITTicket(int(self.ticket_id[index]), self.date_created[index].item(),
+                        self.priority[index], self.status[index], self.assigned_to[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def status_mask(self, status: str) -> np.ndarray:
+        return self.status.mask(status)
+
+    def priority_mask(self, priority: str) -> np.ndarray:
+        return self.priority.mask(priority)
+
+    def count_by(self, column: str) -> Dict[Any, int]:
+        """Counts for one of date_created, priority, status or assigned_to."""
+        if column not in self.COLUMNS[1:]:
+            raise ValueError(f"Cannot count by {column!r}")
+        if column == "date_created":
+            return _date_counts(self.date_created, "s")
+        return getattr(self, column).counts()
+
+    def dates(self) -> np.ndarray:
+        """date_created as datetime64[D]; unparseable dates are NaT."""
+        return self.date_created.astype("datetime64[D]")
+
+    def metrics(self, priority: str | None = None) -> Dict[str, int]:
+        """Same numbers as AnalyticsManager.ticket_metrics, computed in memory."""
+        selected = self.priority_mask(priority) if priority else np.ones(len(self), dtype=bool)
+        return {
+            "total": len(self),
+            "filtered": int(selected.sum()),
+            "open": int((selected & self.status_mask("Open")).sum()),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return self.ticket_id.nbytes + self.date_created.nbytes + sum(c.nbytes for c in (
+            self.priority, self.status, self.assigned_to))
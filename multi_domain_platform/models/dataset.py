@@ -1,5 +1,6 @@
 class Dataset:
     """Represents a data science dataset in the platform."""
+    __slots__ = ("__name", "__last_updated", "__description", "__source")
 
     def __init__(self, name: str, last_updated: str, description: str, source: str):   
         self.__name = name
@@ -1,5 +1,6 @@
 class ITTicket:
     """Represents an IT support ticket."""
+    __slots__ = ("__id", "__date_created", "__priority", "__status", "__assigned_to")
     def __init__(self, ticket_id: int, date_created: str, priority: str, status:str,assigned_to:str):
         self.__id = ticket_id
         self.__date_created = date_created
@@ -1,5 +1,15 @@
+# severity name -> level, shared with the columnar IncidentBatch
+SEVERITY_LEVELS = {
+    "low": 1,
+    "medium": 2,
+    "high": 3,
+    "critical": 4,
+}
+
+
 class SecurityIncident:
     """Represents a cybersecurity incident in the platform."""
+    __slots__ = ("__date_reported", "__incident_type", "__severity", "__status", "__description")
     def __init__(self,date_reported: str, incident_type: str, severity: str, status: str, description: str):
         self.__date_reported = date_reported
         self.__incident_type = incident_type
@@ -21,12 +31,6 @@ class SecurityIncident:
         self.__status = new_status
     def get_severity_level(self) -> int:
          """Return an integer severity level (simple example)."""
-         mapping = {
-        "low": 1,
-        "medium": 2,
-        "high": 3,
-        "critical": 4,
-        } 
-         return mapping.get(self.__severity.lower(), 0)
+         return SEVERITY_LEVELS.get(self.__severity.lower(), 0)
     def __str__(self) -> str:
         return f"Incident [{self.__severity.upper()}] {self.__incident_type}"
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
-from services.auth_manager import AuthManager
+from services.auth_manager import COOKIE_NAME, REMEMBER_TTL, AuthManager, restore_session
+from services.password_hasher import AuthThrottled
 from services.database_manager import DatabaseManager
 import re
 #create streamlit page metadata and alyout
@@ -22,6 +23,17 @@ if "username" not in st.session_state:
     st.session_state.username = ""
 if "user_role" not in st.session_state:
     st.session_state.user_role = ""
+
+#returning users with a "Remember me" cookie are logged in from its token
+restore_session("database/intelligence_platform.db")
+
+#streamlit can read cookies but not set them, so a tiny script sets it in the browser
+def set_session_cookie(token, max_age):
+    st.html(
+        f"<script>document.cookie = '{COOKIE_NAME}={token}; max-age={max_age}; "
+        f"path=/; SameSite=Strict';</script>",
+        unsafe_allow_javascript=True,
+    )
 # Password strength checker, using regex
 def check_password_strength(password):
     if len(password) < 8:
@@ -41,6 +53,9 @@ if st.session_state.logged_in:
     st.balloons()
     st.success(f"### ✅ Welcome back, {st.session_state.username}!")
     st.info(f"**Role:** {st.session_state.user_role.title()}")
+    #set after login, written here because the login run ends with st.rerun()
+    if "remember_token" in st.session_state:
+        set_session_cookie(st.session_state.pop("remember_token"), REMEMBER_TTL)
     st.markdown("---")
     
     # Quick dashboard access, buttons that redirected to the selected dashboard
@@ -53,6 +68,9 @@ if st.session_state.logged_in:
     
     # button for logout
     if st.button("🚪 Logout", type="secondary", use_container_width=True):
+        #revoke the token so the remember-me cookie stops working too
+        auth.logout(st.session_state.pop("session_token", None))
+        st.session_state.clear_cookie = True
         del st.session_state.logged_in
         del st.session_state.username
         st.rerun()
@@ -61,6 +79,8 @@ if st.session_state.logged_in:
 
 #create login page
 st.title("Login or create an account")
+if st.session_state.pop("clear_cookie", False):
+    set_session_cookie("", 0)
 #separte tabs for login and register
 tab1, tab2 = st.tabs(["🔐 Login", "📝 Register"])
 
@@ -79,14 +99,24 @@ with tab1:
             #Basic input validation to avoid empty submissions
             st.error("Please enter both username and password")
         else: #authenticate user credentials via AuthManager
-            user_data = auth.login_user_with_role(login_username, login_password)
+            throttled = None
+            try:
+                user_data = auth.login_user_with_role(login_username, login_password)
+            except AuthThrottled as e: #too many attempts, don't count as a failed login
+                user_data, throttled = None, e
             if user_data:
                 st.session_state.logged_in = True
                 st.session_state.username = login_username
                 #store user role, deflauts to "user", if not defines
                 st.session_state.user_role = user_data.get('role', 'user')
+                #signed session token; with "Remember me" it is also stored as a cookie
+                st.session_state.session_token = auth.create_session(user_data, remember)
+                if remember:
+                    st.session_state.remember_token = st.session_state.session_token
                 st.success(f"✅ Login successful! Role: {st.session_state.user_role}")
                 st.rerun()
+            elif throttled:
+                st.warning(f"{throttled}. Please try again in {throttled.retry_after:.0f} seconds.")
             else: #error message if authentication fails
                 st.error("Invalid credentials. Please try again.")
 
@@ -124,9 +154,11 @@ with tab2:
             st.error("Password does not meet strength requirements")
         else:
             try:
-                auth.register_user(new_username, new_password, user_role)
+                auth.register_user_with_role(new_username, new_password, user_role)
                 st.balloons()
                 st.success("🎉 Registration successful!")
                 st.info("Switch to the Login tab to access your account")
+            except AuthThrottled as e:
+                st.warning(f"{e}. Please try again in {e.retry_after:.0f} seconds.")
             except Exception as e:
                 st.error(f"Registration failed: {str(e)}")
\ No newline at end of file
@@ -1,12 +1,18 @@
+from datetime import datetime
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 from services.database_manager import DatabaseManager
 from models.security_incident import SecurityIncident
 from services.ai_assistant import AIAssistant
+from services.response_cache import ResponseCache
+from services.analytics_manager import AnalyticsManager
+from services.job_queue import ACTIVE, FINISHED, JobQueue
+from services.auth_manager import restore_session
+from database.dates import period_start_iso, today_iso
 
 #requires login first before accessing 
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+if not restore_session("database/intelligence_platform.db"):
     st.error("Please login first")
     if st.button("Go to Login"):
         st.switch_page("pages/1_🔑Login.py")
@@ -17,8 +23,8 @@ st.title("🛡️ Cybersecurity Incident Dashboard")
 
 #initialize service and AIAssistant provies ai based analysis
 #DatabaseManager handles SQL operations
-db = DatabaseManager("database/intelligence_platform.db")
-ai = AIAssistant()
+db = DatabaseManager("database/intelligence_platform.db", use_cache=True)
+ai = AIAssistant(cache=ResponseCache.for_path("database/intelligence_platform.db"))
 
 #add incident, this is displayed at sidebar (crud)
 #uses a form to avaoid partial submissions
@@ -30,73 +36,116 @@ with st.sidebar:
         i_desc = st.text_area("Description")
         #when a new incidnets is submitted its added to the database
         if st.form_submit_button("Add") and i_desc:
-            from datetime import datetime
-            #current date is added using the module
-            db.execute_query(
-                "INSERT INTO cyber_incidents (date_reported, incident_type, severity, status, description) VALUES (?, ?, ?, ?, ?)",
-                (datetime.now().strftime("%m/%d/%Y"), i_type, i_severity, "Open", i_desc)
-            )
+            #current date is stored as sortable ISO text (YYYY-MM-DD)
+            with db.transaction():
+                db.execute_query(
+                    "INSERT INTO cyber_incidents (date_reported, incident_type, severity, status, description) VALUES (?, ?, ?, ?, ?)",
+                    (today_iso(), i_type, i_severity, "Open", i_desc)
+                )
             st.success("Added!")
             st.rerun()
 
-# Load data
-data = db.fetch_all("SELECT * FROM cyber_incidents")
-incidents = [SecurityIncident(*row[:5]) for row in data]
+# Load dashboard numbers, counted by SQL instead of loading every incident
+analytics = AnalyticsManager(db)
+metrics = analytics.incident_metrics()
 
 # AI Analysis
-#AI analysis and summarizes all the incidents at once
-if incidents and st.button("🚀 Analyze ALL Incidents", type="primary", use_container_width=True):
-    summary = "\n".join([f"- {i.get_incident_type()} ({i.get_severity()})" for i in incidents])
-    with st.spinner("Analyzing..."):
-        analysis = ai.send_message(f"Analyze: {summary}", domain="Cybersecurity")
+#AI analysis runs as a background job, so it keeps going if you leave the page and
+#the last finished analysis is shown again without recomputing it. By default the
+#model gets a digest of counts, trends and the most severe open incidents;
+#"every record" splits the table into parts analyzed separately and then merged
+jobs = JobQueue.for_path("database/intelligence_platform.db")
+deep_analysis = st.checkbox("Include every record (slower)", key="incidents_deep_analysis")
+if metrics["total"] and st.button("🚀 Analyze ALL Incidents", type="primary", use_container_width=True):
+    st.session_state.incident_job = jobs.submit(
+        "incident_analysis", {"deep": deep_analysis}, created_by=st.session_state.get("username"))
+
+incident_job_id = st.session_state.get("incident_job")
+incident_job = jobs.get(incident_job_id) if incident_job_id else jobs.latest("incident_analysis", "done")
+analysis_running = incident_job is not None and incident_job["status"] in ACTIVE
+
+#only this part of the page reruns while the job is in progress
+@st.fragment(run_every=1 if analysis_running else None)
+def show_incident_analysis():
+    job = jobs.get(incident_job["id"])
     st.subheader("📊 AI Analysis")
-    st.write(analysis)
+    if job["status"] in ACTIVE:
+        st.progress(job["progress"], text=job["message"] or "Queued")
+        if st.button("⏹ Stop", key="incidents_stop_analysis"):
+            jobs.cancel(job["id"])
+    elif analysis_running:
+        st.rerun()  # finished since the page last ran; stop polling
+    if job["result"]:
+        st.markdown(job["result"])
+    if job["error"]:
+        st.error(job["error"])
+    if job["status"] in FINISHED:
+        finished = datetime.fromtimestamp(job["finished_at"]).strftime("%Y-%m-%d %H:%M")
+        st.caption(f"{job['status'].capitalize()} {finished}"
+                   + (" · every record" if job["params"].get("deep") else " · digest"))
     st.divider()
 
+if incident_job is not None:
+    show_incident_analysis()
+
 # Metrics
 #displayes total incidnets, all oepn incidents and all medium incidents
 col1, col2, col3 = st.columns(3)
 with col1:
-    st.metric("Total", len(incidents))
+    st.metric("Total", metrics["total"])
 with col2:
-    st.metric("Open", sum(1 for i in incidents if i.get_status() == "Open"))
+    st.metric("Open", metrics["open"])
 with col3:
-    st.metric("Medium", sum(1 for i in incidents if i.get_severity_level() >= 2))
+    st.metric("Medium", metrics["medium_or_above"])
 st.divider()
 
 # Visualizations using pandas and plotly.express
-if incidents:
+if metrics["total"]:
     st.subheader("📈 Visualizations")
-    df = pd.DataFrame([{ #convert incidents into datafram for plotting
-        'Date': i.get_date_reported(),
-        'Type': i.get_incident_type(),
-        'Severity': i.get_severity(),
-        'Status': i.get_status()
-    } for i in incidents])
     
     col1, col2 = st.columns(2)
     
     with col1:
         # Bar chart
-        type_counts = df['Type'].value_counts().reset_index()
+        type_counts = pd.DataFrame(analytics.incidents_by_type(), columns=['Type', 'count'])
         fig_bar = px.bar(type_counts, x='Type', y='count', title="Incidents by Type", color='count')
         st.plotly_chart(fig_bar, use_container_width=True)
     
     with col2:
-        # Scatter plot
-        df['Date_parsed'] = pd.to_datetime(df['Date'], errors='coerce')
-        df_clean = df.dropna(subset=['Date_parsed'])
-        if not df_clean.empty:
-            fig_scatter = px.scatter(df_clean, x='Date_parsed', y='Type', color='Severity', 
-                                   title="Incidents Over Time", hover_data=['Status'])
+        # Scatter plot, one point per day/type/severity sized by count
+        #a recent period is an index range scan on date_reported
+        periods = {"All time": None, "Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90}
+        period = st.selectbox("Period", list(periods), key="timeline_period")
+        since = period_start_iso(periods[period]) if periods[period] else None
+        timeline = pd.DataFrame(analytics.incidents_over_time(since=since),
+                                columns=['Date', 'Type', 'Severity', 'Count'])
+        if not timeline.empty:
+            fig_scatter = px.scatter(timeline, x='Date', y='Type', color='Severity', size='Count',
+                                   title="Incidents Over Time", hover_data=['Count'])
             st.plotly_chart(fig_scatter, use_container_width=True)
 
 st.divider()
 
 #incident List with CRUD
-st.subheader(f"📋 Incidents ({len(incidents)} total)")
+st.subheader(f"📋 Incidents ({metrics['total']} total)")
+
+#incidents are listed one page at a time, newest first
+#the cursor stack remembers every visited page so "Previous" can go back
+PAGE_SIZE = 25
+if "incident_cursors" not in st.session_state:
+    st.session_state.incident_cursors = [None]
+page = db.fetch_page(
+    "cyber_incidents",
+    ["id", "date_reported", "incident_type", "severity", "status", "description"],
+    descending=True,
+    page_size=PAGE_SIZE,
+    cursor=st.session_state.incident_cursors[-1],
+)
+#edits and deletes go by id: several incidents can share a date and type
+page_incidents = [(row[0], SecurityIncident(*row[1:])) for row in page["rows"]]
+page_start = (len(st.session_state.incident_cursors) - 1) * PAGE_SIZE
 
-for idx, incident in enumerate(incidents):
+for incident_id, incident in page_incidents:
     with st.container():
         col1, col2, col3 = st.columns([2, 2, 1])
         
@@ -117,60 +166,59 @@ for idx, incident in enumerate(incidents):
         
         with col3: #CRUD buttons to delete or edit
             # Use callback functions instead of direct session_state modification
-            edit_key = f"edit_btn_{idx}"
-            delete_key = f"delete_btn_{idx}"
+            edit_key = f"edit_btn_{incident_id}"
+            delete_key = f"delete_btn_{incident_id}"
             
             # Edit button with callback
             if st.button("✏️", key=edit_key):
-                st.session_state[f'edit_mode_{idx}'] = True
+                st.session_state[f'edit_mode_{incident_id}'] = True
                 st.rerun()
             
             # Delete button with callback
             if st.button("🗑️", key=delete_key):
-                if f'confirm_delete_{idx}' not in st.session_state:
-                    st.session_state[f'confirm_delete_{idx}'] = True
+                if f'confirm_delete_{incident_id}' not in st.session_state:
+                    st.session_state[f'confirm_delete_{incident_id}'] = True
                     st.warning("Click again to confirm")
                     st.rerun()
                 else:
-                    db.execute_query(
-    "DELETE FROM cyber_incidents WHERE date_reported = ? AND incident_type = ?",
-    (incident.get_date_reported(), incident.get_incident_type())
-                    )
+                    with db.transaction():
+                        db.execute_query("DELETE FROM cyber_incidents WHERE id = ?", (incident_id,))
                     st.success("Deleted!")
                     # Clear session states
-                    for key in [f'edit_mode_{idx}', f'confirm_delete_{idx}']:
+                    for key in [f'edit_mode_{incident_id}', f'confirm_delete_{incident_id}']:
                         if key in st.session_state:
                             del st.session_state[key]
                     st.rerun()
         
         # Edit form (only shows if edit mode is True)
-        if st.session_state.get(f'edit_mode_{idx}', False):
+        if st.session_state.get(f'edit_mode_{incident_id}', False):
             with st.expander("Edit", expanded=True):
-                # Use a form key that includes idx to make it unique
-                with st.form(key=f"edit_form_{idx}"):
+                # Use a form key that includes the id to make it unique
+                with st.form(key=f"edit_form_{incident_id}"):
                     new_type = st.selectbox("Type", ["Malware", "Phishing", "DDoS", "Other"], 
-                                          key=f"type_{idx}")
+                                          key=f"type_{incident_id}")
                     new_severity = st.select_slider("Severity", ["Low", "Medium", "High", "Critical"],
-                                                  value=incident.get_severity(), key=f"sev_{idx}")
+                                                  value=incident.get_severity(), key=f"sev_{incident_id}")
                     new_status = st.selectbox("Status", ["Open", "Investigating", "Resolved", "Closed"],
-                                            key=f"status_{idx}")
+                                            key=f"status_{incident_id}")
                     new_description = st.text_area("Description", value=incident.get_description() or "",
-                                key=f"desc_{idx}")                   
+                                key=f"desc_{incident_id}")                   
                     col_save, col_cancel = st.columns(2)
                     with col_save:
                         if st.form_submit_button("Save"):
-                            db.execute_query(
-                                "UPDATE cyber_incidents SET incident_type=?, severity=?, status=?, description=? WHERE date_reported=?",
-                                (new_type, new_severity, new_status,new_description, incident.get_date_reported())
-                            )
+                            with db.transaction():
+                                db.execute_query(
+                                    "UPDATE cyber_incidents SET incident_type=?, severity=?, status=?, description=? WHERE id=?",
+                                    (new_type, new_severity, new_status, new_description, incident_id)
+                                )
                             # Clear edit mode and refresh
-                            del st.session_state[f'edit_mode_{idx}']
+                            del st.session_state[f'edit_mode_{incident_id}']
                             st.rerun()
                     
                     with col_cancel:
                         if st.form_submit_button("Cancel"):
                             # Just clear edit mode without saving
-                            del st.session_state[f'edit_mode_{idx}']
+                            del st.session_state[f'edit_mode_{incident_id}']
                             st.rerun()
         
         #to display description
@@ -179,4 +227,37 @@ for idx, incident in enumerate(incidents):
             with st.expander("Description"):
                 st.write(desc)
         st.divider()
+
+#triage every incident on this page with one request each, several at a time
+if page_incidents and st.button("⚡ Triage this page", key="incidents_triage"):
+    records = [
+        f"{i.get_date_reported()} | {i.get_incident_type()} | {i.get_severity()} | "
+        f"{i.get_status()} | {i.get_description() or ''}"
+        for _, i in page_incidents
+    ]
+    with st.spinner(f"Triaging {len(records)} incidents..."):
+        results = ai.analyze_batch(records, domain="Cybersecurity")
+    for (_, incident), result in zip(page_incidents, results):
+        with st.expander(f"{incident.get_incident_type()} ({incident.get_severity()})"):
+            if result["error"]:
+                st.error(result["error"])
+            else:
+                st.write(result["output"])
+    stats = ai.last_batch_stats
+    st.caption(f"{stats['records']} incidents in {stats['seconds']}s "
+               f"({stats['retries']} retries, {stats['cached']} cached)")
+
+#page navigation
+prev_col, info_col, next_col = st.columns([1, 2, 1])
+with prev_col:
+    if len(st.session_state.incident_cursors) > 1 and st.button("⬅️ Previous", key="incidents_prev"):
+        st.session_state.incident_cursors.pop()
+        st.rerun()
+with info_col:
+    if page_incidents:
+        st.caption(f"Showing incidents {page_start + 1}-{page_start + len(page_incidents)}")
+with next_col:
+    if page["next_cursor"] and st.button("Next ➡️", key="incidents_next"):
+        st.session_state.incident_cursors.append(page["next_cursor"])
+        st.rerun()
 db.close()
\ No newline at end of file
@@ -2,7 +2,11 @@ import streamlit as st
 from services.database_manager import DatabaseManager
 from models.dataset import Dataset
 from services.ai_assistant import AIAssistant
+from services.response_cache import ResponseCache
+from services.analytics_manager import AnalyticsManager
+from services.auth_manager import restore_session
 import re
+import sqlite3
 import pandas as pd
 import plotly.express as px
 
@@ -10,7 +14,7 @@ import plotly.express as px
 st.set_page_config(page_title="Data Science Dashboard", layout="wide")
 
 #requires login before accessing this page
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+if not restore_session("database/intelligence_platform.db"):
     st.error("Please login first")
     if st.button("Go to Login"):
         st.switch_page("pages/1_🔑Login.py")
@@ -24,8 +28,8 @@ def make_safe_key(name, idx):
 #initialize database and AI assistant
 def main():
     st.title("📊 Data Science Dashboard")
-    db = DatabaseManager("database/intelligence_platform.db")
-    ai = AIAssistant()
+    db = DatabaseManager("database/intelligence_platform.db", use_cache=True)
+    ai = AIAssistant(cache=ResponseCache.for_path("database/intelligence_platform.db"))
 
     # add new dataset throught side bar
     with st.sidebar:
@@ -36,36 +40,48 @@ def main():
             new_description = st.text_area("Description")
             if st.form_submit_button("💾 Add Dataset"):
                 if new_name:
-                    db.execute_query(
-                        """INSERT INTO datasets_metadata 
-                           (dataset_name, source, description, last_updated) 
-                           VALUES (?, ?, ?, DATE('now'))""",
-                        (new_name, new_source, new_description)
-                    )
-                    st.success(f"✅ Added '{new_name}'")
-                    st.rerun()
+                    try:
+                        with db.transaction():
+                            db.execute_query(
+                                """INSERT INTO datasets_metadata 
+                                   (dataset_name, source, description, last_updated) 
+                                   VALUES (?, ?, ?, DATE('now'))""",
+                                (new_name, new_source, new_description)
+                            )
+                    except sqlite3.IntegrityError: #dataset names are unique
+                        st.error(f"❌ A dataset named '{new_name}' already exists")
+                    else:
+                        st.success(f"✅ Added '{new_name}'")
+                        st.rerun()
                 else:
                     st.error("❌ Dataset name is required")
 
     try:# Get the total count from the database
-        total_count = db.fetch_all("SELECT COUNT(*) FROM datasets_metadata")[0][0]
-        # Load only 50 datasets for display
-        rows = db.fetch_all(
-         "SELECT dataset_name, last_updated, source, description FROM datasets_metadata LIMIT 50"
+        analytics = AnalyticsManager(db)
+        total_count = analytics.dataset_count()
+        # Load one page of 50 datasets, the cursor stack remembers visited pages
+        PAGE_SIZE = 50
+        if "dataset_cursors" not in st.session_state:
+            st.session_state.dataset_cursors = [None]
+        page = db.fetch_page(
+            "datasets_metadata",
+            ["dataset_name", "last_updated", "source", "description"],
+            page_size=PAGE_SIZE,
+            cursor=st.session_state.dataset_cursors[-1],
         )
+        rows = page["rows"]
         datasets = [Dataset(*row) for row in rows]
+        page_start = (len(st.session_state.dataset_cursors) - 1) * PAGE_SIZE
 
         st.subheader("Dataset Overview")
         st.write(f"**Total Datasets:** {total_count}")  # This is the true total
-        st.caption(f"DATASET DISPLAYED: {len(rows)}")
+        st.caption(f"DATASET DISPLAYED: {len(rows)}"
+                   + (f" ({page_start + 1}-{page_start + len(rows)})" if rows else ""))
         # display pie chart for visualization using plotly.express
-        if datasets:
-            df_sources = pd.DataFrame([{
-                "Source": d.get_description() or "Unknown"
-            } for d in datasets])
-            if not df_sources.empty:
-                source_counts = df_sources['Source'].value_counts().reset_index()
-                source_counts.columns = ['Source', 'Count']
+        if total_count:
+            #counted over the whole catalog in SQL, not just the page on screen
+            source_counts = pd.DataFrame(analytics.datasets_by_source(), columns=['Source', 'Count'])
+            if not source_counts.empty:
                 fig = px.pie(
                     source_counts,
                     values='Count',
@@ -78,7 +94,7 @@ def main():
         st.divider()
 
         #display each dataset line by line
-        for idx, dataset in enumerate(datasets):
+        for idx, dataset in enumerate(datasets, start=page_start):
             with st.container():
                 col1, col2, col3 = st.columns([3, 2, 1])
                 
@@ -105,10 +121,11 @@ def main():
                           #delete button with confirmation
                     if st.button("🗑️ Delete", key=f"delete_btn_{idx}"):
                         if st.session_state.get(delete_key, False):
-                            db.execute_query(
-                                "DELETE FROM datasets_metadata WHERE dataset_name = ?",
-                                (dataset.get_name(),)
-                            )
+                            with db.transaction():
+                                db.execute_query(
+                                    "DELETE FROM datasets_metadata WHERE dataset_name = ?",
+                                    (dataset.get_name(),)
+                                )
                             st.success(f"✅ Deleted '{dataset.get_name()}'")
                             st.rerun()
                         else:
@@ -126,16 +143,21 @@ def main():
                             col_save, col_cancel = st.columns(2) #save and cancel button
                             with col_save:
                                 if st.form_submit_button("💾 Save"):
-                                    db.execute_query(#last_updated date gets updated automatically when datset is edited
-                                    #update the dataset in the database
-                                        """UPDATE datasets_metadata 
-                                           SET dataset_name = ?, source = ?, description = ?, last_updated = DATE('now')
-                                           WHERE dataset_name = ?""",
-                                        (updated_name, updated_source, updated_desc, dataset.get_name())
-                                    )
-                                    st.success("✅ Changes saved!")
-                                    st.session_state[edit_key] = False
-                                    st.rerun()
+                                    try:
+                                        with db.transaction():
+                                            db.execute_query(#last_updated date gets updated automatically when datset is edited
+                                            #update the dataset in the database
+                                                """UPDATE datasets_metadata 
+                                                   SET dataset_name = ?, source = ?, description = ?, last_updated = DATE('now')
+                                                   WHERE dataset_name = ?""",
+                                                (updated_name, updated_source, updated_desc, dataset.get_name())
+                                            )
+                                    except sqlite3.IntegrityError: #dataset names are unique
+                                        st.error(f"❌ A dataset named '{updated_name}' already exists")
+                                    else:
+                                        st.success("✅ Changes saved!")
+                                        st.session_state[edit_key] = False
+                                        st.rerun()
                             with col_cancel:
                                 if st.form_submit_button("❌ Cancel"):
                                     st.session_state[edit_key] = False
@@ -143,6 +165,17 @@ def main():
 
                 st.divider()
 
+        #page navigation
+        prev_col, next_col = st.columns(2)
+        with prev_col:
+            if len(st.session_state.dataset_cursors) > 1 and st.button("⬅️ Previous", key="datasets_prev"):
+                st.session_state.dataset_cursors.pop()
+                st.rerun()
+        with next_col:
+            if page["next_cursor"] and st.button("Next ➡️", key="datasets_next"):
+                st.session_state.dataset_cursors.append(page["next_cursor"])
+                st.rerun()
+
     finally:
         db.close() #close database connection
 #run dashboard
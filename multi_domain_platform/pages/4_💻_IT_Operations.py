@@ -1,12 +1,17 @@
+from datetime import datetime
 import streamlit as st
 from services.database_manager import DatabaseManager
 from models.it_ticket import ITTicket
 from services.ai_assistant import AIAssistant
+from services.response_cache import ResponseCache
+from services.analytics_manager import AnalyticsManager
+from services.job_queue import ACTIVE, FINISHED, JobQueue
+from services.auth_manager import restore_session
 import pandas as pd
 import plotly.express as px
 
 #required login before accessing this page
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+if not restore_session("database/intelligence_platform.db"):
     st.error("Please login first")
     if st.button("Go to Login"):
         st.switch_page("pages/1_🔑Login.py")
@@ -15,8 +20,8 @@ if "logged_in" not in st.session_state or not st.session_state.logged_in:
 st.set_page_config(page_title="IT Operations", layout="wide")
 st.title("IT Operations")
 #initialize database
-db = DatabaseManager("database/intelligence_platform.db")
-ai = AIAssistant()
+db = DatabaseManager("database/intelligence_platform.db", use_cache=True)
+ai = AIAssistant(cache=ResponseCache.for_path("database/intelligence_platform.db"))
 #add new ticket, form style to prevent empty submisson
 with st.expander("➕ Add New Ticket", expanded=False):
     with st.form("add_ticket_form"):
@@ -30,57 +35,73 @@ with st.expander("➕ Add New Ticket", expanded=False):
         submitted = st.form_submit_button("✅ Add Ticket")
         if submitted:
             if new_description: #ensure description is provided
-                db.execute_query(
-                    "INSERT INTO it_tickets (status, assigned_to, description) VALUES ( ?, ?, ?)",
-                    ( new_status, new_ticket_type, new_description)
-                )
+                with db.transaction():
+                    db.execute_query(
+                        "INSERT INTO it_tickets (status, assigned_to, description) VALUES ( ?, ?, ?)",
+                        ( new_status, new_ticket_type, new_description)
+                    )
                 st.success(f"'{new_ticket_type}' ticket added!")
                 st.rerun() #refresh the page to show the new ticket
             else:
                 st.error("Please enter a description")
 st.divider()
-#load all tickets
-rows = db.fetch_all("SELECT * FROM it_tickets")
-tickets = [ITTicket(*row[:5]) for row in rows] if rows else []
+#ticket counts come from GROUP BY queries instead of loading every ticket
+analytics = AnalyticsManager(db)
+priority_rows = analytics.tickets_by_priority()
+total_tickets = analytics.ticket_metrics()["total"]
 
-#ai analysis, analyzes all tickets together
-if tickets:
+#ai analysis, analyzes all tickets together as a background job; the page can be
+#left while it runs and the last finished analysis is shown again without recomputing
+jobs = JobQueue.for_path("database/intelligence_platform.db")
+if total_tickets:
+    #a digest of counts and trends by default; every ticket when asked (slower)
+    deep_analysis = st.checkbox("Include every record (slower)", key="tickets_deep_analysis")
     if st.button("🚀 Analyze ALL Tickets", type="primary", use_container_width=True):
-        #prepares a summary list of tickets for AI
-        tickets_list = "\n".join([f"- #{t.get_id()}: {t.get_priority()} ({t.get_status()})" for t in tickets[:50]])
-        ai_prompt = f"Analyze these {len(tickets)} IT tickets:\n{tickets_list}\n\nProvide: 1) Patterns 2) Priority issues 3) Recommendations"
-        
-        with st.spinner(f"Analyzing {len(tickets)} tickets..."):
-            st.subheader("📊 AI Analysis")
-            response_box = st.empty()
-            full_text = ""
-            #AI response is typed out word by word
-            for chunk in ai.send_message(ai_prompt, domain="IT Operations"):
-                full_text += chunk
-                response_box.markdown(full_text)
-        
-        st.divider()
+        st.session_state.ticket_job = jobs.submit(
+            "ticket_analysis", {"deep": deep_analysis}, created_by=st.session_state.get("username"))
+
+ticket_job_id = st.session_state.get("ticket_job")
+ticket_job = jobs.get(ticket_job_id) if ticket_job_id else jobs.latest("ticket_analysis", "done")
+analysis_running = ticket_job is not None and ticket_job["status"] in ACTIVE
+
+#polls the job once a second while it runs, without rerunning the whole page
+@st.fragment(run_every=1 if analysis_running else None)
+def show_ticket_analysis():
+    job = jobs.get(ticket_job["id"])
+    st.subheader("📊 AI Analysis")
+    if job["status"] in ACTIVE:
+        st.progress(job["progress"], text=job["message"] or "Queued")
+        if st.button("⏹ Stop", key="tickets_stop_analysis"):
+            jobs.cancel(job["id"])
+    elif analysis_running:
+        st.rerun()  # finished since the page last ran; stop polling
+    #AI response grows as the job streams it
+    if job["result"]:
+        st.markdown(job["result"])
+    if job["error"]:
+        st.error(job["error"])
+    if job["status"] in FINISHED:
+        finished = datetime.fromtimestamp(job["finished_at"]).strftime("%Y-%m-%d %H:%M")
+        st.caption(f"{job['status'].capitalize()} {finished}"
+                   + (" · every record" if job["params"].get("deep") else " · digest"))
+    st.divider()
+
+if ticket_job is not None:
+    show_ticket_analysis()
 #create a filter setup
 if "filter_type" not in st.session_state:
     st.session_state.filter_type = None
+if "ticket_cursors" not in st.session_state:
+    st.session_state.ticket_cursors = [None]
 #get unique issue types for filter button
-issue_types = sorted(set(t.get_priority() for t in tickets if t.get_priority()))
+issue_types = sorted(priority for priority, _ in priority_rows)
 st.write("**Filter by issue type:**")
 cols = st.columns(len(issue_types) + 1)
 #garphs-visualization 
 #using pandas and plotly.express
-if tickets:
-    df = pd.DataFrame([
-        {
-            "Priority": t.get_priority(),
-            "Status": t.get_status()
-        }
-        for t in tickets
-    ])
-
+if priority_rows:
     # Count tickets by priority
-    priority_counts = df["Priority"].value_counts().reset_index()
-    priority_counts.columns = ["Priority", "Count"]
+    priority_counts = pd.DataFrame(priority_rows, columns=["Priority", "Count"])
 
     fig = px.bar(
         priority_counts,
@@ -95,30 +116,39 @@ if tickets:
 with cols[0]:
     if st.button("All", type="primary" if st.session_state.filter_type is None else "secondary", use_container_width=True):
         st.session_state.filter_type = None
+        st.session_state.ticket_cursors = [None] #new filter starts from the first page
         st.rerun()
 #buttons for each issue type to filter tickets
 for idx, issue in enumerate(issue_types):
     with cols[idx + 1]: #place each issue type button in its own column
         if st.button(issue, type="primary" if st.session_state.filter_type == issue else "secondary", use_container_width=True):
             st.session_state.filter_type = issue #Set active filter to clicked issue type
+            st.session_state.ticket_cursors = [None] #new filter starts from the first page
             st.rerun() #refresh page
 
 current_filter = st.session_state.filter_type or "All"
 st.write(f"**Issue Type:** {current_filter}")
 
-if st.session_state.filter_type:
-    filtered = [t for t in tickets if t.get_priority() == st.session_state.filter_type]
-else:
-    filtered = tickets
+ticket_counts = analytics.ticket_metrics(st.session_state.filter_type)
 #metrics-displayes total tickets of a specific filer, open tickets, and total tickets
 col1, col2, col3 = st.columns(3)
-with col1: st.metric(f"{current_filter}", len(filtered))
-with col2: st.metric("Open", sum(1 for t in filtered if t.get_status() == "Open"))
-with col3: st.metric("Total", len(tickets))
+with col1: st.metric(f"{current_filter}", ticket_counts["filtered"])
+with col2: st.metric("Open", ticket_counts["open"])
+with col3: st.metric("Total", ticket_counts["total"])
 
 st.divider()
-#display tickets line by line
-for ticket in filtered:
+#display one page of tickets, filtered in SQL
+PAGE_SIZE = 25
+page = db.fetch_page(
+    "it_tickets",
+    ["ticket_id", "date_created", "priority", "status", "assigned_to"],
+    descending=True,
+    filters={"priority": st.session_state.filter_type} if st.session_state.filter_type else None,
+    page_size=PAGE_SIZE,
+    cursor=st.session_state.ticket_cursors[-1],
+)
+page_tickets = [ITTicket(*row) for row in page["rows"]]
+for ticket in page_tickets:
     with st.container():
         col1, col2 = st.columns([1, 0.5])
         with col1:
@@ -129,5 +159,15 @@ for ticket in filtered:
             st.write(f"**Priority:** {ticket.get_priority()}")
             st.write(f"**Status:** {ticket.get_status()}")
         st.divider()
+#page navigation
+prev_col, next_col = st.columns(2)
+with prev_col:
+    if len(st.session_state.ticket_cursors) > 1 and st.button("⬅️ Previous", key="tickets_prev"):
+        st.session_state.ticket_cursors.pop()
+        st.rerun()
+with next_col:
+    if page["next_cursor"] and st.button("Next ➡️", key="tickets_next"):
+        st.session_state.ticket_cursors.append(page["next_cursor"])
+        st.rerun()
 #close database connection
 db.close()
\ No newline at end of file
@@ -1,8 +1,11 @@
+from contextlib import closing
 import streamlit as st
 from services.ai_assistant import AIAssistant
+from services.conversation import ConversationHistory
+from services.response_cache import ResponseCache
 
 # Initialize
-ai_assistant = AIAssistant()
+ai_assistant = AIAssistant(cache=ResponseCache.for_path("database/intelligence_platform.db"))
 
 # Session state
 if "selected" not in st.session_state:
@@ -11,10 +14,16 @@ if "selected" not in st.session_state:
 if "messages" not in st.session_state:
     st.session_state.messages = {}
 
+#what the model sees; kept under a token budget so long chats don't grow every request
+if "histories" not in st.session_state:
+    st.session_state.histories = {}
+
 # Initialize chat for each assistant
 for name in ["Cybersecurity", "Data Science", "IT Operations"]:
     if name not in st.session_state.messages:
         st.session_state.messages[name] = []
+    if name not in st.session_state.histories:
+        st.session_state.histories[name] = ConversationHistory(model=ai_assistant.model)
 
 # Sidebar
 with st.sidebar:
@@ -31,6 +40,7 @@ with st.sidebar:
     
     if st.button("Clear Chat"):
         st.session_state.messages[st.session_state.selected] = []
+        st.session_state.histories[st.session_state.selected].clear()
         st.rerun()
 
 # Main
@@ -39,6 +49,13 @@ st.title(f"{st.session_state.selected}")
 # Get current messages
 current_messages = st.session_state.messages[st.session_state.selected]
 
+# Stop was clicked while a reply streamed: that rerun closed the request, so keep
+# whatever part of the reply had arrived
+if st.session_state.get("stop_reply") and current_messages and current_messages[-1]["role"] == "user":
+    turns = st.session_state.histories[st.session_state.selected].turns
+    partial = turns[-1]["content"] if turns and turns[-1]["role"] == "assistant" else ""
+    current_messages.append({"role": "assistant", "content": f"{partial} _(stopped)_"})
+
 # Show chat
 for msg in current_messages:
     with st.chat_message(msg["role"]):
@@ -53,7 +70,13 @@ if prompt := st.chat_input("Ask..."):
         st.write(prompt)
     
     with st.chat_message("assistant"):
-        # Simple response (no streaming animation)
-        response = ai_assistant.send_message(prompt, st.session_state.selected)
-        st.write(response)
+        # Reply is typed out as it streams; Stop reruns the page, which closes the stream
+        stop_slot = st.empty()
+        stop_slot.button("⏹ Stop", key="stop_reply")
+        with closing(ai_assistant.send_message(
+            prompt, st.session_state.selected,
+            history=st.session_state.histories[st.session_state.selected],
+        )) as stream:
+            response = st.write_stream(stream)
+        stop_slot.empty()
         current_messages.append({"role": "assistant", "content": response})
\ No newline at end of file
@@ -1,8 +1,43 @@
+from .connection_pool import ConnectionPool
 from .database_manager import DatabaseManager
+from .query_cache import QueryCache
+from .query_stats import QueryStats
 from .auth_manager import AuthManager       
 from .ai_assistant import AIAssistant
+from .analytics_manager import AnalyticsManager
+from .response_cache import ResponseCache
+from .rate_limiter import TokenBucket
+from .conversation import ConversationHistory
+from .digest import DigestBuilder
+from .llm_client import LLMBackend, LLMClientPool
+from .llm_backends import RecordingBackend, ReplayBackend, StubBackend, default_backend
+from .llm_metrics import StreamMetrics
+from .job_queue import JobQueue
+from .histogram import LatencyHistogram
+from .password_hasher import AuthThrottled, PasswordHasher
+from .system_status import SystemStatus
 __all__ = [
+    "ConnectionPool",
     "DatabaseManager",  
+    "QueryCache",
+    "QueryStats",
     "AuthManager",
     "AIAssistant",
+    "AnalyticsManager",
+    "ResponseCache",
+    "TokenBucket",
+    "ConversationHistory",
+    "DigestBuilder",
+    "LLMBackend",
+    "LLMClientPool",
+    "StubBackend",
+    "ReplayBackend",
+    "RecordingBackend",
+    "default_backend",
+    "StreamMetrics",
+    "JobQueue",
+    "LatencyHistogram",
+    "PasswordHasher",
+    "AuthThrottled",
+    "SystemStatus",
 ]
\ No newline at end of file
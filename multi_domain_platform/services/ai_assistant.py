@@ -1,56 +1,484 @@
-from openai import OpenAI
-import streamlit as st
-from typing import List, Dict 
+import asyncio
+import queue
+import random
+import threading
+import time
+from contextlib import closing
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence
+
+import httpx
+import openai
+
+from .conversation import ConversationHistory, count_tokens, extractive_summary, truncate_tokens
+from .llm_backends import default_backend
+from .llm_client import LLMBackend
+from .llm_metrics import StreamMetrics
+from .rate_limiter import TokenBucket
+from .response_cache import ResponseCache
+
+# tokens per request (prompt side) when a domain doesn't set its own budget
+DEFAULT_CONTEXT_BUDGET = 3000
+
+SUMMARY_PROMPT = (
+    "Update the running summary of an analyst conversation. Keep facts, figures,"
+    " decisions and open questions; drop pleasantries. Reply with the summary only,"
+    " under {limit} tokens.\n\nCurrent summary:\n{previous}\n\nNew turns:\n{turns}"
+)
+
+# prompt used for one-record-at-a-time triage in analyze_batch
+TRIAGE_PROMPT = (
+    "Triage this {domain} record. In at most three short lines give the severity,"
+    " the likely cause and the next action.\n\n{record}"
+)
+
+# map-reduce analysis: every part is summarized on its own, then the parts are merged
+MAP_PROMPT = (
+    "You are given one part of a larger set of {domain} records. Summarize this part"
+    " for a later merge step: counts by category, notable records and risks."
+    " Be brief and factual.\n\n{record}"
+)
+REDUCE_PROMPT = (
+    "Below are partial analyses that together cover {total} {domain} records."
+    " Merge them into one analysis of the whole set. {task}\n\n{partials}"
+)
+MERGE_PROMPT = (
+    "Below are partial analyses of parts of a larger set of {domain} records."
+    " Merge them into one brief summary for a later merge step, keeping counts,"
+    " notable records and risks.\n\n{record}"
+)
+DEFAULT_ANALYSIS_TASK = "Provide: 1) Patterns 2) Priority issues 3) Recommendations"
+# chunks analyze_all reads ahead per unit of concurrency; bounds the records held in memory
+MAP_WINDOW = 4
+
+
+def chunk_records(records: Iterable[str], max_tokens: int, model: str = "gpt-4.1-nano") -> Iterator[List[str]]:
+    """Group records into lists of at most max_tokens tokens, keeping their order.
+
+    A record bigger than max_tokens on its own becomes a chunk by itself.
+    """
+    chunk: List[str] = []
+    used = 0
+    for record in records:
+        size = count_tokens(record, model) + 1  # the newline joining records
+        if chunk and used + size > max_tokens:
+            yield chunk
+            chunk, used = [], 0
+        chunk.append(record)
+        used += size
+    if chunk:
+        yield chunk
+
+
+# errors raised before a response arrived: dropped connections and timeouts
+_TRANSIENT_ERRORS = (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError, TimeoutError)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts, server errors and dropped connections are worth retrying.
+
+    Anything else, including bugs such as a TypeError, fails on the first attempt.
+    """
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in (408, 409, 429) or status >= 500)
 class AIAssistant:
-    """Handles AI chat for diffienrt expert domains."""
-    def __init__(self):
-        self.client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-        self._history: List[Dict[str, str]] = []  # ✅ INITIALIZE HISTORY
+    """Handles AI chat for diffienrt expert domains.
+
+    client can be any object with the OpenAI chat.completions.create API,
+    which lets the assistant run against a local stand-in; async_client is
+    the AsyncOpenAI-style equivalent used by analyze_batch. Without them the
+    clients come from transport, an LLMBackend; the default is picked by
+    default_backend() (the shared OpenAI LLMClientPool, or an offline stub,
+    recorder or replayer), so building an assistant on every rerun doesn't
+    open new connections.
+    Pass a ResponseCache to answer repeated prompts without calling the API.
+
+    Chat history is a ConversationHistory kept under each domain's
+    context_budget; pass history to keep it across Streamlit reruns.
+    Streamed replies are timed into metrics (StreamMetrics.shared() by default).
+    """
+    def __init__(self, client=None, cache: ResponseCache | None = None, model: str = "gpt-4.1-nano",
+                 async_client=None, history: ConversationHistory | None = None,
+                 transport: LLMBackend | None = None, metrics: StreamMetrics | None = None):
+        if transport is None and client is None:
+            transport = default_backend()
+        self.transport = transport
+        self.client = client if client is not None else transport.client
+        self._async_client = async_client
+        self._async_injected = async_client is not None
+        self.cache = cache
+        self.model = model
+        self.metrics = metrics if metrics is not None else StreamMetrics.shared()
+        self.last_batch_stats: Dict[str, Any] = {}
+        self.last_analysis_stats: Dict[str, Any] = {}
+        self._history = history if history is not None else ConversationHistory(model=model)  # ✅ INITIALIZE HISTORY
+        self.last_usage: Dict[str, Any] = {}
         self._system_prompt = "You are a helpful assistant."
         self.assistants={
             "Cybersecurity": {
                 "prompt": "You are a cybersecurity expert. Analyze incidents, threats, and"
                 " vulnerabilities. Provide technical guidance using MITRE ATT&CK, CVE "
                 "references. Prioritize actionable recommendations.",
+                "context_budget": 4000,
             },
             "Data Science":{
                 "prompt":
                 "You are a data science expert. Help with data"
                 " analysis, visualization, statistical methods, and machine learning."
-                " Explain concepts clearly and suggest appropriate techniques.",},
+                " Explain concepts clearly and suggest appropriate techniques.",
+                "context_budget": 3000,},
             "IT Operations": {
                 "prompt": "You are an IT operations expert. Help troubleshoot issues,"
                 " optimize systems, manage tasks, and provide infrastructure guidance."
-                " Focus on practical solutions.",}
+                " Focus on practical solutions.",
+                "context_budget": 3000,}
         }
     def get_assistant_prompt(self, domain: str) -> str:
         """get system prompt for specific domain"""
         return self.assistants.get(domain, {}).get("prompt", self._system_prompt)
-    def send_message(self, user_message: str, domain: str = "Cybersecurity"): 
-        """Send a message and yield AI response chunks for streaming"""
-    # Add user message to history
-        self._history.append({"role": "user", "content": user_message})
-    
-    # Get response for specific domain
-        system_prompt = self.get_assistant_prompt(domain)
-        full_messages = [{"role": "system", "content": system_prompt}] + self._history
-    
-    # Create streaming request
+    def get_context_budget(self, domain: str) -> int:
+        return self.assistants.get(domain, {}).get("context_budget", DEFAULT_CONTEXT_BUDGET)
+    def _summarize(self, previous: str, turns: List[Dict[str, str]], limit: int) -> str:
+        """Fold compacted turns into the summary with the model; extractive if that fails."""
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": SUMMARY_PROMPT.format(
+                    limit=limit, previous=previous or "(none)", turns=transcript)}],
+                max_tokens=limit,
+            )
+            summary = response.choices[0].message.content
+            if summary:
+                return summary.strip()
+        except Exception:
+            pass
+        return extractive_summary(previous, turns, limit, self.model)
+    def _stream(self, messages: List[Dict[str, str]], domain: str, chunks: List[str],
+                cancel: threading.Event | None = None):
+        """Yield reply pieces from one streamed request, appending them to chunks.
+
+        Returns (reported_usage, finished). If the consumer stops early, by
+        close() or by setting cancel, the upstream response is closed right
+        away so the API stops generating. Timings go to self.metrics.
+        """
+        started = time.perf_counter()
+        first_token = None
+        reported = None
+        finished = failed = False
         stream = self.client.chat.completions.create(
-        model="gpt-4.1-nano",  # Make sure this is a valid model name
-        messages=full_messages,
-        stream=True
-)
-    
-    # Stream response word by word
-        full_response = ""
-        for chunk in stream:
-         if chunk.choices[0].delta.content:
-                word = chunk.choices[0].delta.content
-                full_response += word
-                yield word  # ← YIELD each chunk instead of just collecting
-    
-    # Store complete response in history
-        self._history.append({"role": "assistant", "content": full_response})
+            model=self.model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    break
+                if getattr(chunk, "usage", None) is not None:
+                    reported = chunk.usage  # only on the last chunk, which has no choices
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    chunks.append(chunk.choices[0].delta.content)
+                    yield chunks[-1]
+            else:
+                finished = True
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if not finished:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+            tokens = reported.completion_tokens if reported is not None else count_tokens("".join(chunks), self.model)
+            self.metrics.record(domain, time.perf_counter() - started, first_token, tokens,
+                                cancelled=not finished and not failed, failed=failed)
+        return reported, finished
+    def _replay(self, cached: List[str], domain: str) -> Iterator[str]:
+        started = time.perf_counter()
+        yield from ResponseCache.replay(cached)
+        self.metrics.record(domain, time.perf_counter() - started, 0.0,
+                            count_tokens("".join(cached), self.model), cached=True)
+    def send_message(self, user_message: str, domain: str = "Cybersecurity",
+                     history: ConversationHistory | None = None, cancel: threading.Event | None = None):
+        """Send a message and yield AI response chunks for streaming
+
+        Closing the generator (or setting cancel) stops the request; the
+        partial reply is still kept in the history but never cached.
+        """
+        history = history if history is not None else self._history
+        # Add user message to history
+        history.append("user", user_message)
+
+        # Get response for specific domain; older turns are summarized to fit the budget
+        system_prompt = self.get_assistant_prompt(domain)
+        full_messages, usage = history.build_messages(
+            system_prompt, self.get_context_budget(domain), self._summarize)
+        self.last_usage = usage
+
+        # Replay a cached answer chunk by chunk, same as a live stream
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ResponseCache.make_key(self.model, system_prompt, full_messages[1:])
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield from self._replay(cached, domain)
+                full_response = "".join(cached)
+                history.append("assistant", full_response)
+                usage.update(completion_tokens=count_tokens(full_response, self.model), cached=True)
+                return
+
+        # Stream response word by word
+        chunks: List[str] = []
+        reported, finished = None, False
+        try:
+            reported, finished = yield from self._stream(full_messages, domain, chunks, cancel)
+        finally:
+            # Store the response in history even if cut short, and in the cache once fully received
+            full_response = "".join(chunks)
+            history.append("assistant", full_response)
+            usage.update(cached=False, cancelled=not finished)
+            if reported is not None:
+                usage.update(prompt_tokens=reported.prompt_tokens,
+                             completion_tokens=reported.completion_tokens, reported=True)
+            else:
+                usage["completion_tokens"] = count_tokens(full_response, self.model)
+            if finished and self.cache is not None and chunks:
+                self.cache.put(cache_key, self.model, domain, chunks)
+    def _get_async_client(self):
+        if self._async_client is None:
+            self._async_client = (self.transport or default_backend()).async_client
+        return self._async_client
+    async def analyze_batch_async(self, records: Sequence[str], domain: str = "Cybersecurity",
+                                  prompt_template: str = TRIAGE_PROMPT, concurrency: int = 8,
+                                  requests_per_second: float = 5.0, burst: int | None = None,
+                                  max_retries: int = 3, base_delay: float = 0.5,
+                                  max_delay: float = 8.0,
+                                  on_result: Callable[[Dict[str, Any]], None] | None = None,
+                                  cancel: threading.Event | None = None) -> List[Dict[str, Any]]:
+        """Triage every record with its own request, several at a time.
+
+        At most `concurrency` requests are in flight and a token bucket keeps
+        the start rate under requests_per_second. Retryable failures back off
+        with full jitter. Results come back in the same order as records, each
+        {"index", "record", "output", "error", "attempts", "cached", "seconds"}.
+        These one-off requests don't touch the chat history. on_result is
+        called with each result as soon as it finishes, in completion order.
+        Once cancel is set, records that haven't started come back with a
+        "cancelled" error.
+        """
+        client = self._get_async_client()
+        system = {"role": "system", "content": self.get_assistant_prompt(domain)}
+        semaphore = asyncio.Semaphore(concurrency)
+        limiter = TokenBucket(requests_per_second, burst or concurrency)
+        results: List[Dict[str, Any]] = [{} for _ in records]  # filled in as each record starts
+        retries = 0
+
+        async def run_one(index: int, record: str) -> None:
+            nonlocal retries
+            started = time.perf_counter()
+            result = {"index": index, "record": record, "output": None, "error": None,
+                      "attempts": 0, "cached": False, "seconds": 0.0}
+            results[index] = result
+            messages = [{"role": "user", "content": prompt_template.format(domain=domain, record=record)}]
+            cache_key = None
+            if self.cache is not None:
+                cache_key = ResponseCache.make_key(self.model, system["content"], messages)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    result.update(output="".join(cached), cached=True,
+                                  seconds=time.perf_counter() - started)
+                    if on_result is not None:
+                        on_result(result)
+                    return
+            async with semaphore:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        result["error"] = "cancelled"
+                        break
+                    result["attempts"] += 1
+                    await limiter.acquire_async()
+                    try:
+                        response = await client.chat.completions.create(
+                            model=self.model, messages=[system] + messages)
+                        result["output"] = response.choices[0].message.content or ""
+                        break
+                    except Exception as error:
+                        if result["attempts"] > max_retries or not _is_retryable(error):
+                            result["error"] = f"{type(error).__name__}: {error}"
+                            break
+                        retries += 1
+                        backoff = min(max_delay, base_delay * 2 ** (result["attempts"] - 1))
+                        await asyncio.sleep(random.uniform(0, backoff))
+            if self.cache is not None and result["output"]:
+                self.cache.put(cache_key, self.model, domain, [result["output"]])
+            result["seconds"] = time.perf_counter() - started
+            if on_result is not None:
+                on_result(result)
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(run_one(i, record) for i, record in enumerate(records)),
+                                        return_exceptions=True)
+        # a failing cache or on_result callback marks its own record, not the whole batch
+        for result, outcome in zip(results, outcomes):
+            if isinstance(outcome, BaseException) and not result["error"]:
+                result["error"] = f"{type(outcome).__name__}: {outcome}"
+        elapsed = time.perf_counter() - started
+        self.last_batch_stats = {
+            "records": len(records),
+            "seconds": round(elapsed, 4),
+            "records_per_second": round(len(records) / elapsed, 2) if elapsed else 0.0,
+            "retries": retries,
+            "errors": sum(1 for r in results if r["error"]),
+            "cached": sum(1 for r in results if r["cached"]),
+            "concurrency": concurrency,
+        }
+        return results
+    def analyze_batch(self, records: Sequence[str], domain: str = "Cybersecurity", **options):
+        """Blocking wrapper around analyze_batch_async for Streamlit scripts.
+
+        Pooled async clients run on their pool's event loop so their
+        connections stay open between batches; an injected one gets its own.
+        """
+        batch = self.analyze_batch_async(records, domain=domain, **options)
+        if self._async_injected:
+            return asyncio.run(batch)
+        return (self.transport or default_backend()).run(batch)
+    def _stream_completion(self, messages: List[Dict[str, str]], domain: str,
+                           cancel: threading.Event | None = None) -> Iterator[str]:
+        """Stream one stateless request, through the response cache when there is one."""
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ResponseCache.make_key(self.model, messages[0]["content"], messages[1:])
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield from self._replay(cached, domain)
+                return
+        chunks: List[str] = []
+        _, finished = yield from self._stream(messages, domain, chunks, cancel)
+        if finished and self.cache is not None and chunks:
+            self.cache.put(cache_key, self.model, domain, chunks)
+    def _map_parts(self, parts: List[str], domain: str, prompt_template: str, concurrency: int,
+                   requests_per_second: float, cancel: threading.Event) -> Iterator[Dict[str, Any]]:
+        """Run analyze_batch on a worker thread and yield each result as it lands.
+
+        Closing the generator sets cancel so the batch stops starting requests.
+        """
+        done: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        failure: List[BaseException] = []
+        def run():
+            try:
+                self.analyze_batch(parts, domain=domain, prompt_template=prompt_template,
+                                   concurrency=concurrency, requests_per_second=requests_per_second,
+                                   on_result=done.put, cancel=cancel)
+            except BaseException as error:
+                failure.append(error)
+            finally:
+                done.put(None)
+        worker = threading.Thread(target=run, name="ai-map", daemon=True)
+        worker.start()
+        try:
+            while (result := done.get()) is not None:
+                yield result
+        finally:
+            if worker.is_alive():
+                cancel.set()
+        worker.join()
+        if failure:
+            raise failure[0]
+    def analyze_all(self, records: Iterable[str], domain: str = "Cybersecurity",
+                    task: str = DEFAULT_ANALYSIS_TASK, chunk_tokens: int = 2000,
+                    concurrency: int = 4, requests_per_second: float = 5.0,
+                    cancel: threading.Event | None = None) -> Iterator[Dict[str, Any]]:
+        """Map-reduce analysis of any number of records with bounded request sizes.
+
+        Records are packed into chunks of at most chunk_tokens tokens and each
+        chunk is summarized on its own, several at once (the map step).
+        Records are read lazily, concurrency * MAP_WINDOW chunks at a time, so
+        only that window of records is in memory; the short summary of every
+        part is kept until the end. If the summaries are still too big for
+        one request they are merged in groups until they fit, and the last
+        merge is streamed (the reduce step). Summaries too big to pair up are
+        truncated, so no request goes over chunk_tokens of input.
+        Yields progress events for the page:
+        {"stage": "map", "done", "parts", "records", "error"} per finished
+        chunk (parts and records read so far), then {"stage": "reduce",
+        "text"} per streamed piece of the final answer and {"stage": "done",
+        "parts", "failed_parts"} at the end. When no part could be summarized
+        there is nothing to merge: the last event is {"stage": "error",
+        "parts", "failed_parts", "error"} and no reduce request is sent.
+        Stats end up in last_analysis_stats. Closing the generator, or
+        setting cancel, stops outstanding requests.
+        """
+        cancel = cancel if cancel is not None else threading.Event()
+        started = time.perf_counter()
+        chunks = chunk_records(records, chunk_tokens, self.model)
+        window = max(1, concurrency) * MAP_WINDOW
+        summaries: List[str] = []
+        total = parts = done = errors = 0
+        last_error = None
+        while not cancel.is_set() and (batch := list(islice(chunks, window))):
+            texts = [f"Part {parts + n} ({len(chunk)} records):\n" + "\n".join(chunk)
+                     for n, chunk in enumerate(batch, start=1)]
+            parts += len(batch)
+            total += sum(len(chunk) for chunk in batch)
+            del batch  # the joined texts are all the map step needs
+            outputs: List[str | None] = [None] * len(texts)
+            with closing(self._map_parts(texts, domain, MAP_PROMPT, concurrency,
+                                         requests_per_second, cancel)) as results:
+                for result in results:
+                    done += 1
+                    outputs[result["index"]] = result["output"]
+                    errors += bool(result["error"])
+                    last_error = result["error"] or last_error
+                    yield {"stage": "map", "done": done, "parts": parts, "records": total,
+                           "error": result["error"]}
+            summaries += [output for output in outputs if output]
+        if cancel.is_set() or not parts:
+            return
+        map_seconds = time.perf_counter() - started
+        levels = 0
+        # merge in groups until the summaries fit into a single reduce request
+        while len(summaries) > 1 and count_tokens("\n\n".join(summaries), self.model) > chunk_tokens:
+            levels += 1
+            groups = ["\n\n".join(group) for group in chunk_records(summaries, chunk_tokens, self.model)]
+            if len(groups) == len(summaries):
+                # every summary fills a request on its own: cut them so at least two fit in one
+                summaries = [truncate_tokens(s, max(1, chunk_tokens // 2 - 4), self.model) for s in summaries]
+                groups = ["\n\n".join(group) for group in chunk_records(summaries, chunk_tokens, self.model)]
+            merged = list(self._map_parts(groups, domain, MERGE_PROMPT, concurrency,
+                                          requests_per_second, cancel))
+            summaries = [r["output"] for r in sorted(merged, key=lambda r: r["index"]) if r["output"]]
+            last_error = next((r["error"] for r in merged if r["error"]), last_error)
+        if len(summaries) == 1:
+            summaries = [truncate_tokens(summaries[0], chunk_tokens, self.model)]
+        stats = {"records": total, "parts": parts, "failed_parts": errors, "reduce_levels": levels,
+                 "map_seconds": round(map_seconds, 3)}
+        if not summaries:
+            # don't ask the model to analyze an empty set of partial analyses
+            self.last_analysis_stats = {**stats, "reduce_seconds": 0.0,
+                                        "seconds": round(time.perf_counter() - started, 3)}
+            yield {"stage": "error", "parts": parts, "failed_parts": errors,
+                   "error": f"No part of the analysis succeeded (last error: {last_error})"}
+            return
+        messages = [
+            {"role": "system", "content": self.get_assistant_prompt(domain)},
+            {"role": "user", "content": REDUCE_PROMPT.format(
+                total=total, domain=domain, task=task, partials="\n\n".join(summaries))},
+        ]
+        reduce_started = time.perf_counter()
+        for piece in self._stream_completion(messages, domain, cancel):
+            yield {"stage": "reduce", "text": piece}
+        self.last_analysis_stats = {
+            **stats,
+            "reduce_seconds": round(time.perf_counter() - reduce_started, 3),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        yield {"stage": "done", "parts": parts, "failed_parts": errors}
     def clear_history(self):
         self._history.clear()
\ No newline at end of file
@@ -0,0 +1,119 @@
+from typing import Dict, List, Tuple
+
+from database.dates import MAX_ISO
+
+# severities that count towards the "Medium" metric (severity level >= 2)
+MEDIUM_OR_ABOVE = ("medium", "high", "critical")
+
+# SQL expressions that turn an ISO date column into a time bucket label
+BUCKETS = {
+    "day": "substr(date_reported, 1, 10)",
+    "week": "strftime('%Y-W%W', date_reported)",
+    "month": "substr(date_reported, 1, 7)",
+}
+
+
+class AnalyticsManager:
+    """Dashboard metrics and chart data computed with GROUP BY queries.
+
+    Pages get a handful of small rows back instead of loading every record
+    and counting in Python.
+    """
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def _grouped(self, sql: str, params=()) -> List[Tuple[str, int]]:
+        return [(label, count) for label, count in self.db.fetch_all(sql, params)]
+
+    # ---------- Cybersecurity ----------
+    def incident_metrics(self) -> Dict[str, int]:
+        """Total, open and medium-or-higher incident counts in one scan."""
+        placeholders = ", ".join("?" for _ in MEDIUM_OR_ABOVE)
+        row = self.db.fetch_one(
+            f"""SELECT COUNT(*),
+                       COALESCE(SUM(status = 'Open'), 0),
+                       COALESCE(SUM(LOWER(severity) IN ({placeholders})), 0)
+                FROM cyber_incidents""",
+            MEDIUM_OR_ABOVE,
+        )
+        return {"total": row[0], "open": row[1], "medium_or_above": row[2]}
+
+    def incidents_by_type(self) -> List[Tuple[str, int]]:
+        return self._grouped(
+            "SELECT incident_type, COUNT(*) FROM cyber_incidents "
+            "GROUP BY incident_type ORDER BY COUNT(*) DESC"
+        )
+
+    def incidents_by_severity(self) -> List[Tuple[str, int]]:
+        return self._grouped(
+            "SELECT severity, COUNT(*) FROM cyber_incidents "
+            "GROUP BY severity ORDER BY COUNT(*) DESC"
+        )
+
+    def incidents_by_status(self) -> List[Tuple[str, int]]:
+        return self._grouped(
+            "SELECT status, COUNT(*) FROM cyber_incidents "
+            "GROUP BY status ORDER BY COUNT(*) DESC"
+        )
+
+    def incidents_over_time(self, bucket: str = "day",
+                            since: str | None = None) -> List[Tuple[str, str, str, int]]:
+        """(period, type, severity, count) buckets for the timeline chart.
+
+        bucket is "day", "week" or "month"; since is an ISO date that limits the
+        range with an index seek on date_reported. Rows whose date never made
+        it to ISO format fall outside the range and are left out.
+        """
+        period = BUCKETS[bucket]
+        return self.db.fetch_all(
+            f"""SELECT {period} AS period, incident_type, severity, COUNT(*)
+                FROM cyber_incidents
+                WHERE date_reported BETWEEN ? AND ?
+                GROUP BY period, incident_type, severity
+                ORDER BY period""",
+            (since or "0000-00-00", MAX_ISO),
+        )
+
+    # ---------- IT Operations ----------
+    def ticket_metrics(self, priority: str | None = None) -> Dict[str, int]:
+        """Total tickets, plus count and open count for one priority (or all)."""
+        row = self.db.fetch_one(
+            """SELECT COUNT(*),
+                      COALESCE(SUM(?1 IS NULL OR priority = ?1), 0),
+                      COALESCE(SUM((?1 IS NULL OR priority = ?1) AND status = 'Open'), 0)
+               FROM it_tickets""",
+            (priority,),
+        )
+        return {"total": row[0], "filtered": row[1], "open": row[2]}
+
+    def tickets_by_priority(self) -> List[Tuple[str, int]]:
+        return self._grouped(
+            "SELECT priority, COUNT(*) FROM it_tickets WHERE priority IS NOT NULL "
+            "AND priority != '' GROUP BY priority ORDER BY COUNT(*) DESC"
+        )
+
+    def tickets_by_status(self) -> List[Tuple[str, int]]:
+        return self._grouped(
+            "SELECT status, COUNT(*) FROM it_tickets "
+            "GROUP BY status ORDER BY COUNT(*) DESC"
+        )
+
+    def tickets_over_time(self, bucket: str = "day",
+                          since: str | None = None) -> List[Tuple[str, int]]:
+        """(period, count) buckets of ticket creation dates."""
+        period = BUCKETS[bucket].replace("date_reported", "date_created")
+        return self._grouped(
+            f"SELECT {period} AS period, COUNT(*) FROM it_tickets "
+            "WHERE date_created BETWEEN ? AND ? GROUP BY period ORDER BY period",
+            (since or "0000-00-00", MAX_ISO),
+        )
+
+    # ---------- Data Science ----------
+    def datasets_by_source(self) -> List[Tuple[str, int]]:
+        return self._grouped(
+            "SELECT COALESCE(NULLIF(source, ''), 'Unknown') AS src, COUNT(*) "
+            "FROM datasets_metadata GROUP BY src ORDER BY COUNT(*) DESC"
+        )
+
+    def dataset_count(self) -> int:
+        return self.db.fetch_one("SELECT COUNT(*) FROM datasets_metadata")[0]
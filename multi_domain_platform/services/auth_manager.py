@@ -1,32 +1,237 @@
-import bcrypt
+import base64
+import csv
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from .database_manager import DatabaseManager
+from .password_hasher import AuthThrottled, PasswordHasher
+
+SESSION_TTL = 12 * 3600          # login without "Remember me"
+REMEMBER_TTL = 30 * 24 * 3600    # login with "Remember me"
+COOKIE_NAME = "mdp_session"
+VALID_ROLES = ["admin", "analyst", "researcher", "technician", "user"]
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _session_secret(db_path):
+    """Signing key: AUTH_SECRET from the environment or st.secrets, else a key file
+    created next to the database on first use (ignored by git as *.key)."""
+    secret = os.environ.get("AUTH_SECRET")
+    if not secret:
+        try:
+            secret = st.secrets.get("AUTH_SECRET")
+        except Exception:
+            secret = None
+    if secret:
+        return secret.encode("utf-8")
+    path = os.path.join(os.path.dirname(os.path.abspath(db_path)), "session.key")
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as file:
+            file.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    with open(path) as file:
+        return file.read().strip().encode("utf-8")
+
+
+class SessionTokens:
+    """HMAC-signed, expiring login tokens with server-side revocation.
+
+    A token is base64(claims).base64(HMAC-SHA256 of claims), where the claims
+    carry the session id, username, role and expiry. A valid token says who
+    the user is and what they may do without bcrypt or a users lookup.
+    Every session also has a row in user_sessions so it can be revoked.
+
+    Validated tokens are kept in an LRU and trusted for recheck_interval
+    seconds before their session row is read again; revocations made in this
+    process drop them from the LRU at once.
+    """
+
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, db_manager, secret, cache_size=4096, recheck_interval=30.0,
+                 purge_interval=3600.0):
+        self.db = db_manager
+        self._secret = secret
+        self.cache_size = cache_size
+        self.recheck_interval = recheck_interval
+        self.purge_interval = purge_interval
+        self._cache = OrderedDict()  # token -> (claims, monotonic time of last session check)
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    @classmethod
+    def for_path(cls, db_path, **options):
+        """Return the shared token store for a database file."""
+        key = os.path.abspath(db_path)
+        with cls._stores_lock:
+            store = cls._stores.get(key)
+            if store is None:
+                store = cls(DatabaseManager(db_path), _session_secret(db_path), **options)
+                cls._stores[key] = store
+            return store
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self._secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, username, role, ttl=SESSION_TTL):
+        """Start a session and return its token."""
+        now = time.time()
+        claims = {"sid": secrets.token_urlsafe(16), "sub": username, "role": role,
+                  "iat": int(now), "exp": int(now + ttl)}
+        self.db.execute_query(
+            "INSERT INTO user_sessions (session_id, username, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?)",
+            (claims["sid"], username, now, claims["exp"])
+        )
+        if now - self._last_purge > self.purge_interval:
+            self.purge_expired()
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}"
+
+    def _decode(self, token):
+        """Claims of a correctly signed, unexpired token, else None."""
+        try:
+            payload, signature = token.split(".")
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, UnicodeError):
+            return None
+        return claims if claims.get("exp", 0) > time.time() else None
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def validate(self, token):
+        """Claims of a valid, unrevoked token, else None."""
+        if not token:
+            return None
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is not None:
+                self._cache.move_to_end(token)
+        if entry is not None:
+            claims, checked = entry
+            if claims["exp"] <= time.time():
+                self._forget(lambda c: c is claims)
+                self._count("rejected")
+                return None
+            if time.monotonic() - checked < self.recheck_interval:
+                self._count("hits")
+                return claims
+        else:
+            claims = self._decode(token)
+            if claims is None:
+                self._count("rejected")
+                return None
+        row = self.db.fetch_one("SELECT revoked FROM user_sessions WHERE session_id = ?",
+                                (claims["sid"],))
+        if row is None or row[0]:
+            self._forget(lambda c: c["sid"] == claims["sid"])
+            self._count("rejected")
+            return None
+        with self._lock:
+            self._cache[token] = (claims, time.monotonic())
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self._count("misses")
+        return claims
+
+    def _forget(self, match):
+        with self._lock:
+            for token in [t for t, (claims, _) in self._cache.items() if match(claims)]:
+                del self._cache[token]
+
+    def revoke(self, token):
+        """End the session behind a token (logout). Unknown or invalid tokens are ignored."""
+        claims = self._decode(token) if token else None
+        if claims is None:
+            return
+        self.db.execute_query("UPDATE user_sessions SET revoked = 1 WHERE session_id = ?",
+                              (claims["sid"],))
+        self._forget(lambda c: c["sid"] == claims["sid"])
+
+    def revoke_user(self, username):
+        """End every session of a user, e.g. after a password change. Returns how many."""
+        cur = self.db.execute_query(
+            "UPDATE user_sessions SET revoked = 1 WHERE username = ? AND revoked = 0",
+            (username,)
+        )
+        self._forget(lambda c: c["sub"] == username)
+        return cur.rowcount
+
+    def purge_expired(self):
+        """Delete session rows past their expiry."""
+        self._last_purge = time.time()
+        cur = self.db.execute_query("DELETE FROM user_sessions WHERE expires_at < ?",
+                                    (self._last_purge,))
+        return cur.rowcount
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses,
+                    "rejected": self.rejected}
+
 
 class AuthManager:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, hasher=None, tokens=None):
         self.db = db_manager
+        # bcrypt runs on the shared hasher's worker pool, not the script thread
+        self.hasher = hasher or PasswordHasher.shared()
+        self.tokens = tokens or SessionTokens.for_path(db_manager.db_path)
     
     def register_user_with_role(self, username, password, role="user"):
         """Register a new user with a specific role."""
-        # Check if username exists
-        existing = self.db.fetch_one("SELECT COUNT(*) FROM users WHERE username = ?", (username,))
-        if existing and existing[0] > 0:
-            raise ValueError("Username already exists")
-        
         # Validate role
-        valid_roles = ["admin", "analyst", "researcher", "technician", "user"]
-        if role not in valid_roles:
-            raise ValueError(f"Invalid role. Must be one of: {', '.join(valid_roles)}")
+        if role not in VALID_ROLES:
+            raise ValueError(f"Invalid role. Must be one of: {', '.join(VALID_ROLES)}")
         
-        # Hash password
-        password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+        # Hash password before taking the write lock, bcrypt is slow.
+        # admit() raises AuthThrottled when hashing is over its rate limit
+        self.hasher.admit()
+        password_hash = self.hasher.hash(password)
         
-        # Insert user with role
-        self.db.execute_query(
-            "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-            (username, password_hash.decode('utf-8'), role)
-        )
+        # Check and insert in one transaction so two registrations can't race
+        with self.db.transaction():
+            existing = self.db.fetch_one("SELECT COUNT(*) FROM users WHERE username = ?", (username,))
+            if existing and existing[0] > 0:
+                raise ValueError("Username already exists")
+            self.db.execute_query(
+                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                (username, password_hash, role)
+            )
     
     def login_user_with_role(self, username, password):
-        """Login user and return user data including role."""
+        """Login user and return user data including role.
+
+        Raises AuthThrottled when the account or the server has had too many
+        attempts recently.
+        """
+        # Admit before the lookup so unknown usernames are limited too
+        self.hasher.admit(username)
         # Get user from database
         result = self.db.fetch_one(
             "SELECT password_hash, role FROM users WHERE username = ?",
@@ -34,14 +239,112 @@ class AuthManager:
         )
         
         if result and result[0]:
-            stored_hash = result[0].encode('utf-8')
-            if bcrypt.checkpw(password.encode(), stored_hash):
+            if self.hasher.verify(password, result[0]):
+                # Upgrade hashes made with an older work factor while we have the password.
+                # The new hash is admitted like any other; when throttled the login still
+                # succeeds and the upgrade waits for the next one
+                if self.hasher.needs_rehash(result[0]):
+                    try:
+                        self.hasher.admit(username)
+                    except AuthThrottled:
+                        pass
+                    else:
+                        self.db.execute_query(
+                            "UPDATE users SET password_hash = ? WHERE username = ?",
+                            (self.hasher.hash(password), username)
+                        )
                 return {
                     'username': username,
                     'role': result[1] if result[1] else 'user'
                 }
         return None
     
+    def _existing_usernames(self, usernames, chunk_size=500):
+        """The subset of usernames already registered, in a few IN (...) queries."""
+        usernames = list(usernames)
+        found = set()
+        for start in range(0, len(usernames), chunk_size):
+            chunk = usernames[start:start + chunk_size]
+            rows = self.db.fetch_all(
+                f"SELECT username FROM users WHERE username IN ({', '.join('?' for _ in chunk)})",
+                chunk
+            )
+            found.update(row[0] for row in rows)
+        return found
+    
+    def register_users_bulk(self, csv_file, default_role="user", rounds=None, workers=None):
+        """Register every user in a CSV with username, password and optional role columns.
+
+        csv_file is a path or an open text file. Rows are validated in one
+        pass (roles, duplicates in the file and in the database), passwords
+        of the valid rows are hashed on all cores, and the users are inserted
+        in a single transaction. Invalid rows are skipped and reported:
+        returns {"rows", "created", "errors", "seconds"}, where each error is
+        {"row", "username", "error"} and row is the line number in the file.
+        
+        rounds overrides the work factor for this batch; hashes below the
+        configured one are upgraded at each user's first login. Hashing
+        skips admission control (see PasswordHasher.hash_many), so this is
+        for admin tools like services/provision_users.py, not for pages.
+        """
+        started = time.perf_counter()
+        if isinstance(csv_file, (str, os.PathLike)):
+            with open(csv_file, newline="", encoding="utf-8") as file:
+                return self.register_users_bulk(file, default_role, rounds, workers)
+        reader = csv.DictReader(csv_file)
+        missing = {"username", "password"} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"CSV is missing column(s): {', '.join(sorted(missing))}")
+        
+        # One pass over the file: everything that can be checked without the database
+        errors, valid, first_row = [], [], {}
+        for row in reader:
+            line = reader.line_num
+            username = (row.get("username") or "").strip()
+            password = row.get("password") or ""
+            role = (row.get("role") or "").strip() or default_role
+            if len(username) < 3:
+                error = "Username must be at least 3 characters"
+            elif not password:
+                error = "Missing password"
+            elif role not in VALID_ROLES:
+                error = f"Invalid role {role!r}"
+            elif username in first_row:
+                error = f"Duplicate of row {first_row[username]}"
+            else:
+                first_row[username] = line
+                valid.append((line, username, password, role))
+                continue
+            errors.append({"row": line, "username": username, "error": error})
+        rows = len(valid) + len(errors)
+        
+        # Don't spend bcrypt time on accounts that already exist
+        existing = self._existing_usernames(first_row)
+        new_users = []
+        for line, username, password, role in valid:
+            if username in existing:
+                errors.append({"row": line, "username": username, "error": "Username already exists"})
+            else:
+                new_users.append((line, username, password, role))
+        hashes = self.hasher.hash_many([password for _, _, password, _ in new_users], rounds, workers)
+        
+        # Check again inside the write transaction in case someone registered meanwhile
+        with self.db.transaction():
+            taken = self._existing_usernames(username for _, username, _, _ in new_users)
+            inserts = []
+            for (line, username, _, role), password_hash in zip(new_users, hashes):
+                if username in taken:
+                    errors.append({"row": line, "username": username, "error": "Username already exists"})
+                else:
+                    inserts.append((username, password_hash, role))
+            self.db.execute_many(
+                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                inserts
+            )
+        errors.sort(key=lambda error: error["row"])
+        return {"rows": rows, "created": len(inserts), "errors": errors,
+                "seconds": round(time.perf_counter() - started, 3)}
+    
     # Keep original methods for backward compatibility
     def register_user(self, username, password):
         return self.register_user_with_role(username, password, "user")
@@ -50,10 +353,50 @@ class AuthManager:
         user_data = self.login_user_with_role(username, password)
         return user_data is not None
     
-    def get_user_role(self, username):
-        """Get role of a specific user."""
+    def create_session(self, user_data, remember=False):
+        """Signed token for a user who just logged in; "Remember me" makes it last 30 days."""
+        return self.tokens.issue(user_data['username'], user_data.get('role') or 'user',
+                                 REMEMBER_TTL if remember else SESSION_TTL)
+    
+    def login_with_token(self, token):
+        """User data from a session token, without bcrypt or the users table; None if invalid."""
+        claims = self.tokens.validate(token)
+        if claims is None:
+            return None
+        return {'username': claims['sub'], 'role': claims['role']}
+    
+    def logout(self, token):
+        self.tokens.revoke(token)
+    
+    def get_user_role(self, username, token=None):
+        """Get role of a specific user, from the session token's claims when one is given."""
+        claims = self.tokens.validate(token) if token else None
+        if claims is not None and claims['sub'] == username:
+            return claims['role']
         result = self.db.fetch_one(
             "SELECT role FROM users WHERE username = ?",
             (username,)
         )
-        return result[0] if result else None
\ No newline at end of file
+        return result[0] if result else None
+
+
+def restore_session(db_path):
+    """Log this browser session in from its "Remember me" cookie.
+
+    Returns True when the session is logged in afterwards. Pages call this
+    before their login check, so a returning user skips the Login page.
+    """
+    if st.session_state.get("logged_in"):
+        return True
+    token = st.context.cookies.get(COOKIE_NAME)
+    if not token:
+        return False
+    user_data = AuthManager(DatabaseManager(db_path)).login_with_token(token)
+    if user_data is None:
+        return False
+    st.session_state.logged_in = True
+    st.session_state.username = user_data['username']
+    st.session_state.user_role = user_data['role']
+    st.session_state.session_token = token
+    return True
+
@@ -0,0 +1,262 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+
+class ConnectionPool:
+    """Process-wide SQLite pool: a bounded set of reader connections plus one writer.
+
+    Streamlit reruns every page script on a fresh thread, so connections are
+    checked out per call instead of being pinned to a thread. All connections
+    run in WAL mode, which lets readers keep going while the writer commits.
+    """
+
+    _pools: Dict[str, "ConnectionPool"] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path: str, max_readers: int = 8, busy_timeout_ms: int = 5000,
+                 cache_size_kib: int = 16384, mmap_size: int = 256 * 1024 * 1024):
+        self._db_path = db_path
+        self._max_readers = max_readers
+        self._busy_timeout_ms = busy_timeout_ms
+        self._cache_size_kib = cache_size_kib
+        self._mmap_size = mmap_size
+
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers_created = 0
+        self._readers_lock = threading.Lock()
+        self._writer: sqlite3.Connection | None = None
+        self._writer_lock = threading.RLock()
+        self._tx_depth = 0
+        self._tx_owner: int | None = None
+        # set by DatabaseManager once migrations have run against this file
+        self.schema_version: int | None = None
+        # table sets written inside the open transaction, invalidated again at the end
+        self.pending_invalidations: list = []
+        # sqlite3 trace callback, installed on each connection at its next checkout
+        self._trace_callback: Callable[[str], None] | None = None
+        self._trace_version = 0
+        self._traced: Dict[int, int] = {}
+
+        # counters exposed through stats()
+        self._stats_lock = threading.Lock()
+        self._reader_checkouts = 0
+        self._reader_waits = 0
+        self._reader_wait_time = 0.0
+        self._writer_checkouts = 0
+        self._writer_waits = 0
+        self._writer_wait_time = 0.0
+        # BEGIN IMMEDIATE blocked by another connection (usually another process)
+        self._lock_waits = 0
+        self._lock_wait_time = 0.0
+        self._lock_timeouts = 0
+
+    @classmethod
+    def for_path(cls, db_path: str, **options) -> "ConnectionPool":
+        """Return the shared pool for a database file, creating it on first use."""
+        key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(db_path, **options)
+                cls._pools[key] = pool
+            return pool
+
+    @classmethod
+    def close_all_pools(cls) -> None:
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.close()
+            cls._pools.clear()
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(os.path.abspath(self._db_path))
+        if self._db_path != ":memory:" and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self._db_path, check_same_thread=False,
+                               timeout=self._busy_timeout_ms / 1000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self._busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size={-int(self._cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(self._mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @property
+    def trace_callback(self) -> Callable[[str], None] | None:
+        return self._trace_callback
+
+    def set_trace_callback(self, callback: Callable[[str], None] | None) -> None:
+        """Have every connection report each statement SQLite runs to callback (None stops it)."""
+        self._trace_callback = callback
+        self._trace_version += 1
+
+    def _checkout(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        if self._traced.get(id(conn), 0) != self._trace_version:
+            conn.set_trace_callback(self._trace_callback)
+            self._traced[id(conn)] = self._trace_version
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read connection, opening a new one while under max_readers."""
+        if self._db_path == ":memory:":
+            # every in-memory connection is its own database, so share the writer
+            with self.writer() as conn:
+                yield conn
+            return
+        conn = None
+        waited = 0.0
+        try:
+            conn = self._idle_readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                if self._readers_created < self._max_readers:
+                    self._readers_created += 1
+                    conn = self._open()
+            if conn is None:
+                started = time.perf_counter()
+                conn = self._idle_readers.get()
+                waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._reader_checkouts += 1
+            if waited:
+                self._reader_waits += 1
+                self._reader_wait_time += waited
+        try:
+            yield self._checkout(conn)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle_readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Hold the single writer connection; re-entrant for the owning thread."""
+        started = time.perf_counter()
+        contended = not self._writer_lock.acquire(blocking=False)
+        if contended:
+            self._writer_lock.acquire()
+        waited = time.perf_counter() - started
+        try:
+            if self._writer is None:
+                self._writer = self._open()
+            with self._stats_lock:
+                self._writer_checkouts += 1
+                if contended:
+                    self._writer_waits += 1
+                    self._writer_wait_time += waited
+            yield self._checkout(self._writer)
+        finally:
+            self._writer_lock.release()
+
+    def _begin(self, conn: sqlite3.Connection) -> None:
+        """BEGIN IMMEDIATE, counting how often and how long the write lock was held elsewhere.
+
+        The first attempt doesn't wait, so an uncontended begin costs two
+        pragmas more and a contended one is known for certain instead of
+        guessed from its duration.
+        """
+        conn.execute("PRAGMA busy_timeout=0")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+        finally:
+            conn.execute(f"PRAGMA busy_timeout={int(self._busy_timeout_ms)}")
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            with self._stats_lock:
+                self._lock_timeouts += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self._lock_waits += 1
+                self._lock_wait_time += time.perf_counter() - started
+
+    @contextmanager
+    def transaction(self, on_end: Callable[[list], None] | None = None) -> Iterator[sqlite3.Connection]:
+        """Run a block as one transaction on the writer; nested blocks use savepoints.
+
+        When the outermost block ends, on_end gets the pending_invalidations
+        it collected. It runs after the commit or rollback but before the
+        writer is released, so no other transaction can have added to them.
+        """
+        with self.writer() as conn:
+            depth = self._tx_depth
+            if depth == 0:
+                if conn.in_transaction:
+                    conn.commit()
+                self._begin(conn)
+                self._tx_owner = threading.get_ident()
+            else:
+                conn.execute(f"SAVEPOINT sp_{depth}")
+            self._tx_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                if depth == 0:
+                    conn.rollback()
+                else:
+                    conn.execute(f"ROLLBACK TO SAVEPOINT sp_{depth}")
+                    conn.execute(f"RELEASE SAVEPOINT sp_{depth}")
+                raise
+            else:
+                if depth == 0:
+                    conn.commit()
+                else:
+                    conn.execute(f"RELEASE SAVEPOINT sp_{depth}")
+            finally:
+                self._tx_depth = depth
+                if depth == 0:
+                    self._tx_owner = None
+                    pending, self.pending_invalidations = self.pending_invalidations, []
+                    if on_end is not None:
+                        on_end(pending)
+
+    def owns_transaction(self) -> bool:
+        """True when the calling thread is inside transaction()."""
+        return self._tx_depth > 0 and self._tx_owner == threading.get_ident()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size and wait-time counters."""
+        with self._stats_lock:
+            return {
+                "db_path": self._db_path,
+                "max_readers": self._max_readers,
+                "readers_open": self._readers_created,
+                "readers_idle": self._idle_readers.qsize(),
+                "reader_checkouts": self._reader_checkouts,
+                "reader_waits": self._reader_waits,
+                "reader_wait_seconds": round(self._reader_wait_time, 6),
+                "writer_open": self._writer is not None,
+                "writer_checkouts": self._writer_checkouts,
+                "writer_waits": self._writer_waits,
+                "writer_wait_seconds": round(self._writer_wait_time, 6),
+                "lock_waits": self._lock_waits,
+                "lock_wait_seconds": round(self._lock_wait_time, 6),
+                "lock_timeouts": self._lock_timeouts,
+            }
+
+    def close(self) -> None:
+        with self._readers_lock:
+            while True:
+                try:
+                    self._idle_readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._readers_created = 0
+        self._traced.clear()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -0,0 +1,151 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional, counts fall back to a character estimate
+    tiktoken = None
+
+# chat format overhead, roughly what the API adds per message and per reply
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+
+Summarizer = Callable[[str, List[Dict[str, str]], int], str]
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4.1-nano") -> int:
+    """Tokens in text; about four characters a token when tiktoken is missing."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4.1-nano") -> int:
+    return sum(MESSAGE_OVERHEAD + count_tokens(m["content"], model) for m in messages)
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str, keep_end: bool = False) -> str:
+    """Cut text down to about max_tokens, from the front or from the back."""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    words = text.split()
+    # count per word is close enough here and avoids re-encoding on every step
+    kept, used = [], 0
+    for word in (reversed(words) if keep_end else words):
+        used += count_tokens(word + " ", model)
+        if used > max_tokens:
+            break
+        kept.append(word)
+    if keep_end:
+        kept.reverse()
+        return "… " + " ".join(kept)
+    return " ".join(kept) + " …"
+
+
+def extractive_summary(previous: str, turns: List[Dict[str, str]], max_tokens: int,
+                       model: str = "gpt-4.1-nano") -> str:
+    """Cheap summary without an API call: the start of each compacted turn.
+
+    New lines go after the previous summary and the oldest text is dropped
+    first once the summary is over max_tokens.
+    """
+    lines = [previous] if previous else []
+    for turn in turns:
+        lines.append(f"{turn['role']}: {truncate_tokens(' '.join(turn['content'].split()), 40, model)}")
+    return truncate_tokens("\n".join(lines), max_tokens, model, keep_end=True)
+
+
+class ConversationHistory:
+    """Chat turns kept within a token budget.
+
+    The newest turns are sent as they are. When they no longer fit, the
+    oldest ones are taken out of the window and folded into a rolling
+    summary, which is sent as a second system message. Compaction trims down
+    to compact_ratio of the budget so it doesn't run on every request, and
+    the last keep_last turns are never compacted.
+    """
+    def __init__(self, model: str = "gpt-4.1-nano", keep_last: int = 2,
+                 summary_tokens: int = 300, compact_ratio: float = 0.6):
+        self.model = model
+        self.keep_last = keep_last
+        self.summary_tokens = summary_tokens
+        self.compact_ratio = compact_ratio
+        self.turns: List[Dict[str, str]] = []
+        self.summary = ""
+        self.compacted_turns = 0
+        self.last_usage: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def __iter__(self):
+        return iter(self.turns)
+
+    def append(self, role: str, content: str) -> None:
+        self.turns.append({"role": role, "content": content})
+
+    def clear(self) -> None:
+        self.turns.clear()
+        self.summary = ""
+        self.compacted_turns = 0
+
+    def _summary_message(self) -> List[Dict[str, str]]:
+        if not self.summary:
+            return []
+        return [{"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"}]
+
+    def compact(self, system_prompt: str, budget: int, summarizer: Summarizer | None = None) -> int:
+        """Fold the oldest turns into the summary until the request fits; returns turns moved."""
+        # room for the system prompt, a full summary and the reply priming
+        fixed = (count_message_tokens([{"role": "system", "content": system_prompt}], self.model)
+                 + MESSAGE_OVERHEAD + self.summary_tokens + REPLY_OVERHEAD)
+        sizes = [count_message_tokens([turn], self.model) for turn in self.turns]
+        total = fixed + sum(sizes)
+        if total <= budget:
+            return 0
+        target = budget * self.compact_ratio
+        moved = 0
+        while len(self.turns) - moved > self.keep_last and total > target:
+            total -= sizes[moved]
+            moved += 1
+        if not moved:
+            return 0
+        old, self.turns = self.turns[:moved], self.turns[moved:]
+        summarize = summarizer or (lambda prev, turns, limit: extractive_summary(prev, turns, limit, self.model))
+        self.summary = truncate_tokens(summarize(self.summary, old, self.summary_tokens),
+                                 self.summary_tokens, self.model, keep_end=True)
+        self.compacted_turns += moved
+        return moved
+
+    def build_messages(self, system_prompt: str, budget: int,
+                       summarizer: Summarizer | None = None) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Messages for the next request plus a usage report for it."""
+        moved = self.compact(system_prompt, budget, summarizer)
+        system = [{"role": "system", "content": system_prompt}]
+        summary = self._summary_message()
+        messages = system + summary + self.turns
+        self.last_usage = {
+            "budget": budget,
+            "system_tokens": count_message_tokens(system, self.model),
+            "summary_tokens": count_message_tokens(summary, self.model),
+            "history_tokens": count_message_tokens(self.turns, self.model),
+            "prompt_tokens": count_message_tokens(messages, self.model) + REPLY_OVERHEAD,
+            "turns_sent": len(self.turns),
+            "turns_compacted": moved,
+            "turns_summarized": self.compacted_turns,
+            "completion_tokens": None,
+        }
+        return messages, self.last_usage
@@ -1,57 +1,399 @@
+import base64
+import csv
+import json
+import re
 import sqlite3
+import time
 import pandas as pd
-from typing import Any, Iterable
+from pandas.api.types import union_categoricals
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Sequence
+from .connection_pool import ConnectionPool
+from .query_cache import QueryCache, read_tables, written_tables
+from .query_stats import QueryStats
+from database import dates, migrations
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def _typed_frame(rows, columns, dtypes, categorical, parse_dates) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    if dtypes:
+        df = df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+    for column in categorical:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    for column in parse_dates:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], format="ISO8601", errors="coerce")
+    return df
 class DatabaseManager:
-    """Handles SQLite database connections and queries."""
-    def __init__(self, db_path: str):
+    """Handles SQLite database connections and queries.
+
+    Connections come from a process-wide ConnectionPool, so building a new
+    DatabaseManager on every Streamlit rerun is cheap. With use_cache=True,
+    fetch_one/fetch_all results are served from a shared QueryCache until a
+    write touches one of the tables they read. Every statement is timed into
+    the file's shared QueryStats (see query_stats()).
+    """
+    def __init__(self, db_path: str, pool: ConnectionPool | None = None, auto_migrate: bool = True,
+                 use_cache: bool = False):
         self._db_path = db_path
-        self._connection: sqlite3.Connection | None = None
+        self._pool = pool or ConnectionPool.for_path(db_path)
+        # every manager invalidates the shared cache on writes, even if it doesn't read from it
+        self._cache = QueryCache.for_path(db_path)
+        self._use_cache = use_cache
+        stats = QueryStats.for_path(db_path)
+        self._stats = stats if stats.enabled else None
+        if stats.trace_enabled and self._pool.trace_callback is None:
+            self._pool.set_trace_callback(stats.trace)
+        # only the first manager per database file pays for the schema check
+        if auto_migrate and self._pool.schema_version is None:
+            self.migrate()
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
     def connect(self) -> None:
-        if self._connection is None:
-            self._connection = sqlite3.connect(self._db_path)
+        """Kept for compatibility; connections are opened lazily by the pool."""
     def close(self) -> None:
-        if self._connection is not None:
-            self._connection.close()
-            self._connection = None
+        """Kept for compatibility; pooled connections stay open across reruns."""
+    def _read_connection(self):
+        # inside a transaction reads must see its own uncommitted writes
+        if self._pool.owns_transaction():
+            return self._pool.writer()
+        return self._pool.reader()
+    @contextmanager
+    def transaction(self) -> Iterator["DatabaseManager"]:
+        """Group writes into a single commit; nested blocks become savepoints.
+
+        execute_query/execute_many calls inside the block do not commit on
+        their own, and everything is rolled back if the block raises.
+        """
+        with self._pool.transaction(on_end=self._invalidate_pending):
+            yield self
+    def _invalidate_pending(self, pending: list) -> None:
+        # readers may have cached pre-commit rows since the writes ran
+        for tables in pending:
+            self._cache.invalidate(tables)
+    def _invalidate(self, sql: str) -> None:
+        # called after the commit, or deferred to the end of the transaction, so
+        # a reader can't cache pre-write rows under the new table version
+        tables = written_tables(sql)
+        if self._pool.owns_transaction():
+            self._pool.pending_invalidations.append(tables)
+        else:
+            self._cache.invalidate(tables)
+    def _record(self, sql: str, started: float, rows: int, params=(), error: bool = False) -> None:
+        if self._stats is not None:
+            self._stats.record(sql, time.perf_counter() - started, rows, params, self.explain, error)
     def execute_query(self, sql: str, params: Iterable[Any] = ()):
         """Execute a write query (INSERT, UPDATE, DELETE)."""
-        if self._connection is None:
-            self.connect()
-        cur = self._connection.cursor()
-        cur.execute(sql, tuple(params))
-        self._connection.commit()
+        params = tuple(params)
+        started = time.perf_counter()
+        try:
+            with self._pool.writer() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                if not self._pool.owns_transaction():
+                    conn.commit()
+                self._invalidate(sql)
+        except sqlite3.Error:
+            self._record(sql, started, 0, params, error=True)
+            raise
+        self._record(sql, started, cur.rowcount, params)
         return cur
+    def execute_many(self, sql: str, seq_of_params: Iterable[Iterable[Any]]) -> int:
+        """Run one write statement for every parameter tuple with a single commit."""
+        started = time.perf_counter()
+        try:
+            with self._pool.writer() as conn:
+                cur = conn.cursor()
+                cur.executemany(sql, (tuple(p) for p in seq_of_params))
+                if not self._pool.owns_transaction():
+                    conn.commit()
+                self._invalidate(sql)
+        except sqlite3.Error:
+            self._record(sql, started, 0, error=True)
+            raise
+        # no plan for a batch: there is no single parameter tuple to explain with
+        if self._stats is not None:
+            self._stats.record(sql, time.perf_counter() - started, cur.rowcount)
+        return cur.rowcount
+    def bulk_insert(self, table: str, columns: Sequence[str], rows: Iterable[Iterable[Any]],
+                    chunk_size: int = 5000) -> int:
+        """Insert many rows in one transaction, chunk_size rows per execute_many.
+
+        The chunks share the one transaction rather than taking a savepoint
+        each: a failed chunk rolls everything back anyway, and with the row
+        counter triggers every savepoint made later chunks slower.
+        """
+        for name in (table, *columns):
+            if not _IDENTIFIER.match(name):
+                raise ValueError(f"Invalid identifier: {name!r}")
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        inserted = 0
+        chunk = []
+        with self.transaction():
+            for row in rows:
+                chunk.append(tuple(row))
+                if len(chunk) >= chunk_size:
+                    inserted += self.execute_many(sql, chunk)
+                    chunk = []
+            if chunk:
+                inserted += self.execute_many(sql, chunk)
+        return inserted
+    def _fetch(self, sql: str, params: tuple, one: bool):
+        started = time.perf_counter()
+        try:
+            with self._read_connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                result = cur.fetchone() if one else cur.fetchall()
+        except sqlite3.Error:
+            self._record(sql, started, 0, params, error=True)
+            raise
+        self._record(sql, started, (result is not None) if one else len(result), params)
+        return result
+    def _cached_fetch(self, sql: str, params: Iterable[Any], one: bool):
+        params = tuple(params)
+        tables = read_tables(sql) if self._use_cache else None
+        # never cache inside a transaction, it may see uncommitted rows
+        if tables is None or self._pool.owns_transaction():
+            return self._fetch(sql, params, one)
+        key = (sql, params, one)
+        hit, result = self._cache.get(key)
+        if hit and self._stats is not None:
+            self._stats.record_cache_hit(sql)
+        if not hit:
+            versions = self._cache.versions_for(tables)
+            result = self._fetch(sql, params, one)
+            self._cache.put(key, versions, result)
+        # hand out a copy so callers can't change the cached list
+        return list(result) if isinstance(result, list) else result
     def fetch_one(self, sql: str, params: Iterable[Any] = ()):
-        if self._connection is None:
-            self.connect()
-        cur = self._connection.cursor()
-        cur.execute(sql, tuple(params))
-        return cur.fetchone()
+        return self._cached_fetch(sql, params, one=True)
     def fetch_all(self, sql: str, params: Iterable[Any] = ()):
-        if self._connection is None:
-            self.connect()
-        cur = self._connection.cursor() 
-        cur.execute(sql, tuple(params))
-        return cur.fetchall()
-    def get_incidents_data(self):
-        conn = sqlite3.connect("intelligence_platform.db")
-        df = pd.read_sql_query("SELECT * FROM cyber_incidents", conn)
-        conn.close()
+        return self._cached_fetch(sql, params, one=False)
+    def fetch_page(self, table: str, columns: Sequence[str], sort_by: str = "rowid",
+                   descending: bool = False, filters: Dict[str, Any] | None = None,
+                   page_size: int = 50, cursor: str | None = None) -> Dict[str, Any]:
+        """Fetch one page of rows using a keyset cursor instead of OFFSET.
+
+        Rows are ordered by (sort_by, rowid) and the next page seeks past the
+        last key seen, so every page costs the same no matter how deep it is.
+        sort_by should be an indexed NOT NULL column. filters maps a column to
+        a value, or to a list/tuple of values for IN. Returns
+        {"rows": [...], "next_cursor": token or None}.
+        """
+        query = self.page_query(table, columns, sort_by, descending, filters, page_size, cursor)
+        if query is None:
+            return {"rows": [], "next_cursor": None}
+        sql, params = query
+        rows = self.fetch_all(sql, params)
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self._encode_cursor(rows[-1][:2], sort_by, descending)
+        return {"rows": [row[2:] for row in rows], "next_cursor": next_cursor}
+    @classmethod
+    def page_query(cls, table: str, columns: Sequence[str], sort_by: str = "rowid",
+                   descending: bool = False, filters: Dict[str, Any] | None = None,
+                   page_size: int = 50, cursor: str | None = None):
+        """(sql, params) fetch_page runs, or None when a filter can match nothing."""
+        for name in (table, sort_by, *columns, *(filters or {})):
+            if not _IDENTIFIER.match(name):
+                raise ValueError(f"Invalid identifier: {name!r}")
+        where, params = [], []
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                values = list(value)
+                if not values:
+                    return None
+                where.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+            else:
+                where.append(f"{column} = ?")
+                params.append(value)
+
+        op = "<" if descending else ">"
+        if cursor is not None:
+            last_key = cls._decode_cursor(cursor, sort_by, descending)
+            if sort_by == "rowid":
+                where.append(f"rowid {op} ?")
+                params.append(last_key[1])
+            else:
+                where.append(f"({sort_by}, rowid) {op} (?, ?)")
+                params.extend(last_key)
+
+        direction = "DESC" if descending else "ASC"
+        order = f"rowid {direction}" if sort_by == "rowid" else f"{sort_by} {direction}, rowid {direction}"
+        sql = (f"SELECT {sort_by}, rowid, {', '.join(columns)} FROM {table}"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+               f" ORDER BY {order} LIMIT ?")
+        # one extra row tells us whether there is a next page
+        return sql, (*params, page_size + 1)
+    @staticmethod
+    def _encode_cursor(last_key, sort_by: str, descending: bool) -> str:
+        payload = json.dumps({"s": sort_by, "d": descending, "k": list(last_key)})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+    @staticmethod
+    def _decode_cursor(cursor: str, sort_by: str, descending: bool):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid page cursor") from e
+        if payload.get("s") != sort_by or payload.get("d") != descending:
+            raise ValueError("Page cursor was created for a different sort order")
+        return payload["k"]
+    def fetch_date_range(self, table: str, date_column: str, columns: Sequence[str],
+                         start=None, end=None, descending: bool = True,
+                         limit: int | None = None):
+        """Rows whose ISO date column falls between start and end (both inclusive).
+
+        start/end may be dates, datetimes or date strings; either can be None
+        for an open range. The filter is a half-open range on the raw column
+        so SQLite answers it with an index seek.
+        """
+        for name in (table, date_column, *columns):
+            if not _IDENTIFIER.match(name):
+                raise ValueError(f"Invalid identifier: {name!r}")
+        where, params = [], []
+        if start is not None:
+            where.append(f"{date_column} >= ?")
+            params.append(dates.to_iso(start))
+        if end is not None:
+            where.append(f"{date_column} < ?")
+            params.append(dates.next_day_iso(end))
+        elif start is not None:
+            where.append(f"{date_column} <= ?")
+            params.append(dates.MAX_ISO)
+        if None in params:
+            raise ValueError("Could not parse the date range")
+        sql = (f"SELECT {', '.join(columns)} FROM {table}"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+               f" ORDER BY {date_column} {'DESC' if descending else 'ASC'}")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.fetch_all(sql, params)
+    def fetch_recent(self, table: str, date_column: str, columns: Sequence[str],
+                     days: int = 7, limit: int | None = None):
+        """Rows from the last `days` calendar days (today included), newest first."""
+        return self.fetch_date_range(table, date_column, columns,
+                                     start=dates.period_start_iso(days), limit=limit)
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool size and wait-time counters."""
+        return self._pool.stats()
+    def cache_stats(self) -> Dict[str, Any]:
+        """Query cache hit/miss/eviction counters."""
+        return self._cache.stats()
+    def query_stats(self, top: int | None = None) -> Dict[str, Any]:
+        """Per-statement latency, rows and slow queries (see QueryStats.snapshot)."""
+        return QueryStats.for_path(self._db_path).snapshot(top)
+    def write_metrics(self, path: str | None = None) -> str:
+        """Write the query metrics in Prometheus text format; returns the file written."""
+        return QueryStats.for_path(self._db_path).write_prometheus(path)
+    def fetch_iter(self, sql: str, params: Iterable[Any] = (), arraysize: int = 1000) -> Iterator[tuple]:
+        """Yield rows one at a time, pulling arraysize rows from SQLite per round trip.
+
+        The pooled connection stays checked out until the generator is
+        exhausted or closed, so consume it promptly.
+        """
+        for batch in self._iter_batches(sql, params, arraysize):
+            yield from batch[1]
+    def _iter_batches(self, sql: str, params: Iterable[Any], arraysize: int):
+        # only the time spent in SQLite counts, not what the consumer does between batches
+        params = tuple(params)
+        spent, count, error = 0.0, 0, False
+        try:
+            with self._read_connection() as conn:
+                started = time.perf_counter()
+                cur = conn.cursor()
+                cur.arraysize = arraysize
+                cur.execute(sql, params)
+                columns = [d[0] for d in cur.description] if cur.description else []
+                while True:
+                    rows = cur.fetchmany()
+                    spent += time.perf_counter() - started
+                    if not rows:
+                        break
+                    count += len(rows)
+                    yield columns, rows
+                    started = time.perf_counter()
+        except sqlite3.Error:
+            error = True
+            raise
+        finally:
+            if self._stats is not None:
+                self._stats.record(sql, spent, count, params, self.explain, error)
+    def iter_dataframes(self, sql: str, params: Iterable[Any] = (), chunksize: int = 10000,
+                        dtypes: Dict[str, Any] | None = None, categorical: Sequence[str] = (),
+                        parse_dates: Sequence[str] = ()) -> Iterator[pd.DataFrame]:
+        """Yield the result as DataFrames of at most chunksize rows.
+
+        dtypes are applied per chunk, categorical columns become pandas
+        categories and parse_dates columns are parsed as ISO-8601.
+        """
+        for columns, rows in self._iter_batches(sql, params, chunksize):
+            yield _typed_frame(rows, columns, dtypes, categorical, parse_dates)
+    def read_dataframe(self, sql: str, params: Iterable[Any] = (), chunksize: int = 10000,
+                       dtypes: Dict[str, Any] | None = None, categorical: Sequence[str] = (),
+                       parse_dates: Sequence[str] = ()) -> pd.DataFrame:
+        """Load a whole result through iter_dataframes, keeping categories compact."""
+        frames = list(self.iter_dataframes(sql, params, chunksize, dtypes, categorical, parse_dates))
+        if not frames:
+            with self._read_connection() as conn:
+                cur = conn.execute(sql, tuple(params))
+                return pd.DataFrame(columns=[d[0] for d in cur.description or []])
+        df = pd.concat(frames, ignore_index=True)
+        # concat turns categoricals with different categories back into objects
+        for column in categorical:
+            if column in df.columns and len(frames) > 1:
+                df[column] = union_categoricals([f[column] for f in frames], ignore_order=True)
         return df
+    def export_csv(self, sql: str, file, params: Iterable[Any] = (), arraysize: int = 5000) -> int:
+        """Stream a query result into an open text file as CSV; returns rows written."""
+        writer = csv.writer(file)
+        written = 0
+        header_done = False
+        for columns, rows in self._iter_batches(sql, params, arraysize):
+            if not header_done:
+                writer.writerow(columns)
+                header_done = True
+            writer.writerows(rows)
+            written += len(rows)
+        return written
+    def get_incidents_data(self, chunksize: int | None = None):
+        """Incidents as a DataFrame with categorical type/severity/status columns.
+
+        Pass chunksize to get an iterator of DataFrames instead.
+        """
+        sql = ("SELECT id, date_reported, incident_type, severity, status, description "
+               "FROM cyber_incidents ORDER BY id")
+        options = {"dtypes": {"id": "int64"},
+                   "categorical": ("incident_type", "severity", "status"),
+                   "parse_dates": ("date_reported",)}
+        if chunksize:
+            return self.iter_dataframes(sql, chunksize=chunksize, **options)
+        return self.read_dataframe(sql, **options)
 
+    def migrate(self) -> list:
+        """Bring the schema up to date and return the migration versions applied."""
+        with self._pool.transaction() as conn:
+            applied = migrations.apply_migrations(conn)
+            self._pool.schema_version = migrations.get_version(conn)
+        if applied:
+            self._cache.clear()
+        return applied
+    def schema_version(self) -> int:
+        with self._read_connection() as conn:
+            return migrations.get_version(conn)
+    def explain(self, sql: str, params: Iterable[Any] = ()) -> list:
+        """EXPLAIN QUERY PLAN details for a statement, for checking index use."""
+        with self._read_connection() as conn:
+            return migrations.explain(conn, sql, tuple(params))
     def ensure_tables_exist(self):
-        """Create tables if they don't exist."""
-        self.connect()
-    
-    # Create cyber_incidents table
-        self._connection.execute("""
-        CREATE TABLE IF NOT EXISTS cyber_incidents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            incident_type TEXT,
-            severity TEXT,
-            status TEXT DEFAULT 'Open',
-            description TEXT
-        )
-    """)
-    
-        self._connection.commit()
\ No newline at end of file
+        """Create tables if they don't exist (all schema work lives in the migrations)."""
+        self.migrate()
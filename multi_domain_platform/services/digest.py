@@ -0,0 +1,203 @@
+"""Compact statistical digests of the incident and ticket tables for AI prompts.
+
+Listing every row as "- Malware (High)" spends most of the prompt on lines
+the model has already seen. A digest sends the same information as counts:
+type x severity x status, time trends, outliers and a few example rows,
+so the prompt stays a few hundred tokens whatever the table size.
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from models.batches import CategoryColumn, IncidentBatch, TicketBatch
+from models.security_incident import SEVERITY_LEVELS
+from .conversation import count_tokens
+
+# how many buckets of the trend are shown, newest last
+TREND_BUCKETS = {"day": 14, "week": 12, "month": 12}
+
+
+def _cross_counts(columns: Sequence[CategoryColumn]) -> List[Tuple[tuple, int]]:
+    """Counts of every value combination across columns, largest first."""
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    sizes = [max(len(c.categories), 1) for c in columns]
+    for column, size in zip(columns, sizes):
+        key = key * size + column.codes
+    totals = np.bincount(key, minlength=int(np.prod(sizes)))
+    found = np.flatnonzero(totals)
+    found = found[np.argsort(-totals[found], kind="stable")]
+    combos = []
+    for flat in found:
+        codes = np.unravel_index(flat, sizes)
+        combos.append((tuple(c.categories[i] for c, i in zip(columns, codes)), int(totals[flat])))
+    return combos
+
+
+def _lines_tokens(combos: List[Tuple[tuple, int]], template: str, model: str) -> int:
+    """Tokens a row-per-line dump would take; each distinct line shape is counted once."""
+    return sum(count * (count_tokens(template.format(*values), model) + 1) for values, count in combos)
+
+
+def _buckets(dates: np.ndarray, bucket: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(bucket labels, counts) for a datetime64[D] array; NaT dates are skipped."""
+    dates = dates[~np.isnat(dates)]
+    if not len(dates):
+        return np.array([], dtype=str), np.array([], dtype=np.int64)
+    if bucket == "week":
+        days = dates.astype(np.int64)
+        # day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday
+        dates = (days - (days + 3) % 7).astype("datetime64[D]")
+    elif bucket == "month":
+        dates = dates.astype("datetime64[M]")
+    elif bucket != "day":
+        raise ValueError(f"Unknown bucket {bucket!r}")
+    labels, counts = np.unique(dates, return_counts=True)
+    return labels.astype(str), counts
+
+
+def _outliers(labels: np.ndarray, counts: np.ndarray, z: float = 2.0) -> List[Tuple[str, int]]:
+    """Labels whose count is more than z standard deviations above the mean."""
+    if len(counts) < 4 or counts.std() == 0:
+        return []
+    scores = (counts - counts.mean()) / counts.std()
+    return [(str(labels[i]), int(counts[i])) for i in np.flatnonzero(scores > z)]
+
+
+def _format_counts(counts: Dict[Any, int]) -> str:
+    return ", ".join(f"{value or 'Unknown'} {count}" for value, count in counts.items())
+
+
+def _format_combos(combos: List[Tuple[tuple, int]], limit: int) -> str:
+    shown = "; ".join("/".join(str(v or "?") for v in values) + f" {count}"
+                      for values, count in combos[:limit])
+    rest = sum(count for _, count in combos[limit:])
+    return shown + (f"; other {rest}" if rest else "")
+
+
+def _trend(labels: np.ndarray, counts: np.ndarray, bucket: str) -> List[str]:
+    shown = TREND_BUCKETS[bucket]
+    lines = [f"Trend by {bucket} (last {min(shown, len(labels))}): "
+             + ", ".join(f"{label} {count}" for label, count in zip(labels[-shown:], counts[-shown:]))]
+    if len(counts) >= 2 * shown:
+        recent, before = counts[-shown:].sum(), counts[-2 * shown:-shown].sum()
+        if before:
+            lines.append(f"Change vs previous {shown} {bucket}s: {100 * (recent - before) / before:+.0f}%")
+    outliers = _outliers(labels, counts)
+    if outliers:
+        lines.append(f"Unusual {bucket}s (>2 sd above mean): " + ", ".join(f"{l} {c}" for l, c in outliers))
+    return lines
+
+
+def _shorten(text: str | None, limit: int = 160) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class DigestBuilder:
+    """Builds digests from the database with vectorized counts over columnar batches.
+
+    Each digest is a dict with the prompt text and its measured size:
+    {"text", "records", "digest_tokens", "raw_tokens", "reduction"}, where
+    raw_tokens is what the old one-line-per-row prompt would have cost and
+    reduction is raw_tokens / digest_tokens.
+    """
+    def __init__(self, db_manager, model: str = "gpt-4.1-nano"):
+        self.db = db_manager
+        self.model = model
+
+    def _result(self, lines: List[str], records: int, raw_tokens: int) -> Dict[str, Any]:
+        text = "\n".join(lines)
+        tokens = count_tokens(text, self.model)
+        return {
+            "text": text,
+            "records": records,
+            "digest_tokens": tokens,
+            "raw_tokens": raw_tokens,
+            "reduction": round(raw_tokens / tokens, 1) if tokens else 0.0,
+        }
+
+    # ---------- Cybersecurity ----------
+    def incident_digest(self, bucket: str = "week", top_k: int = 5, max_combos: int = 25) -> Dict[str, Any]:
+        batch = IncidentBatch.from_rows(self.db.fetch_iter(
+            "SELECT date_reported, incident_type, severity, status FROM cyber_incidents"
+        ), include_descriptions=False)
+        if not len(batch):
+            return self._result(["No incidents recorded."], 0, 0)
+        combos = _cross_counts([batch.incident_type, batch.severity, batch.status])
+        dates = batch.dates()
+        valid = dates[~np.isnat(dates)]
+        labels, counts = _buckets(dates, bucket)
+        metrics = batch.metrics()
+        lines = [
+            f"Cybersecurity incidents: {metrics['total']} total, {metrics['open']} open, "
+            f"{metrics['medium_or_above']} medium or above"
+            + (f", reported {valid.min()} to {valid.max()}" if len(valid) else ""),
+            "Status: " + _format_counts(batch.count_by("status")),
+            "Severity: " + _format_counts(batch.count_by("severity")),
+            "Type: " + _format_counts(batch.count_by("incident_type")),
+            "Type/severity/status: " + _format_combos(combos, max_combos),
+            *_trend(labels, counts, bucket),
+        ]
+        # most severe open incidents first, then the newest
+        levels = " ".join(f"WHEN '{name}' THEN {level}" for name, level in SEVERITY_LEVELS.items())
+        top = self.db.fetch_all(
+            f"""SELECT date_reported, incident_type, severity, description FROM cyber_incidents
+                WHERE status = 'Open'
+                ORDER BY CASE LOWER(severity) {levels} ELSE 0 END DESC, date_reported DESC
+                LIMIT ?""",
+            (top_k,),
+        )
+        if top:
+            lines.append(f"Top {len(top)} open by severity:")
+            lines += [f"[{sev}] {d} {i_type}: {_shorten(desc)}" for d, i_type, sev, desc in top]
+        # the old prompt listed "- type (severity)" for every incident
+        raw = _lines_tokens(_cross_counts([batch.incident_type, batch.severity]), "- {} ({})", self.model)
+        return self._result(lines, len(batch), raw)
+
+    # ---------- IT Operations ----------
+    def ticket_digest(self, bucket: str = "week", top_k: int = 5, max_combos: int = 25) -> Dict[str, Any]:
+        batch = TicketBatch.from_rows(self.db.fetch_iter(
+            "SELECT ticket_id, date_created, priority, status, assigned_to FROM it_tickets"
+        ))
+        if not len(batch):
+            return self._result(["No tickets recorded."], 0, 0)
+        combos = _cross_counts([batch.priority, batch.status])
+        labels, counts = _buckets(batch.dates(), bucket)
+        metrics = batch.metrics()
+        lines = [
+            f"IT tickets: {metrics['total']} total, {metrics['open']} open",
+            "Status: " + _format_counts(batch.count_by("status")),
+            "Issue type/status: " + _format_combos(combos, max_combos),
+            *_trend(labels, counts, bucket),
+        ]
+        # open tickets per assignee, and anyone carrying far more than the rest
+        open_mask = batch.status_mask("Open")
+        load = np.bincount(batch.assigned_to.codes[open_mask], minlength=len(batch.assigned_to.categories))
+        names = np.array([str(name or "Unassigned") for name in batch.assigned_to.categories])
+        busiest = np.argsort(-load, kind="stable")[:top_k]
+        if load.any():
+            lines.append("Open by assignee (top): " + ", ".join(
+                f"{names[i]} {load[i]}" for i in busiest if load[i]))
+        overloaded = _outliers(names, load)
+        if overloaded:
+            lines.append("Overloaded assignees: " + ", ".join(f"{n} {c}" for n, c in overloaded))
+        top = self.db.fetch_all(
+            """SELECT ticket_id, priority, description FROM it_tickets WHERE status = 'Open'
+               ORDER BY date_created DESC LIMIT ?""",
+            (top_k,),
+        )
+        if top:
+            lines.append(f"Newest {len(top)} open:")
+            lines += [f"#{t_id} {priority}: {_shorten(desc)}" for t_id, priority, desc in top]
+        # the old prompt listed "- #id: priority (status)" for every ticket;
+        # ids are counted once per digit length instead of once per ticket
+        raw = _lines_tokens(combos, "- #: {} ({})", self.model)
+        digits = np.char.str_len(batch.ticket_id.astype(str))
+        for length, count in zip(*np.unique(digits, return_counts=True)):
+            raw += int(count) * count_tokens("9" * int(length), self.model)
+        return self._result(lines, len(batch), raw)
+
+    @staticmethod
+    def prompt(digest: Dict[str, Any], task: str) -> str:
+        """Analysis prompt for AIAssistant.send_message."""
+        return f"Analyze this digest of {digest['records']} records:\n{digest['text']}\n\n{task}"
@@ -0,0 +1,68 @@
+import bisect
+import threading
+from typing import Any, Dict, Sequence
+
+# upper bounds in seconds, roughly x2.5 apart; the last bucket is unbounded
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every call.
+
+    Unlike keeping the last N samples it has constant memory and covers
+    everything since start-up; percentiles are estimated by interpolating
+    inside the bucket they fall in.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self._count += 1
+            self._sum += seconds
+            self._max = max(self._max, seconds)
+
+    def _percentile(self, pct: float) -> float | None:
+        if not self._count:
+            return None
+        rank = pct / 100 * self._count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                # no estimate above the slowest call actually seen
+                upper = min(self.bounds[index], self._max) if index < len(self.bounds) else self._max
+                return round(lower + (upper - lower) * (rank - seen) / count, 4)
+            seen += count
+        return round(self._max, 4)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """count, sum, mean, max, p50/p95/p99 and cumulative bucket counts (le -> count)."""
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip((*self.bounds, float("inf")), self._counts):
+                running += count
+                cumulative[bound] = running
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 6),
+                "mean": round(self._sum / self._count, 4) if self._count else None,
+                "max": round(self._max, 4),
+                "p50": self._percentile(50),
+                "p95": self._percentile(95),
+                "p99": self._percentile(99),
+                "buckets": cumulative,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self.bounds) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
@@ -0,0 +1,289 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Callable, Dict, List
+
+from .ai_assistant import AIAssistant, DEFAULT_ANALYSIS_TASK
+from .database_manager import DatabaseManager
+from .digest import DigestBuilder
+from .response_cache import ResponseCache
+
+# queued -> running -> done | failed | cancelled
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed", "cancelled")
+
+# progress(fraction, message=None, result=None); result is the text so far
+Progress = Callable[..., None]
+Handler = Callable[["JobQueue", Dict[str, Any], Progress, threading.Event], str]
+
+
+class JobQueue:
+    """SQLite-backed queue of long-running AI analyses run on worker threads.
+
+    Jobs are rows in analysis_jobs, so a page can submit one, let the user
+    navigate away, and show the result later or in another session. Workers
+    write progress and the partial answer back while they run; pages poll
+    get() to show it. Submitting a job identical to one still queued or
+    running returns the existing job instead of starting another.
+
+    Several processes can share one database. A job records the queue that
+    runs it (owner) and that queue refreshes heartbeat_at every
+    heartbeat_interval seconds. A running job whose heartbeat is older than
+    stale_after, because its process died, is queued again and run here;
+    jobs of live processes are left alone. This check runs on start-up and
+    with every heartbeat.
+    """
+
+    _queues: Dict[str, "JobQueue"] = {}
+    _queues_lock = threading.Lock()
+    _handlers: Dict[str, Handler] = {}
+
+    def __init__(self, db_path: str, workers: int = 2, progress_interval: float = 0.5,
+                 heartbeat_interval: float = 10.0, stale_after: float = 60.0):
+        self.db_path = db_path
+        self.db = DatabaseManager(db_path)
+        self.progress_interval = progress_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        # a pid alone can be reused by a later process
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        self._cancel_events: Dict[int, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._recover()
+        self._heartbeat = threading.Thread(target=self._beat, name="analysis-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    @classmethod
+    def for_path(cls, db_path: str, **options) -> "JobQueue":
+        """Return the shared queue for a database file, starting its workers on first use."""
+        key = os.path.abspath(db_path)
+        with cls._queues_lock:
+            job_queue = cls._queues.get(key)
+            if job_queue is None:
+                job_queue = cls(db_path, **options)
+                cls._queues[key] = job_queue
+            return job_queue
+
+    @classmethod
+    def register(cls, kind: str, handler: Handler) -> None:
+        """Add a job kind; handler(queue, job, progress, cancel) returns the result text."""
+        cls._handlers[kind] = handler
+
+    def _recover(self) -> None:
+        """Queue again the running jobs whose owner went quiet, then start the queued ones."""
+        with self.db.transaction():
+            self.db.execute_query(
+                "UPDATE analysis_jobs SET status = 'queued', owner = NULL, progress = 0, "
+                "message = 'Restarted' WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (time.time() - self.stale_after,),
+            )
+            queued = self.db.fetch_all("SELECT id FROM analysis_jobs WHERE status = 'queued' ORDER BY id")
+        for (job_id,) in queued:
+            with self._lock:
+                if job_id in self._cancel_events:
+                    continue  # already waiting for a worker here
+            # another live queue may start it too; the claim in _run lets only one run it
+            self._start(job_id)
+
+    def _beat(self) -> None:
+        """Keep this queue's running jobs fresh and pick up the jobs of dead processes."""
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                self.db.execute_query(
+                    "UPDATE analysis_jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                    (time.time(), self.owner),
+                )
+                self._recover()
+            except sqlite3.Error:
+                continue  # e.g. locked for longer than the busy timeout; try again next beat
+
+    def _start(self, job_id: int) -> None:
+        with self._lock:
+            self._cancel_events[job_id] = threading.Event()
+        self._executor.submit(self._run, job_id)
+
+    def submit(self, kind: str, params: Dict[str, Any] | None = None,
+               created_by: str | None = None) -> int:
+        """Queue a job and return its id (or the id of the same job already pending)."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        encoded = json.dumps(params or {}, sort_keys=True)
+        with self.db.transaction():
+            row = self.db.fetch_one(
+                "SELECT id FROM analysis_jobs WHERE kind = ? AND params = ? AND status IN (?, ?)",
+                (kind, encoded, *ACTIVE),
+            )
+            if row is not None:
+                return row[0]
+            cur = self.db.execute_query(
+                "INSERT INTO analysis_jobs (kind, params, created_by, created_at) VALUES (?, ?, ?, ?)",
+                (kind, encoded, created_by, time.time()),
+            )
+            job_id = cur.lastrowid
+        self._start(job_id)
+        return job_id
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        keys = ("id", "kind", "params", "status", "progress", "message", "result", "error",
+                "created_by", "created_at", "started_at", "finished_at", "owner", "heartbeat_at")
+        job = dict(zip(keys, row))
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def get(self, job_id: int) -> Dict[str, Any] | None:
+        row = self.db.fetch_one("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,))
+        return self._row_to_job(row) if row is not None else None
+
+    def latest(self, kind: str, status: str | None = None) -> Dict[str, Any] | None:
+        """Most recent job of a kind, optionally only with a given status."""
+        row = self.db.fetch_one(
+            "SELECT * FROM analysis_jobs WHERE kind = ? AND (?2 IS NULL OR status = ?2) "
+            "ORDER BY created_at DESC, id DESC LIMIT 1",
+            (kind, status),
+        )
+        return self._row_to_job(row) if row is not None else None
+
+    def list_jobs(self, kind: str | None = None, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self.db.fetch_all(
+            "SELECT * FROM analysis_jobs WHERE ?1 IS NULL OR kind = ?1 "
+            "ORDER BY created_at DESC, id DESC LIMIT ?2",
+            (kind, limit),
+        )
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: int) -> bool:
+        """Stop a queued or running job; False if it had already finished."""
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        cur = self.db.execute_query(
+            "UPDATE analysis_jobs SET status = 'cancelled', finished_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id),
+        )
+        return cur.rowcount > 0 or event is not None
+
+    def _run(self, job_id: int) -> None:
+        with self._lock:
+            cancel = self._cancel_events.setdefault(job_id, threading.Event())
+        try:
+            now = time.time()
+            cur = self.db.execute_query(
+                "UPDATE analysis_jobs SET status = 'running', owner = ?, heartbeat_at = ?, started_at = ?, "
+                "message = 'Starting' WHERE id = ? AND status = 'queued'",
+                (self.owner, now, now, job_id),
+            )
+            if cur.rowcount == 0:
+                return  # cancelled, or claimed by another queue, before a worker picked it up
+            job = self.get(job_id)
+            last_write = 0.0
+
+            def progress(fraction: float, message: str | None = None, result: str | None = None) -> None:
+                nonlocal last_write
+                now = time.monotonic()
+                # streaming updates arrive per token; only write a few times a second
+                if now - last_write < self.progress_interval and fraction < 1:
+                    return
+                last_write = now
+                cur = self.db.execute_query(
+                    "UPDATE analysis_jobs SET progress = ?, message = COALESCE(?, message), "
+                    "result = COALESCE(?, result) WHERE id = ? AND owner = ? AND status = 'running'",
+                    (round(fraction, 4), message, result, job_id, self.owner),
+                )
+                if cur.rowcount == 0:
+                    cancel.set()  # taken over after a missed heartbeat; the new owner runs it
+
+            try:
+                result = self._handlers[job["kind"]](self, job, progress, cancel)
+            except Exception as error:
+                self._finish(job_id, "failed", None, f"{type(error).__name__}: {error}")
+                return
+            self._finish(job_id, "cancelled" if cancel.is_set() else "done", result, None)
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+    def _finish(self, job_id: int, status: str, result: str | None, error: str | None) -> None:
+        self.db.execute_query(
+            "UPDATE analysis_jobs SET status = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, "
+            "message = ?, result = COALESCE(?, result), error = ?, finished_at = ? "
+            "WHERE id = ? AND owner = ? AND status = 'running'",
+            (status, status, status.capitalize(), result, error, time.time(), job_id, self.owner),
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._stopped.set()
+        with self._lock:
+            for event in self._cancel_events.values():
+                event.set()
+        self._executor.shutdown(wait=wait)
+
+
+# ---------- built-in analyses ----------
+# (domain, digest method, deep-analysis query, record format)
+_ANALYSES = {
+    "incident_analysis": (
+        "Cybersecurity", "incident_digest",
+        "SELECT date_reported, incident_type, severity, status, description FROM cyber_incidents",
+        "- {} | {} | {} | {} | {}",
+    ),
+    "ticket_analysis": (
+        "IT Operations", "ticket_digest",
+        "SELECT ticket_id, priority, status, assigned_to, description FROM it_tickets",
+        "- #{}: {} ({}) {} {}",
+    ),
+}
+
+
+def _run_table_analysis(job_queue: JobQueue, job: Dict[str, Any], progress: Progress,
+                        cancel: threading.Event) -> str:
+    """Digest analysis by default; map-reduce over every row when params["deep"] is set."""
+    domain, digest_method, sql, line = _ANALYSES[job["kind"]]
+    ai = AIAssistant(cache=ResponseCache.for_path(job_queue.db_path))
+    db = job_queue.db
+    text = ""
+    if job["params"].get("deep"):
+        # parts are read as the analysis goes, so progress is measured in rows
+        expected = db.fetch_one(f"SELECT COUNT(*) FROM ({sql})")[0]
+        records = (line.format(*(value or "" for value in row)) for row in db.fetch_iter(sql))
+        with closing(ai.analyze_all(records, domain=domain, cancel=cancel)) as events:
+            for event in events:
+                if cancel.is_set():
+                    break
+                if event["stage"] == "map":
+                    # the map step is most of the work; the reduce step fills the rest
+                    share = event["done"] / event["parts"] * event["records"] / max(expected, 1)
+                    progress(0.9 * min(share, 1.0),
+                             f"Analyzed {event['done']} of {event['parts']} parts "
+                             f"({event['records']} of {expected} records read)")
+                elif event["stage"] == "reduce":
+                    text += event["text"]
+                    progress(0.95, "Merging", text)
+                elif event["stage"] == "error":
+                    raise RuntimeError(event["error"])
+                elif event["failed_parts"]:
+                    text += (f"\n\n_{event['failed_parts']} of {event['parts']} parts could not be "
+                             "analyzed and are missing from this analysis._")
+                    progress(0.95, "Merged with missing parts", text)
+        return text
+    progress(0.05, "Building digest")
+    digest = getattr(DigestBuilder(db, model=ai.model), digest_method)()
+    prompt = DigestBuilder.prompt(digest, job["params"].get("task") or DEFAULT_ANALYSIS_TASK)
+    with closing(ai.send_message(prompt, domain=domain, cancel=cancel)) as stream:
+        for chunk in stream:
+            text += chunk
+            progress(0.5, f"Digest of {digest['records']} records, {digest['digest_tokens']} tokens", text)
+    return text
+
+
+for _kind in _ANALYSES:
+    JobQueue.register(_kind, _run_table_analysis)
@@ -0,0 +1,348 @@
+"""Offline model backends: a latency stub, a recorder and a replayer.
+
+They expose the same client / async_client / run() interface as
+LLMClientPool, so pages and benchmarks run without network or an API key.
+Which backend the pages use is set by LLM_BACKEND (environment variable or
+st.secrets): "openai" (the default), "stub", "record" or "replay". Without
+an OPENAI_API_KEY the stub answers instead, as a dummy assistant.
+
+Recordings ("cassettes") are JSON lines, one request per line, with each
+streamed chunk stored next to the delay before it so a replay reproduces
+the original timing.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from abc import abstractmethod
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+import streamlit as st
+
+from .conversation import count_message_tokens, count_tokens
+from .llm_client import LLMBackend, LLMClientPool
+from .response_cache import ResponseCache
+
+DEFAULT_CASSETTE = "database/llm_cassette.jsonl"
+
+# (seconds to wait before the chunk, chunk text)
+Plan = List[Tuple[float, str]]
+
+# padding for stub replies, so their length (and so their latency) is fixed
+LOREM = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua")
+
+
+def request_key(model: str, messages: List[Dict[str, str]]) -> str:
+    """Key a recording by the same normalized hash the response cache uses."""
+    return ResponseCache.make_key(model, "", messages)
+
+
+def _usage(messages: List[Dict[str, str]], text: str, model: str):
+    prompt = count_message_tokens(messages, model)
+    completion = count_tokens(text, model)
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion,
+                           total_tokens=prompt + completion)
+
+
+def _chunk(text: str):
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=text))],
+                           usage=None)
+
+
+def _completion(text: str, usage):
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=SimpleNamespace(
+        role="assistant", content=text))], usage=usage)
+
+
+def _client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+class ScriptedBackend(LLMBackend):
+    """Base for backends that know every chunk and delay before answering.
+
+    Subclasses implement _plan(); streaming, usage reporting and the sync
+    and async clients are handled here.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    @abstractmethod
+    def _plan(self, model: str, messages: List[Dict[str, str]]) -> Plan:
+        """(delay before the chunk, chunk text) pairs making up the reply."""
+
+    def _count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def _create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **options):
+        self._count()
+        plan = self._plan(model, messages)
+        text = "".join(piece for _, piece in plan)
+        include_usage = (options.get("stream_options") or {}).get("include_usage")
+        if not stream:
+            time.sleep(sum(delay for delay, _ in plan))
+            return _completion(text, _usage(messages, text, model))
+
+        def chunks():
+            for delay, piece in plan:
+                if delay:
+                    time.sleep(delay)
+                yield _chunk(piece)
+            if include_usage:
+                yield SimpleNamespace(choices=[], usage=_usage(messages, text, model))
+        return chunks()
+
+    async def _create_async(self, model: str, messages: List[Dict[str, str]], stream: bool = False,
+                            **options):
+        self._count()
+        plan = self._plan(model, messages)
+        text = "".join(piece for _, piece in plan)
+        include_usage = (options.get("stream_options") or {}).get("include_usage")
+        if not stream:
+            await asyncio.sleep(sum(delay for delay, _ in plan))
+            return _completion(text, _usage(messages, text, model))
+
+        async def chunks():
+            for delay, piece in plan:
+                if delay:
+                    await asyncio.sleep(delay)
+                yield _chunk(piece)
+            if include_usage:
+                yield SimpleNamespace(choices=[], usage=_usage(messages, text, model))
+        return chunks()
+
+    @property
+    def client(self):
+        return _client(self._create)
+
+    @property
+    def async_client(self):
+        return _client(self._create_async)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "requests": self.requests}
+
+
+class StubBackend(ScriptedBackend):
+    """Deterministic placeholder replies with a configurable latency profile.
+
+    The first chunk arrives after ttft seconds and the rest at
+    tokens_per_second, so page rendering and analysis throughput can be
+    measured without a model.
+    """
+    name = "stub"
+
+    def __init__(self, ttft: float = 0.2, tokens_per_second: float = 50.0, reply_words: int = 60,
+                 reply: str | None = None):
+        super().__init__()
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.reply_words = reply_words
+        self.reply = reply
+
+    def _reply_text(self, messages: List[Dict[str, str]]) -> str:
+        if self.reply is not None:
+            return self.reply
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        lead = ("The AI assistant is running offline (no model backend is configured), "
+                f"so this is a placeholder reply to: \"{' '.join(question.split()[:20])}\".")
+        filler = LOREM.split()
+        padding = (filler * (self.reply_words // len(filler) + 1))[:self.reply_words]
+        return " ".join([lead, *padding])
+
+    def _plan(self, model: str, messages: List[Dict[str, str]]) -> Plan:
+        words = self._reply_text(messages).split(" ")
+        gap = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        return [(self.ttft if i == 0 else gap, word if i == 0 else " " + word)
+                for i, word in enumerate(words)]
+
+
+class ReplayBackend(ScriptedBackend):
+    """Replays recorded streams chunk by chunk with their original timing.
+
+    speed scales the delays (2.0 replays twice as fast, 0 without waiting).
+    Requests that were never recorded go to fallback, or raise KeyError
+    when there is none. Several recordings of one request are replayed in
+    turn.
+    """
+    name = "replay"
+
+    def __init__(self, path: str = DEFAULT_CASSETTE, speed: float = 1.0,
+                 fallback: ScriptedBackend | None = None):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.fallback = fallback
+        self.misses = 0
+        self._recordings: Dict[str, List[Plan]] = {}
+        self._next: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._recordings.setdefault(entry["key"], []).append(
+                            [(delay, text) for delay, text in entry["chunks"]])
+
+    def _lookup(self, model: str, messages: List[Dict[str, str]]) -> Plan | None:
+        key = request_key(model, messages)
+        with self._lock:
+            plans = self._recordings.get(key)
+            if not plans:
+                self.misses += 1
+                return None
+            index = self._next.get(key, 0)
+            self._next[key] = index + 1
+            return plans[index % len(plans)]
+
+    def _plan(self, model: str, messages: List[Dict[str, str]]) -> Plan:
+        plan = self._lookup(model, messages)
+        if plan is None:
+            if self.fallback is not None:
+                return self.fallback._plan(model, messages)
+            raise KeyError(f"No recording for this request in {self.path}")
+        scale = 1 / self.speed if self.speed else 0.0
+        return [(delay * scale, text) for delay, text in plan]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "recordings": sum(map(len, self._recordings.values())),
+                "misses": self.misses}
+
+
+class RecordingBackend(LLMBackend):
+    """Passes requests to another backend and appends every reply to a cassette.
+
+    Streams are timed chunk by chunk as they arrive; only streams read to
+    the end are recorded. Non-streamed replies are stored as one chunk
+    carrying the whole latency.
+    """
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, path: str = DEFAULT_CASSETTE):
+        self.inner = inner
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def _save(self, model: str, messages: List[Dict[str, str]], plan: Plan) -> None:
+        entry = {"key": request_key(model, messages), "model": model,
+                 "recorded_at": time.time(), "chunks": plan}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.recorded += 1
+
+    def _create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **options):
+        started = time.perf_counter()
+        response = self.inner.client.chat.completions.create(
+            model=model, messages=messages, stream=stream, **options)
+        if not stream:
+            self._save(model, messages, [(time.perf_counter() - started, response.choices[0].message.content or "")])
+            return response
+
+        def chunks():
+            plan: Plan = []
+            last = started
+            try:
+                for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        now = time.perf_counter()
+                        plan.append((round(now - last, 6), chunk.choices[0].delta.content))
+                        last = now
+                    yield chunk
+            finally:
+                close = getattr(response, "close", None)
+                if close is not None:
+                    close()
+            self._save(model, messages, plan)
+        return chunks()
+
+    async def _create_async(self, model: str, messages: List[Dict[str, str]], stream: bool = False,
+                            **options):
+        started = time.perf_counter()
+        response = await self.inner.async_client.chat.completions.create(
+            model=model, messages=messages, stream=stream, **options)
+        if not stream:
+            self._save(model, messages, [(time.perf_counter() - started, response.choices[0].message.content or "")])
+            return response
+
+        async def chunks():
+            plan: Plan = []
+            last = started
+            try:
+                async for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        now = time.perf_counter()
+                        plan.append((round(now - last, 6), chunk.choices[0].delta.content))
+                        last = now
+                    yield chunk
+            finally:
+                close = getattr(response, "close", None)
+                if close is not None:
+                    await close()
+            self._save(model, messages, plan)
+        return chunks()
+
+    @property
+    def client(self):
+        return _client(self._create)
+
+    @property
+    def async_client(self):
+        return _client(self._create_async)
+
+    def run(self, coro):
+        return self.inner.run(coro)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.inner.stats(), "backend": self.name, "recorded": self.recorded}
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+_backends: Dict[tuple, LLMBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def _setting(name: str, default: str | None = None) -> str | None:
+    """Environment variable first, then st.secrets (which may not exist at all)."""
+    if os.environ.get(name):
+        return os.environ[name]
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+def default_backend() -> LLMBackend:
+    """The backend pages use, chosen by LLM_BACKEND and shared by the process."""
+    kind = (_setting("LLM_BACKEND") or "openai").lower()
+    api_key = _setting("OPENAI_API_KEY")
+    cassette = _setting("LLM_CASSETTE", DEFAULT_CASSETTE)
+    if kind in ("openai", "record") and not api_key:
+        kind = "stub"  # dummy assistant when no key is configured
+    if kind == "openai":
+        return LLMClientPool.for_config(api_key, _setting("OPENAI_BASE_URL"))
+    key = (kind, cassette)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            if kind == "stub":
+                backend = StubBackend()
+            elif kind == "replay":
+                backend = ReplayBackend(cassette, fallback=StubBackend())
+            elif kind == "record":
+                backend = RecordingBackend(LLMClientPool.for_config(api_key, _setting("OPENAI_BASE_URL")),
+                                           cassette)
+            else:
+                raise ValueError(f"Unknown LLM_BACKEND {kind!r}")
+            _backends[key] = backend
+        return backend
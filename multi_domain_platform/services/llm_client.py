@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import threading
+import weakref
+from typing import Any, Coroutine, Dict
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+import streamlit as st
+
+
+class LLMBackend(ABC):
+    """What AIAssistant needs from a model provider.
+
+    client and async_client follow the OpenAI chat.completions.create API;
+    run() executes a coroutine that uses async_client. LLMClientPool is the
+    real OpenAI backend; services/llm_backends.py has offline ones.
+    """
+    name = "base"
+
+    @property
+    @abstractmethod
+    def client(self):
+        """Client with the sync chat.completions.create API."""
+
+    @property
+    @abstractmethod
+    def async_client(self):
+        """Client with the async chat.completions.create API, used through run()."""
+
+    def run(self, coro: Coroutine) -> Any:
+        return asyncio.run(coro)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class LLMClientPool(LLMBackend):
+    """Process-wide OpenAI clients sharing one keep-alive HTTP connection pool.
+
+    Pages build an AIAssistant on every rerun; taking the client from here
+    means a warm rerun reuses open TLS connections instead of setting up a
+    new pool each time. Only the transport is shared: conversation history
+    stays with each session (see ConversationHistory).
+
+    The async client lives on a background event loop owned by the pool,
+    because httpx async connections can't outlive the loop that opened them
+    and asyncio.run() starts a new loop per call. Use run() to execute
+    coroutines that talk to async_client.
+    """
+
+    name = "openai"
+    _pools: Dict[tuple, "LLMClientPool"] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, api_key: str, base_url: str | None = None, max_connections: int = 20,
+                 max_keepalive_connections: int = 10, keepalive_expiry: float = 60.0,
+                 timeout: float = 60.0, connect_timeout: float = 5.0, max_retries: int = 2):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self._api_key = api_key
+        self._client: OpenAI | None = None
+        self._async_client: AsyncOpenAI | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        # counters exposed through stats(); a connection is "new" the first
+        # time one of its responses is seen
+        self._stats_lock = threading.Lock()
+        self._seen_streams: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._seen_ids: set = set()
+        self._clients_created = 0
+        self._requests = 0
+        self._new_connections = 0
+        self._reused_connections = 0
+        self._errors = 0
+
+    @classmethod
+    def for_config(cls, api_key: str, base_url: str | None = None, **options) -> "LLMClientPool":
+        """Return the shared pool for an endpoint and settings, creating it on first use."""
+        key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        key = (base_url, key_hash, tuple(sorted(options.items())))
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(api_key, base_url, **options)
+                cls._pools[key] = pool
+            return pool
+
+    @classmethod
+    def default(cls, **options) -> "LLMClientPool":
+        """Pool for the API key (and optional OPENAI_BASE_URL) in st.secrets."""
+        return cls.for_config(st.secrets["OPENAI_API_KEY"], st.secrets.get("OPENAI_BASE_URL"), **options)
+
+    @classmethod
+    def close_all_pools(cls) -> None:
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.close()
+            cls._pools.clear()
+
+    def _http_options(self) -> Dict[str, Any]:
+        import httpx  # installed with openai
+        return {
+            "limits": httpx.Limits(max_connections=self.max_connections,
+                                   max_keepalive_connections=self.max_keepalive_connections,
+                                   keepalive_expiry=self.keepalive_expiry),
+            "timeout": httpx.Timeout(self.timeout, connect=self.connect_timeout),
+        }
+
+    def _record(self, response) -> None:
+        stream = response.extensions.get("network_stream")
+        with self._stats_lock:
+            self._requests += 1
+            if response.status_code >= 400:
+                self._errors += 1
+            if stream is None:
+                return
+            try:
+                reused = stream in self._seen_streams
+                self._seen_streams.add(stream)
+            except TypeError:  # not weak-referenceable; fall back to ids
+                reused = id(stream) in self._seen_ids
+                self._seen_ids.add(id(stream))
+            if reused:
+                self._reused_connections += 1
+            else:
+                self._new_connections += 1
+
+    async def _record_async(self, response) -> None:
+        self._record(response)
+
+    @property
+    def client(self) -> OpenAI:
+        with self._lock:
+            if self._client is None:
+                http_client = DefaultHttpxClient(event_hooks={"response": [self._record]},
+                                                 **self._http_options())
+                self._client = OpenAI(api_key=self._api_key, base_url=self.base_url,
+                                      max_retries=self.max_retries, http_client=http_client)
+                self._clients_created += 1
+            return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        with self._lock:
+            if self._async_client is None:
+                http_client = DefaultAsyncHttpxClient(event_hooks={"response": [self._record_async]},
+                                                      **self._http_options())
+                self._async_client = AsyncOpenAI(api_key=self._api_key, base_url=self.base_url,
+                                                 max_retries=self.max_retries, http_client=http_client)
+                self._clients_created += 1
+            return self._async_client
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name="llm-client-loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the pool's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            connections = self._new_connections + self._reused_connections
+            return {
+                "clients_created": self._clients_created,
+                "requests": self._requests,
+                "errors": self._errors,
+                "new_connections": self._new_connections,
+                "reused_connections": self._reused_connections,
+                "reuse_rate": round(self._reused_connections / connections, 4) if connections else 0.0,
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "timeout": self.timeout,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            client, async_client, loop = self._client, self._async_client, self._loop
+            self._client = self._async_client = self._loop = None
+        if client is not None:
+            client.close()
+        if loop is not None:
+            if async_client is not None:
+                asyncio.run_coroutine_threadsafe(async_client.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            if self._loop_thread is not None:
+                self._loop_thread.join(timeout=5)
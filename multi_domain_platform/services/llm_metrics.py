@@ -0,0 +1,100 @@
+import threading
+from typing import Any, Dict
+
+from .histogram import LatencyHistogram
+
+# upper bounds in seconds for reply latencies, which run from tenths of a second to a minute
+STREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+
+class _DomainMetrics:
+    def __init__(self):
+        self.counts = {"requests": 0, "cached": 0, "cancelled": 0, "failed": 0, "tokens": 0}
+        self.ttft = LatencyHistogram(STREAM_BUCKETS)
+        self.latency = LatencyHistogram(STREAM_BUCKETS)
+        self.rate_sum = 0.0
+        self.rate_count = 0
+
+
+class StreamMetrics:
+    """Per-domain latency numbers for streamed assistant replies.
+
+    Every reply records its time to first token, its total latency and its
+    generation rate (tokens per second after the first token). Latencies go
+    into LatencyHistograms, the same as query and hashing times, so their
+    percentiles are estimated the same way; everything covers the time
+    since start-up. Cached, cancelled and failed replies are counted but
+    left out of the latency numbers.
+    """
+
+    _shared: "StreamMetrics | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self._domains: Dict[str, _DomainMetrics] = {}
+        # every domain together, for summary()
+        self._latency = LatencyHistogram(STREAM_BUCKETS)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "StreamMetrics":
+        """The process-wide store used by AIAssistant unless given another."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def record(self, domain: str, seconds: float, ttft: float | None, tokens: int,
+               cancelled: bool = False, cached: bool = False, failed: bool = False) -> None:
+        with self._lock:
+            metrics = self._domains.get(domain)
+            if metrics is None:
+                metrics = self._domains[domain] = _DomainMetrics()
+            counts = metrics.counts
+            counts["requests"] += 1
+            counts["cached"] += cached
+            counts["cancelled"] += cancelled
+            counts["failed"] += failed
+            counts["tokens"] += tokens
+            if cached or cancelled or failed:
+                return
+            if ttft is not None and seconds > ttft and tokens:
+                metrics.rate_sum += tokens / (seconds - ttft)
+                metrics.rate_count += 1
+        if ttft is not None:
+            metrics.ttft.observe(ttft)
+        metrics.latency.observe(seconds)
+        self._latency.observe(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """domain -> counts plus p50/p95 TTFT, latency and mean tokens per second."""
+        with self._lock:
+            domains = {name: (dict(m.counts), m.rate_sum, m.rate_count, m)
+                       for name, m in self._domains.items()}
+        report = {}
+        for domain, (counts, rate_sum, rate_count, metrics) in domains.items():
+            ttft, latency = metrics.ttft.snapshot(), metrics.latency.snapshot()
+            report[domain] = {
+                **counts,
+                "ttft_p50": ttft["p50"],
+                "ttft_p95": ttft["p95"],
+                "latency_p50": latency["p50"],
+                "latency_p95": latency["p95"],
+                "tokens_per_second": round(rate_sum / rate_count, 2) if rate_count else None,
+            }
+        return report
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts and p50/p95 latency over every domain together."""
+        with self._lock:
+            totals = {"requests": 0, "cached": 0, "cancelled": 0, "failed": 0, "tokens": 0}
+            for metrics in self._domains.values():
+                for name in totals:
+                    totals[name] += metrics.counts[name]
+        latency = self._latency.snapshot()
+        return {**totals, "latency_p50": latency["p50"], "latency_p95": latency["p95"]}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._domains.clear()
+            self._latency.reset()
@@ -0,0 +1,221 @@
+"""bcrypt hashing off the Streamlit script threads, with admission control.
+
+A bcrypt check costs ~250 ms of CPU at the default work factor and holds
+the script thread that runs it. PasswordHasher runs hashes in a small
+process pool instead, and admits them through token buckets: a global one
+caps the CPU spent on auth during a login burst, and one per username
+limits guessing against a single account.
+
+Settings come from the environment: BCRYPT_ROUNDS (work factor for new
+hashes, default 12), AUTH_WORKERS (pool size), AUTH_RATE / AUTH_BURST
+(global hashes per second / burst) and AUTH_USER_RATE / AUTH_USER_BURST
+(per username).
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Sequence
+
+import bcrypt
+
+from .histogram import LatencyHistogram
+from .rate_limiter import TokenBucket
+
+
+class AuthThrottled(Exception):
+    """Raised when a login or registration is refused by admission control."""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def hash_rounds(hashed: bytes | str) -> int | None:
+    """Work factor stored in a bcrypt hash ("$2b$12$..." -> 12)."""
+    if isinstance(hashed, bytes):
+        hashed = hashed.decode("ascii", "replace")
+    parts = hashed.split("$")
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+
+class PasswordHasher:
+    """Hashes and checks passwords on a bounded worker pool.
+
+    Callers still wait for their own result, but the CPU work happens in
+    worker processes (threads with processes=False; bcrypt releases the GIL),
+    so other sessions' reruns keep their share of the interpreter. At most
+    workers hashes run at once, whatever the number of sessions logging in.
+
+    Admission happens before any work: the global bucket is waited on for
+    up to admission_timeout seconds, the per-user bucket is not waited on
+    at all. Either refusal raises AuthThrottled with a retry hint.
+    """
+
+    _shared: "PasswordHasher | None" = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rounds: int = 12, workers: int | None = None, processes: bool = True,
+                 rate: float = 20.0, burst: float | None = None,
+                 user_rate: float = 0.2, user_burst: float = 5.0,
+                 admission_timeout: float = 5.0, max_tracked_users: int = 10000):
+        if not 4 <= rounds <= 31:
+            raise ValueError("bcrypt rounds must be between 4 and 31")
+        self.rounds = rounds
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.processes = processes
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.admission_timeout = admission_timeout
+        self.max_tracked_users = max_tracked_users
+        self.bucket = TokenBucket(rate, burst if burst is not None else max(1.0, rate))
+        self._user_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self.throttled = {"global": 0, "user": 0}
+        self.histograms = {
+            "hash": LatencyHistogram(),
+            "verify": LatencyHistogram(),
+            "admission_wait": LatencyHistogram(),
+            "hash_many": LatencyHistogram(),
+        }
+
+    @classmethod
+    def shared(cls) -> "PasswordHasher":
+        """Process-wide hasher configured from the environment."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                env = os.environ
+                cls._shared = cls(
+                    rounds=int(env.get("BCRYPT_ROUNDS", 12)),
+                    workers=int(env["AUTH_WORKERS"]) if env.get("AUTH_WORKERS") else None,
+                    rate=float(env.get("AUTH_RATE", 20.0)),
+                    burst=float(env["AUTH_BURST"]) if env.get("AUTH_BURST") else None,
+                    user_rate=float(env.get("AUTH_USER_RATE", 0.2)),
+                    user_burst=float(env.get("AUTH_USER_BURST", 5.0)),
+                )
+            return cls._shared
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.processes:
+                    # spawn, not fork: the server process has many threads running
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="bcrypt")
+            return self._executor
+
+    def _user_bucket(self, username: str) -> TokenBucket:
+        key = username.strip().lower()
+        with self._lock:
+            bucket = self._user_buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.user_rate, self.user_burst)
+                self._user_buckets[key] = bucket
+                if len(self._user_buckets) > self.max_tracked_users:
+                    self._user_buckets.popitem(last=False)
+            else:
+                self._user_buckets.move_to_end(key)
+            return bucket
+
+    def admit(self, username: str | None = None) -> None:
+        """Take a token for one hash, or raise AuthThrottled."""
+        if username is not None and not self._user_bucket(username).try_acquire():
+            with self._lock:
+                self.throttled["user"] += 1
+            raise AuthThrottled("Too many attempts for this account", 1 / self.user_rate)
+        started = time.perf_counter()
+        admitted = self.bucket.acquire(timeout=self.admission_timeout)
+        self.histograms["admission_wait"].observe(time.perf_counter() - started)
+        if not admitted:
+            with self._lock:
+                self.throttled["global"] += 1
+            raise AuthThrottled("Sign-in is busy", 1 / self.bucket.rate)
+
+    def _run(self, operation: str, function, *args):
+        started = time.perf_counter()
+        try:
+            try:
+                return self._get_executor().submit(function, *args).result()
+            except BrokenProcessPool:
+                # workers could not start (e.g. a script without a __main__ guard);
+                # threads still keep bcrypt off the caller since it releases the GIL
+                self.shutdown(wait=False)
+                self.processes = False
+                return self._get_executor().submit(function, *args).result()
+        finally:
+            self.histograms[operation].observe(time.perf_counter() - started)
+
+    # workers are sent bcrypt's own functions (salts are made here), so a
+    # spawned worker only has to import bcrypt, not this package
+    def hash(self, password: str) -> str:
+        """bcrypt hash at the configured work factor. Call admit() first."""
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run("hash", bcrypt.hashpw, password.encode(), salt).decode("utf-8")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        """Check a password against a stored hash. Call admit() first."""
+        return self._run("verify", bcrypt.checkpw, password.encode(), hashed.encode("utf-8"))
+
+    def hash_many(self, passwords: Sequence[str], rounds: int | None = None,
+                  workers: int | None = None) -> List[str]:
+        """Hash a batch of passwords on every core, for bulk provisioning.
+
+        Runs on a pool of its own sized to the machine (not the login pool)
+        and skips admission control, so it is only for trusted admin tools
+        such as AuthManager.register_users_bulk. Never call it with input
+        from a login or registration form: one call can keep every core
+        busy for as long as the batch takes.
+        """
+        if not passwords:
+            return []
+        salts = [bcrypt.gensalt(rounds or self.rounds) for _ in passwords]
+        encoded = [password.encode() for password in passwords]
+        workers = min(workers or os.cpu_count() or 1, len(encoded))
+        chunksize = max(1, len(encoded) // (workers * 4))
+
+        def run(executor: Executor) -> List[bytes]:
+            with executor as pool:
+                return list(pool.map(bcrypt.hashpw, encoded, salts, chunksize=chunksize))
+
+        def threads() -> Executor:
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+        started = time.perf_counter()
+        try:
+            hashes = run(ProcessPoolExecutor(max_workers=workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+                         if self.processes else threads())
+        except BrokenProcessPool:
+            hashes = run(threads())
+        self.histograms["hash_many"].observe(time.perf_counter() - started)
+        return [hashed.decode("utf-8") for hashed in hashes]
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when a stored hash uses a different work factor from the configured one."""
+        return hash_rounds(hashed) != self.rounds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            throttled = dict(self.throttled)
+            tracked = len(self._user_buckets)
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "processes": self.processes,
+            "throttled": throttled,
+            "tracked_users": tracked,
+            "admission": self.bucket.stats(),
+            **{name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
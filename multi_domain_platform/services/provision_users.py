@@ -0,0 +1,33 @@
+"""Register users in bulk from a CSV file (see AuthManager.register_users_bulk).
+
+    python -m services.provision_users users.csv [--default-role analyst]
+
+The CSV needs username and password columns and may have a role column.
+Invalid rows are listed with their line number and skipped; the exit code
+is 1 when any row was skipped.
+"""
+import argparse
+
+from .auth_manager import VALID_ROLES, AuthManager
+from .database_manager import DatabaseManager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Register users in bulk from a CSV file.")
+    parser.add_argument("csv_file")
+    parser.add_argument("--db", default="database/intelligence_platform.db")
+    parser.add_argument("--default-role", default="user", choices=VALID_ROLES,
+                        help="role for rows without one")
+    parser.add_argument("--rounds", type=int, help="bcrypt work factor (default BCRYPT_ROUNDS or 12)")
+    parser.add_argument("--workers", type=int, help="hashing processes (default: all cores)")
+    args = parser.parse_args(argv)
+    report = AuthManager(DatabaseManager(args.db)).register_users_bulk(
+        args.csv_file, args.default_role, args.rounds, args.workers)
+    for error in report["errors"]:
+        print(f"row {error['row']} ({error['username'] or '-'}): {error['error']}")
+    print(f"Created {report['created']} of {report['rows']} users in {report['seconds']}s")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
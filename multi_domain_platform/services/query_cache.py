@@ -0,0 +1,159 @@
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Set, Tuple
+
+_WRITE_TARGET = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM"
+    r"|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|CREATE\s+TABLE(?:\s+IF\s+NOT\s+EXISTS)?)"
+    r"\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+_READ_SOURCES = re.compile(r"\b(?:FROM|JOIN)\s+[\"`\[]?(\w+)", re.IGNORECASE)
+_READ_ONLY = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+
+
+def written_tables(sql: str) -> Set[str] | None:
+    """Tables a write statement changes, or None when it can't be worked out."""
+    match = _WRITE_TARGET.match(sql)
+    return {match.group(1).lower()} if match else None
+
+
+def read_tables(sql: str) -> Set[str] | None:
+    """Tables a SELECT reads from, or None when the statement isn't cacheable."""
+    if not _READ_ONLY.match(sql):
+        return None
+    tables = {name.lower() for name in _READ_SOURCES.findall(sql)}
+    return tables or None
+
+
+def _approx_size(rows) -> int:
+    if rows is None:
+        return 0
+    if isinstance(rows, tuple):
+        rows = [rows]
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    """Bounded LRU cache of SELECT results, invalidated per table on writes.
+
+    Every table has a version counter. An entry remembers the versions of the
+    tables it read, and any write to one of those tables bumps the counter
+    and makes the entry stale. Writes only invalidate what they touch, so
+    a new ticket doesn't throw away cached incident charts.
+
+    Only writes made through DatabaseManager are seen; changes made by other
+    processes are not detected.
+    """
+
+    _caches: Dict[str, "QueryCache"] = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024,
+                 max_rows: int = 20000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[tuple, Tuple[Dict[str, int], Any, int]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def for_path(cls, db_path: str, **options) -> "QueryCache":
+        """Return the shared cache for a database file, creating it on first use."""
+        key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+        with cls._caches_lock:
+            cache = cls._caches.get(key)
+            if cache is None:
+                cache = cls(**options)
+                cls._caches[key] = cache
+            return cache
+
+    def _is_fresh(self, versions: Dict[str, int]) -> bool:
+        return all(self._versions.get(table, 0) == version for table, version in versions.items())
+
+    def get(self, key: tuple) -> Tuple[bool, Any]:
+        """Return (hit, result) for a key built from the SQL and its parameters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_fresh(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return False, None
+
+    def versions_for(self, tables: Iterable[str]) -> Dict[str, int]:
+        """Snapshot of table versions; take it before running the query."""
+        with self._lock:
+            # "*" is the epoch bumped when everything is invalidated at once
+            return {table: self._versions.get(table, 0) for table in (*tables, "*")}
+
+    def put(self, key: tuple, versions: Dict[str, int], result) -> None:
+        rows = result if isinstance(result, list) else [result] if result is not None else []
+        if len(rows) > self.max_rows:
+            return
+        size = _approx_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # a write landed while the query ran; caching now would store stale rows
+            if not self._is_fresh(versions):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (versions, result, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, tables: Iterable[str] | None) -> None:
+        """Bump the version of each table; None means every table changed."""
+        with self._lock:
+            self.invalidations += 1
+            if tables is None:
+                self._entries.clear()
+                self._bytes = 0
+                self._versions["*"] = self._versions.get("*", 0) + 1
+                return
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self) -> None:
+        self.invalidate(None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "table_versions": dict(self._versions),
+            }
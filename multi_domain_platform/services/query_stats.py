@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Iterable, List
+
+from .histogram import LatencyHistogram
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+# string and blob literals, then numbers that aren't part of an identifier or a ?1/:1 placeholder
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\bx'[0-9a-f]*'|(?<![\w?:@$])\d+(?:\.\d+)?(?:e[+-]?\d+)?\b",
+                      re.IGNORECASE)
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+_EXPLAINABLE = re.compile(r"^\s*(?:SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+OTHER = "(other)"
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """The statement with literals replaced by ? and IN lists collapsed.
+
+    Calls that differ only in their values (or in how many values an IN
+    list has) share a fingerprint, so they are timed together.
+    """
+    text = _COMMENT.sub(" ", sql)
+    text = _LITERAL.sub("?", text)
+    text = _IN_LIST.sub("IN (...)", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def query_id(fp: str) -> str:
+    """Short stable id for a fingerprint, used as a label next to the (long) text."""
+    return hashlib.sha1(fp.encode("utf-8")).hexdigest()[:12]
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _env_options() -> Dict[str, Any]:
+    """Settings from the environment; anything passed to for_path wins."""
+    env = os.environ
+    options: Dict[str, Any] = {}
+    if env.get("DB_QUERY_STATS", "").lower() in ("0", "false", "off"):
+        options["enabled"] = False
+    if env.get("DB_SLOW_QUERY_MS"):
+        value = env["DB_SLOW_QUERY_MS"]
+        options["slow_ms"] = None if value.lower() in ("off", "none") else float(value)
+    if env.get("DB_SLOW_QUERY_LOG"):
+        options["slow_log_path"] = env["DB_SLOW_QUERY_LOG"]
+    if env.get("DB_TRACE", "").lower() in ("1", "true", "on"):
+        options["trace"] = True
+    if env.get("DB_METRICS_FILE"):
+        options["export_path"] = env["DB_METRICS_FILE"]
+    if env.get("DB_METRICS_INTERVAL"):
+        options["export_interval"] = float(env["DB_METRICS_INTERVAL"])
+    return options
+
+
+class _Query:
+    __slots__ = ("fingerprint", "id", "histogram", "calls", "rows", "cache_hits", "errors",
+                 "slow", "plan", "plan_at")
+
+    def __init__(self, fp: str):
+        self.fingerprint = fp
+        self.id = query_id(fp)
+        self.histogram = LatencyHistogram()
+        self.calls = 0
+        self.rows = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.slow = 0
+        self.plan: List[str] | None = None
+        self.plan_at = 0.0
+
+
+class QueryStats:
+    """Latency and row counts per statement fingerprint for one database file.
+
+    DatabaseManager reports every statement it runs: the time spent in
+    SQLite (including waiting for a pooled connection), the rows returned or
+    changed, cache hits and errors. Statements slower than slow_ms go to
+    the slow-query log with their EXPLAIN QUERY PLAN, kept in memory and,
+    with slow_log_path, appended to a JSON-lines file. Plans are looked up
+    at most once per plan_ttl seconds per fingerprint.
+
+    With trace=True every statement SQLite itself executes is counted too,
+    through the connections' trace callback. That includes BEGIN/COMMIT,
+    pragmas and migrations, which DatabaseManager doesn't time.
+
+    With export_path the Prometheus text format is rewritten every
+    export_interval seconds, for a node_exporter textfile collector or
+    anything else that reads it.
+    """
+
+    _stats: Dict[str, "QueryStats"] = {}
+    _stats_lock = threading.Lock()
+
+    def __init__(self, slow_ms: float | None = 250.0, slow_log_path: str | None = None,
+                 slow_log_size: int = 100, trace: bool = False, export_path: str | None = None,
+                 export_interval: float = 15.0, plan_ttl: float = 600.0,
+                 max_fingerprints: int = 1000, enabled: bool = True, db_label: str = ""):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+        self.trace_enabled = trace
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.plan_ttl = plan_ttl
+        self.max_fingerprints = max_fingerprints
+        self.db_label = db_label
+        self._queries: Dict[str, _Query] = {}
+        self._traced: Dict[str, int] = {}
+        self._slow_log: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._started = time.time()
+        self._next_export = time.monotonic() + export_interval
+        self.export_errors = 0
+
+    @classmethod
+    def for_path(cls, db_path: str, **options) -> "QueryStats":
+        """Return the shared stats for a database file, creating them on first use.
+
+        Options not given here come from the environment: DB_QUERY_STATS=0
+        turns timing off, DB_SLOW_QUERY_MS (or "off"), DB_SLOW_QUERY_LOG,
+        DB_TRACE=1, DB_METRICS_FILE and DB_METRICS_INTERVAL.
+        """
+        key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+        with cls._stats_lock:
+            stats = cls._stats.get(key)
+            if stats is None:
+                label = os.path.splitext(os.path.basename(db_path))[0]
+                stats = cls(**{"db_label": label, **_env_options(), **options})
+                cls._stats[key] = stats
+            return stats
+
+    def _query(self, fp: str) -> _Query:
+        # called with self._lock held
+        query = self._queries.get(fp)
+        if query is None:
+            # generated SQL with an unbounded number of shapes shouldn't grow this forever
+            if len(self._queries) >= self.max_fingerprints:
+                fp = OTHER
+                query = self._queries.get(fp)
+            if query is None:
+                query = self._queries[fp] = _Query(fp)
+        return query
+
+    def record(self, sql: str, seconds: float, rows: int = 0, params: Iterable[Any] = (),
+               explain: Callable[[str, tuple], List[str]] | None = None, error: bool = False) -> None:
+        """Count one statement; explain(sql, params) is only called if it was slow."""
+        fp = fingerprint(sql)
+        with self._lock:
+            query = self._query(fp)
+            query.calls += 1
+            query.rows += max(rows, 0)
+            query.errors += error
+            slow = self.slow_ms is not None and seconds * 1000 >= self.slow_ms and not error
+            query.slow += slow
+        query.histogram.observe(seconds)
+        if slow:
+            self._log_slow(query, sql, tuple(params), seconds, rows, explain)
+        if self.export_path and time.monotonic() >= self._next_export:
+            self._export()
+
+    def record_cache_hit(self, sql: str) -> None:
+        """A fetch answered by the query cache; counted, but not in the latency numbers."""
+        fp = fingerprint(sql)
+        with self._lock:
+            self._query(fp).cache_hits += 1
+
+    def trace(self, statement: str) -> None:
+        """sqlite3 trace callback: counts every statement SQLite runs, by fingerprint."""
+        fp = fingerprint(statement)
+        with self._lock:
+            if fp not in self._traced and len(self._traced) >= self.max_fingerprints:
+                fp = OTHER
+            self._traced[fp] = self._traced.get(fp, 0) + 1
+
+    def _plan(self, query: _Query, sql: str, params: tuple, explain) -> List[str] | None:
+        if explain is None or not _EXPLAINABLE.match(sql):
+            return None
+        now = time.monotonic()
+        if query.plan is not None and now - query.plan_at < self.plan_ttl:
+            return query.plan
+        try:
+            plan = explain(sql, params)
+        except Exception as e:  # a plan is nice to have, the query itself already ran
+            plan = [f"(no plan: {e})"]
+        query.plan, query.plan_at = plan, now
+        return plan
+
+    def _log_slow(self, query: _Query, sql: str, params: tuple, seconds: float, rows: int, explain) -> None:
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "ms": round(seconds * 1000, 2),
+            "rows": rows,
+            "id": query.id,
+            "fingerprint": query.fingerprint,
+            # values can be personal data or password hashes, so only the statement is logged
+            "sql": sql if len(sql) <= 2000 else sql[:2000] + "...",
+            "plan": self._plan(query, sql, params, explain),
+        }
+        with self._lock:
+            self._slow_log.append(entry)
+        if self.slow_log_path:
+            with self._file_lock:
+                try:
+                    with open(self.slow_log_path, "a", encoding="utf-8") as file:
+                        file.write(json.dumps(entry) + "\n")
+                except OSError:
+                    self.export_errors += 1
+
+    def snapshot(self, top: int | None = None) -> Dict[str, Any]:
+        """Per-fingerprint numbers, most total time first, plus the recent slow queries."""
+        with self._lock:
+            queries = list(self._queries.values())
+            traced = sorted(self._traced.items(), key=lambda item: -item[1])
+            slow_log = list(self._slow_log)
+            counts = {q.fingerprint: (q.calls, q.rows, q.cache_hits, q.errors, q.slow) for q in queries}
+        rows = []
+        for query in queries:
+            calls, rows_total, cache_hits, errors, slow = counts[query.fingerprint]
+            latency = query.histogram.snapshot()
+            rows.append({
+                "id": query.id,
+                "fingerprint": query.fingerprint,
+                "calls": calls,
+                "cache_hits": cache_hits,
+                "errors": errors,
+                "slow": slow,
+                "rows": rows_total,
+                "rows_per_call": round(rows_total / calls, 2) if calls else None,
+                "total_seconds": latency["sum"],
+                "latency": latency,
+                "plan": query.plan,
+            })
+        rows.sort(key=lambda row: -row["total_seconds"])
+        return {
+            "since": datetime.fromtimestamp(self._started).isoformat(timespec="seconds"),
+            "slow_ms": self.slow_ms,
+            "fingerprints": len(rows),
+            "queries": rows[:top] if top else rows,
+            "slow_queries": slow_log,
+            "traced": dict(traced[:top] if top else traced) if self.trace_enabled else None,
+        }
+
+    def prometheus_text(self) -> str:
+        """The counters and histograms in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        db = _label(self.db_label)
+        metrics = {
+            "duration": ["# HELP mdp_db_query_duration_seconds Time running each statement fingerprint "
+                         "(cache hits excluded).",
+                         "# TYPE mdp_db_query_duration_seconds histogram"],
+            "rows": ["# HELP mdp_db_query_rows_total Rows returned or changed.",
+                     "# TYPE mdp_db_query_rows_total counter"],
+            "cache_hits": ["# HELP mdp_db_query_cache_hits_total Calls answered by the query cache.",
+                           "# TYPE mdp_db_query_cache_hits_total counter"],
+            "errors": ["# HELP mdp_db_query_errors_total Calls that raised an error.",
+                       "# TYPE mdp_db_query_errors_total counter"],
+            "slow": ["# HELP mdp_db_query_slow_total Calls slower than the slow-query threshold.",
+                     "# TYPE mdp_db_query_slow_total counter"],
+        }
+        for row in snap["queries"]:
+            labels = f'db="{db}",query_id="{row["id"]}",query="{_label(row["fingerprint"][:300])}"'
+            latency = row["latency"]
+            for bound, count in latency["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                metrics["duration"].append(f'mdp_db_query_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+            metrics["duration"].append(f"mdp_db_query_duration_seconds_sum{{{labels}}} {latency['sum']}")
+            metrics["duration"].append(f"mdp_db_query_duration_seconds_count{{{labels}}} {latency['count']}")
+            for name in ("rows", "cache_hits", "errors", "slow"):
+                metrics[name].append(f"mdp_db_query_{name}_total{{{labels}}} {row[name]}")
+        lines = [line for block in metrics.values() for line in block]
+        if snap["traced"] is not None:
+            lines.append("# HELP mdp_db_statements_traced_total Statements run by SQLite, from the trace callback.")
+            lines.append("# TYPE mdp_db_statements_traced_total counter")
+            for fp, count in snap["traced"].items():
+                labels = f'db="{db}",query_id="{query_id(fp)}",query="{_label(fp[:300])}"'
+                lines.append(f"mdp_db_statements_traced_total{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | None = None) -> str:
+        """Write prometheus_text() to path (default export_path), replacing the file atomically."""
+        path = path or self.export_path
+        if not path:
+            raise ValueError("No metrics file given and no export_path configured")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "w", encoding="utf-8") as file:
+            file.write(self.prometheus_text())
+        os.replace(temp, path)
+        return path
+
+    def _export(self) -> None:
+        with self._lock:
+            if time.monotonic() < self._next_export:
+                return  # another thread got here first
+            self._next_export = time.monotonic() + self.export_interval
+        try:
+            self.write_prometheus()
+        except OSError:  # metrics must never break the query that triggered them
+            self.export_errors += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._queries.clear()
+            self._traced.clear()
+            self._slow_log.clear()
+            self._started = time.time()
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """Token-bucket rate limiter usable from threads and from asyncio code.
+
+    rate tokens are added per second up to capacity, so short bursts of up
+    to capacity calls go through at once and the long-run rate is capped.
+    """
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.rejected = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens if available; otherwise return how long to wait for them."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.granted += 1
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens without waiting; False when the bucket is empty."""
+        if self._reserve(tokens) == 0.0:
+            return True
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> bool:
+        """Block until tokens are available, or until timeout seconds pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                with self._lock:
+                    self.rejected += 1
+                return False
+            with self._lock:
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """asyncio version of acquire; yields to the event loop while waiting."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return
+            with self._lock:
+                self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "available": round(self._tokens, 3),
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "waited_seconds": round(self.waited_seconds, 6),
+            }
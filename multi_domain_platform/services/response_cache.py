@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .database_manager import DatabaseManager
+
+
+class ResponseCache:
+    """SQLite-backed cache of assistant replies with a TTL and LRU eviction.
+
+    Keys hash the model, the domain system prompt and the normalized message
+    history, so clicking "Analyze ALL" again on unchanged data is answered
+    from disk. Replies are stored as the original list of streamed chunks,
+    which lets a hit be replayed through the same streaming code path.
+
+    A hit is read-only: its last_used time and hit count are kept in memory
+    and written in one batch by the next put(), or after flush_interval
+    seconds, so hits don't queue for the writer behind page writes.
+    """
+
+    _caches: Dict[str, "ResponseCache"] = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, db_manager: DatabaseManager, ttl_seconds: float = 6 * 3600,
+                 max_entries: int = 2000, flush_interval: float = 60.0):
+        self.db = db_manager
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # cache_key -> (last_used, hits) of hits not yet written to the table
+        self._touched: Dict[str, Tuple[float, int]] = {}
+        self._last_flush = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @classmethod
+    def for_path(cls, db_path: str, **options) -> "ResponseCache":
+        """Return the shared cache stored in a database file."""
+        key = os.path.abspath(db_path)
+        with cls._caches_lock:
+            cache = cls._caches.get(key)
+            if cache is None:
+                cache = cls(DatabaseManager(db_path), **options)
+                cls._caches[key] = cache
+            return cache
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, messages: List[Dict[str, str]]) -> str:
+        """Hash of the request; whitespace differences don't change the key."""
+        def normalize(text: str) -> str:
+            return " ".join(str(text).split())
+        payload = {
+            "model": model,
+            "system": normalize(system_prompt),
+            "messages": [[m["role"], normalize(m["content"])] for m in messages],
+        }
+        encoded = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key: str) -> List[str] | None:
+        """Cached chunks for key, or None on a miss or an expired entry."""
+        row = self.db.fetch_one(
+            "SELECT chunks, created_at FROM ai_response_cache WHERE cache_key = ?", (key,)
+        )
+        now = time.time()
+        if row is None:
+            self._count("misses")
+            return None
+        if now - row[1] > self.ttl_seconds:
+            self.db.execute_query("DELETE FROM ai_response_cache WHERE cache_key = ?", (key,))
+            self._count("expired")
+            self._count("misses")
+            return None
+        with self._lock:
+            self.hits += 1
+            _, hits = self._touched.get(key, (now, 0))
+            self._touched[key] = (now, hits + 1)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        return json.loads(row[0])
+
+    def flush(self) -> None:
+        """Write the last_used times and hit counts batched up by get()."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if touched:
+            self.db.execute_many(
+                "UPDATE ai_response_cache SET last_used = MAX(last_used, ?), hits = hits + ? "
+                "WHERE cache_key = ?",
+                [(used, hits, key) for key, (used, hits) in touched.items()],
+            )
+
+    def put(self, key: str, model: str, domain: str, chunks: List[str]) -> None:
+        """Store a finished reply and trim the table back to max_entries."""
+        now = time.time()
+        encoded = json.dumps(chunks, ensure_ascii=False)
+        with self.db.transaction():
+            # recent hits first, so the LRU trim below sees them
+            self.flush()
+            self.db.execute_query(
+                """INSERT OR REPLACE INTO ai_response_cache
+                   (cache_key, model, domain, chunks, size, created_at, last_used, hits)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, 0)""",
+                (key, model, domain, encoded, len(encoded), now, now),
+            )
+            self.db.execute_query("DELETE FROM ai_response_cache WHERE created_at < ?",
+                                  (now - self.ttl_seconds,))
+            # least recently used rows beyond max_entries
+            cur = self.db.execute_query(
+                """DELETE FROM ai_response_cache WHERE cache_key IN (
+                       SELECT cache_key FROM ai_response_cache
+                       ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                (self.max_entries,),
+            )
+        if cur.rowcount > 0:
+            with self._lock:
+                self.evictions += cur.rowcount
+
+    @staticmethod
+    def replay(chunks: List[str]) -> Iterator[str]:
+        yield from chunks
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+        self.db.execute_query("DELETE FROM ai_response_cache")
+
+    def counters(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process; unlike stats() this doesn't query the table."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        row = self.db.fetch_one("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_response_cache")
+        return {
+            "entries": row[0],
+            "bytes": row[1],
+            **self.counters(),
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,109 @@
+"""The numbers behind the System Status section of the Home page.
+
+Nothing here scans a table. Row counts and rows added per day are kept by
+the triggers of migration 7 (see database/migrations.py), so a snapshot is
+one primary-key read of a few rows, two stat() calls for the file sizes and
+the in-memory counters of the caches and the AI backend. It costs the same
+with a thousand rows or ten million.
+"""
+import os
+from typing import Any, Dict
+
+from database import dates
+from database.migrations import COUNTED_TABLES
+from .database_manager import DatabaseManager
+from .llm_backends import default_backend
+from .llm_client import LLMBackend
+from .llm_metrics import StreamMetrics
+from .query_cache import QueryCache
+from .response_cache import ResponseCache
+
+# share of failed assistant replies above which it is shown as degraded
+DEGRADED_FAILURE_RATE = 0.2
+
+_TABLE_STATS_SQL = """
+    SELECT s.table_name, s.row_count, s.last_insert_at, COALESCE(d.inserted, 0)
+    FROM table_stats s
+    LEFT JOIN table_daily_inserts d ON d.table_name = s.table_name AND d.day = ?
+"""
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class SystemStatus:
+    """Row counts, storage, assistant health and cache hit rates for one database.
+
+    The assistant and cache numbers are this process's counters since
+    start-up, like the rest of the in-memory metrics.
+    """
+
+    def __init__(self, db_path: str, backend: LLMBackend | None = None,
+                 metrics: StreamMetrics | None = None):
+        self.db_path = db_path
+        # not use_cache: the triggers' writes to table_stats don't invalidate the QueryCache
+        self.db = DatabaseManager(db_path)
+        self.backend = backend
+        self.metrics = metrics or StreamMetrics.shared()
+
+    def tables(self) -> Dict[str, Dict[str, Any]]:
+        """table -> rows, rows added today and the time of the last insert (local time)."""
+        found = {name: {"rows": rows, "added_today": today, "last_insert_at": last}
+                 for name, rows, last, today in self.db.fetch_all(_TABLE_STATS_SQL, (dates.today_iso(),))}
+        return {name: found.get(name, {"rows": 0, "added_today": 0, "last_insert_at": None})
+                for name in COUNTED_TABLES}
+
+    def storage(self) -> Dict[str, int]:
+        """Bytes in the database file and in its write-ahead log."""
+        return {"db_bytes": _file_size(self.db_path), "wal_bytes": _file_size(self.db_path + "-wal")}
+
+    def assistant(self) -> Dict[str, Any]:
+        """Backend in use, online/degraded/offline, and reply latency percentiles.
+
+        The stub backend counts as offline: it answers with canned text
+        because no API key is configured.
+        """
+        backend = self.backend or default_backend()
+        summary = self.metrics.summary()
+        answered = summary["requests"] - summary["cached"] - summary["cancelled"]
+        failure_rate = summary["failed"] / answered if answered > 0 else 0.0
+        if backend.name == "stub":
+            status = "offline"
+        elif failure_rate > DEGRADED_FAILURE_RATE:
+            status = "degraded"
+        else:
+            status = "online"
+        return {
+            "backend": backend.name,
+            "status": status,
+            "requests": summary["requests"],
+            "failed": summary["failed"],
+            "failure_rate": round(failure_rate, 4),
+            "latency_p50": summary["latency_p50"],
+            "latency_p95": summary["latency_p95"],
+        }
+
+    def caches(self) -> Dict[str, Dict[str, Any]]:
+        """Hit rates of the query cache and the AI response cache."""
+        query = QueryCache.for_path(self.db_path).stats()
+        return {
+            "query": {name: query[name] for name in ("hits", "misses", "hit_rate")},
+            "response": ResponseCache.for_path(self.db_path).counters(),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        tables = self.tables()
+        last_inserts = [t["last_insert_at"] for t in tables.values() if t["last_insert_at"]]
+        return {
+            "tables": tables,
+            "total_rows": sum(t["rows"] for t in tables.values()),
+            "added_today": sum(t["added_today"] for t in tables.values()),
+            "last_insert_at": max(last_inserts) if last_inserts else None,
+            **self.storage(),
+            "assistant": self.assistant(),
+            "caches": self.caches(),
+        }
@@ -0,0 +1,138 @@
+import sqlite3
+
+import pytest
+
+from database import migrations
+from database.dates import SQL_NOW, SQL_TODAY
+
+
+def migrate(conn: sqlite3.Connection) -> list:
+    conn.execute("BEGIN IMMEDIATE")
+    applied = migrations.apply_migrations(conn)
+    conn.commit()
+    return applied
+
+
+@pytest.fixture
+def conn(tmp_path):
+    connection = sqlite3.connect(tmp_path / "legacy.db")
+    yield connection
+    connection.close()
+
+
+def test_fresh_database_reaches_latest_version(conn):
+    assert migrate(conn) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.get_version(conn) == migrations.LATEST_VERSION
+    assert migrate(conn) == []
+
+
+def test_hot_queries_meet_their_plans(conn):
+    migrate(conn)
+    assert migrations.check_hot_query_plans(conn) == {}
+
+
+def test_legacy_datasets_keep_every_column(conn):
+    conn.executescript("""
+        CREATE TABLE datasets_metadata (
+            dataset_id INTEGER, dataset_name TEXT, rows INTEGER, columns INTEGER,
+            uploaded_by TEXT, upload_date TEXT
+        );
+        CREATE INDEX idx_datasets_uploaded_by ON datasets_metadata(uploaded_by);
+        CREATE TABLE upload_log (dataset_id INTEGER, upload_date TEXT);
+        CREATE TRIGGER trg_log_upload AFTER INSERT ON datasets_metadata BEGIN
+            INSERT INTO upload_log VALUES (new.dataset_id, new.upload_date);
+        END;
+    """)
+    conn.executemany("INSERT INTO datasets_metadata VALUES (?, ?, ?, ?, ?, ?)", [
+        (7, "flights", 1200, 9, "alice", "2024-01-02"),
+        (3, "weather", 365, 4, "bob", "2024-02-03"),
+    ])
+    conn.commit()
+
+    migrate(conn)
+
+    assert conn.execute(
+        'SELECT id, dataset_name, "rows", "columns", uploaded_by, upload_date '
+        "FROM datasets_metadata ORDER BY id"
+    ).fetchall() == [(3, "weather", 365, 4, "bob", "2024-02-03"),
+                     (7, "flights", 1200, 9, "alice", "2024-01-02")]
+    assert migrations._has_primary_key(conn, "datasets_metadata")
+    assert "idx_datasets_uploaded_by" in " ".join(migrations.explain(
+        conn, "SELECT id FROM datasets_metadata WHERE uploaded_by = ?", ("bob",)))
+    conn.execute("INSERT INTO datasets_metadata (dataset_name, upload_date) VALUES ('ships', '2024-03-04')")
+    assert conn.execute("SELECT * FROM upload_log").fetchall()[-1] == (8, "2024-03-04")
+
+
+def test_legacy_incidents_keep_their_key_and_views(conn):
+    conn.executescript("""
+        CREATE TABLE cyber_incidents (
+            incident_id INTEGER PRIMARY KEY, date TEXT, incident_type TEXT,
+            severity TEXT, status TEXT, description TEXT, reported_by TEXT NOT NULL DEFAULT 'soc'
+        );
+        CREATE VIEW open_incidents AS SELECT incident_id, date FROM cyber_incidents WHERE status = 'Open';
+        INSERT INTO cyber_incidents VALUES (1001, '2024-05-01', 'Phishing', 'High', 'Open', 'mail', 'eve');
+        INSERT INTO cyber_incidents VALUES (1002, '2024-05-02', 'Malware', 'Low', 'Closed', 'usb', 'sam');
+    """)
+    conn.commit()
+
+    migrate(conn)
+
+    assert conn.execute(
+        "SELECT id, date, incident_type, severity, status, description, reported_by "
+        "FROM cyber_incidents ORDER BY id"
+    ).fetchall() == [(1001, "2024-05-01", "Phishing", "High", "Open", "mail", "eve"),
+                     (1002, "2024-05-02", "Malware", "Low", "Closed", "usb", "sam")]
+    assert conn.execute("SELECT * FROM open_incidents").fetchall() == [(1001, "2024-05-01")]
+
+
+def test_text_legacy_key_is_kept_beside_the_rowid_key(conn):
+    conn.executescript("""
+        CREATE TABLE cyber_incidents (incident_id TEXT PRIMARY KEY, incident_type TEXT);
+        INSERT INTO cyber_incidents VALUES ('INC-1', 'Phishing');
+        INSERT INTO cyber_incidents VALUES ('INC-2', 'Malware');
+    """)
+    conn.commit()
+
+    migrate(conn)
+
+    assert conn.execute("SELECT id, incident_id, incident_type FROM cyber_incidents ORDER BY id").fetchall() \
+        == [(1, "INC-1", "Phishing"), (2, "INC-2", "Malware")]
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO cyber_incidents (incident_id) VALUES ('INC-1')")
+
+
+def test_duplicate_legacy_keys_stop_the_migration(conn):
+    conn.executescript("""
+        CREATE TABLE users (user_id INTEGER, username TEXT);
+        INSERT INTO users VALUES (1, 'alice');
+        INSERT INTO users VALUES (1, 'bob');
+    """)
+    conn.commit()
+
+    with pytest.raises(migrations.MigrationError):
+        migrate(conn)
+    conn.rollback()
+    assert migrations.get_version(conn) == 0
+    assert conn.execute("SELECT user_id, username FROM users").fetchall() == [(1, "alice"), (1, "bob")]
+
+
+def test_legacy_tickets_get_the_local_time_default(conn):
+    conn.executescript("""
+        CREATE TABLE it_tickets (
+            ticket_id INTEGER PRIMARY KEY AUTOINCREMENT, priority TEXT,
+            date_created TEXT DEFAULT CURRENT_TIMESTAMP, category TEXT
+        );
+        CREATE INDEX idx_tickets_category ON it_tickets(category);
+        INSERT INTO it_tickets (priority, date_created, category) VALUES ('High', '2024-06-01 08:30:00', 'Network');
+    """)
+    conn.commit()
+
+    migrate(conn)
+
+    defaults = {row[1]: row[4] for row in conn.execute("PRAGMA table_info(it_tickets)")}
+    assert defaults["date_created"] == SQL_NOW
+    assert conn.execute("SELECT ticket_id, priority, date_created, category FROM it_tickets").fetchall() \
+        == [(1, "High", "2024-06-01 08:30:00", "Network")]
+    conn.execute("INSERT INTO it_tickets (priority) VALUES ('Low')")
+    assert conn.execute("SELECT date(date_created) FROM it_tickets WHERE ticket_id = 2").fetchone()[0] \
+        == conn.execute(f"SELECT {SQL_TODAY}").fetchone()[0]